@@ -151,6 +151,24 @@ actions = [
         'callback': 'on_action_arrange_vertical',
         'group': 'active_when_selection',
     },
+    {
+        'id': 'arrange_grid',
+        'text': '&Grid',
+        'callback': 'on_action_arrange_grid',
+        'group': 'active_when_selection',
+    },
+    {
+        'id': 'arrange_masonry',
+        'text': '&Masonry',
+        'callback': 'on_action_arrange_masonry',
+        'group': 'active_when_selection',
+    },
+    {
+        'id': 'arrange_rows',
+        'text': '&Rows',
+        'callback': 'on_action_arrange_rows',
+        'group': 'active_when_selection',
+    },
     {
         'id': 'crop',
         'text': '&Crop',
@@ -7,3 +7,12 @@ class EventHandlingArrange:
 
     def on_action_arrange_optimal(self):
         self.scene.arrange_optimal()
+
+    def on_action_arrange_grid(self):
+        self.scene.arrange_layout('grid')
+
+    def on_action_arrange_masonry(self):
+        self.scene.arrange_layout('masonry')
+
+    def on_action_arrange_rows(self):
+        self.scene.arrange_layout('rows')
@@ -1,5 +1,6 @@
 from PyQt6 import QtWidgets
 from dreamboard import constants
+from dreamboard.cloud.firebase_operations import upload_pool
 import os
 import logging
 
@@ -40,5 +41,10 @@ class EventHandlingFile:
 
     def on_action_quit(self):
         self.timer.stop()
+        self.cloud_sync.wait()
+        self.cancel_loading_from_cloud()
+        self.scene.cancel_packing(wait=True)
+        upload_pool.close()
+        self.full_resolution_loader.close()
         logger.info('User quit. Exiting...')
         self.app.quit()
@@ -5,13 +5,17 @@ class EventHandlingPresets:
     def on_action_save_preset(self):
         print('save preset')
         new_preset_images = {}  # This dictionary will store the images
-        for item in self.scene.items():
+        store = self.scene.transform_store
+        values = store.get(columns=('x', 'y', 'rotation', 'scale')).tolist()
+        for item, (x, y, rotation, scale) in zip(store.items, values):
+            if item.data(0) is None:
+                continue
             item_uuid = item.data(0).replace('-', '_')
             new_preset_images[item_uuid] = {
-                'x': item.x(),
-                'y': item.y(),
-                'rotation': item.rotation(),
-                'scale': item.scale(),
+                'x': x,
+                'y': y,
+                'rotation': rotation,
+                'scale': scale,
             }
 
         # show a dialog to enter a name for the preset
@@ -20,6 +24,7 @@ class EventHandlingPresets:
             new_preset = {"name": preset_name, "images": new_preset_images}
             # add the preset to the presets dict
             self.parent.presets[preset_name] = new_preset
+            self.scene.change_journal.record_presets()
             QtWidgets.QMessageBox.information(
                 self,
                 'SUCCESS',
@@ -121,6 +121,9 @@ menu_structure = [
             'arrange_optimal',
             'arrange_horizontal',
             'arrange_vertical',
+            'arrange_grid',
+            'arrange_masonry',
+            'arrange_rows',
         ],
     },
     {
@@ -0,0 +1,227 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Move, scale, rotate and flip many items at once.
+
+The new positions and transformations of all items in the scene's
+:class:`~dreamboard.transform_store.TransformStore` are calculated as
+array operations and applied in one go, instead of going through the
+items' anchor handling one by one. Other items (e.g. the multi select
+item) are transformed individually.
+
+All anchors and positions are given in scene coordinates.
+"""
+
+import logging
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+def split_items(items):
+    """Splits items into the ones that can be transformed in a batch and
+    the others.
+
+    :return: The scene (or ``None``), and the indices of the batch items
+        and of the other items in ``items``
+    """
+
+    for item in items:
+        scene = item.scene()
+        if scene is not None and hasattr(scene, 'transform_store'):
+            store = scene.transform_store
+            batch = [i for i, item in enumerate(items) if item in store]
+            others = [i for i, item in enumerate(items) if item not in store]
+            return scene, batch, others
+    return None, [], list(range(len(items)))
+
+
+def rotate_vectors(x, y, angles):
+    """Rotates the vectors (x, y) by the given angles in degrees, with
+    exact results for multiples of 90 degrees like Qt."""
+
+    radians = np.radians(angles)
+    cos = np.cos(radians)
+    sin = np.sin(radians)
+    quarter = np.mod(angles, 90) == 0
+    cos = np.where(quarter, np.round(cos), cos)
+    sin = np.where(quarter, np.round(sin), sin)
+    return x * cos - y * sin, x * sin + y * cos
+
+
+def set_positions(items, x, y):
+    """Sets the position of each item."""
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    scene, batch, others = split_items(items)
+    if batch:
+        stored = [items[i] for i in batch]
+        with scene.batch_geometry_change(stored):
+            scene.transform_store.apply(stored, x=x[batch], y=y[batch])
+    for i in others:
+        items[i].setPos(float(x[i]), float(y[i]))
+
+
+def move_bounds_to(items, left, top):
+    """Moves each item so that the top left corner of its bounding rect
+    (not including selection handles) ends up at (left, top)."""
+
+    left = np.asarray(left, dtype=float)
+    top = np.asarray(top, dtype=float)
+    scene, batch, others = split_items(items)
+    if batch:
+        stored = [items[i] for i in batch]
+        pos = scene.transform_store.get(stored, ('x', 'y'))
+        bounds = scene.transform_store.bounds(stored)
+        with scene.batch_geometry_change(stored):
+            scene.transform_store.apply(
+                stored,
+                x=left[batch] + pos[:, 0] - bounds[:, 0],
+                y=top[batch] + pos[:, 1] - bounds[:, 1])
+    for i in others:
+        item = items[i]
+        rect = item.mapRectToScene(item.bounding_rect_unselected())
+        item.setPos(item.pos().x() + left[i] - rect.left(),
+                    item.pos().y() + top[i] - rect.top())
+
+
+def set_scales(items, scales, anchor):
+    """Sets the scale of each item, keeping ``anchor`` fixed.
+
+    Scales that are not positive are ignored, like in
+    :meth:`~dreamboard.selection.BaseItemMixin.setScale`.
+    """
+
+    scales = np.asarray(scales, dtype=float)
+    scene, batch, others = split_items(items)
+    if batch:
+        stored = [items[i] for i in batch]
+        data = scene.transform_store.get(stored, ('x', 'y', 'scale'))
+        new = np.where(scales[batch] > 0, scales[batch], data[:, 2])
+        factors = new / data[:, 2]
+        with scene.batch_geometry_change(stored):
+            scene.transform_store.apply(
+                stored,
+                x=anchor.x() + factors * (data[:, 0] - anchor.x()),
+                y=anchor.y() + factors * (data[:, 1] - anchor.y()),
+                scale=new)
+    for i in others:
+        items[i].setScale(float(scales[i]), items[i].mapFromScene(anchor))
+
+
+def set_scales_in_place(items, scales):
+    """Sets the scale of each item, keeping the item's own center fixed.
+
+    Scales that are not positive are ignored.
+    """
+
+    scales = np.asarray(scales, dtype=float)
+    scene, batch, others = split_items(items)
+    if batch:
+        stored = [items[i] for i in batch]
+        data = scene.transform_store.get(stored, ('x', 'y', 'scale'))
+        bounds = scene.transform_store.bounds(stored)
+        center_x = (bounds[:, 0] + bounds[:, 2]) / 2
+        center_y = (bounds[:, 1] + bounds[:, 3]) / 2
+        new = np.where(scales[batch] > 0, scales[batch], data[:, 2])
+        factors = new / data[:, 2]
+        with scene.batch_geometry_change(stored):
+            scene.transform_store.apply(
+                stored,
+                x=center_x + factors * (data[:, 0] - center_x),
+                y=center_y + factors * (data[:, 1] - center_y),
+                scale=new)
+    for i in others:
+        items[i].setScale(float(scales[i]), items[i].center)
+
+
+def scale_items_by(items, factor, anchor):
+    """Scales all items by ``factor`` around ``anchor``."""
+
+    scene, batch, others = split_items(items)
+    if batch:
+        stored = [items[i] for i in batch]
+        scales = scene.transform_store.column('scale', stored) * factor
+        set_scales(stored, scales, anchor)
+    for i in others:
+        item = items[i]
+        item.setScale(item.scale() * factor, item.mapFromScene(anchor))
+
+
+def set_rotations(items, rotations, anchor):
+    """Sets the rotation of each item in degrees, keeping ``anchor``
+    fixed."""
+
+    rotations = np.asarray(rotations, dtype=float)
+    scene, batch, others = split_items(items)
+    if batch:
+        stored = [items[i] for i in batch]
+        new = rotations[batch]
+        data = scene.transform_store.get(
+            stored, ('x', 'y', 'rotation', 'flip'))
+        # The rotation happens before flipping, so flipped items turn
+        # the other way in scene coordinates
+        delta = (new - data[:, 2]) * data[:, 3]
+        dx, dy = rotate_vectors(anchor.x() - data[:, 0],
+                                anchor.y() - data[:, 1], delta)
+        with scene.batch_geometry_change(stored):
+            scene.transform_store.apply(
+                stored, x=anchor.x() - dx, y=anchor.y() - dy, rotation=new)
+    for i in others:
+        items[i].setRotation(float(rotations[i]),
+                             items[i].mapFromScene(anchor))
+
+
+def rotate_items_by(items, delta, anchor):
+    """Rotates all items by ``delta`` degrees around ``anchor``. Flipped
+    items are rotated in the opposite direction, so that all items turn
+    the same way on screen."""
+
+    scene, batch, others = split_items(items)
+    if batch:
+        stored = [items[i] for i in batch]
+        data = scene.transform_store.get(stored, ('rotation', 'flip'))
+        set_rotations(stored, data[:, 0] + delta * data[:, 1], anchor)
+    for i in others:
+        item = items[i]
+        item.setRotation(item.rotation() + delta * item.flip(),
+                         item.mapFromScene(anchor))
+
+
+def flip_items(items, anchor, vertical=False):
+    """Flips all items horizontally or vertically around ``anchor``."""
+
+    scene, batch, others = split_items(items)
+    if batch:
+        stored = [items[i] for i in batch]
+        data = scene.transform_store.get(
+            stored, ('x', 'y', 'rotation', 'flip'))
+        x = data[:, 0]
+        y = data[:, 1]
+        rotation = data[:, 2]
+        if vertical:
+            # A vertical flip is a horizontal flip plus a half turn
+            y = 2 * anchor.y() - y
+            rotation = rotation + 180
+        else:
+            x = 2 * anchor.x() - x
+        with scene.batch_geometry_change(stored):
+            scene.transform_store.apply(
+                stored, x=x, y=y, rotation=rotation, flip=-data[:, 3])
+    for i in others:
+        items[i].do_flip(vertical, items[i].mapFromScene(anchor))
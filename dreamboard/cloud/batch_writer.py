@@ -0,0 +1,94 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Grouping Firestore writes into as few requests as possible."""
+
+import logging
+
+from google.api_core.exceptions import NotFound
+
+from dreamboard import constants
+
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """Collects document writes and commits them in write batches of at
+    most ``limit`` writes each.
+
+    Each write can be given a key, by which the caller can tell which
+    writes have failed.
+    """
+
+    def __init__(self, db, limit=constants.FIRESTORE_BATCH_LIMIT):
+        self.db = db
+        self.limit = limit
+        self.writes = []
+        #: Number of commit requests sent so far
+        self.round_trips = 0
+
+    def __len__(self):
+        return len(self.writes)
+
+    def set(self, ref, data, key=None):
+        self.writes.append(('set', ref, data, key))
+
+    def update(self, ref, data, key=None):
+        self.writes.append(('update', ref, data, key))
+
+    def delete(self, ref, key=None):
+        self.writes.append(('delete', ref, None, key))
+
+    def commit(self):
+        """Commits all collected writes.
+
+        A batch is written atomically, so a missing document would fail
+        all other updates in its batch; in that case, the batch's writes
+        are retried one by one.
+
+        :return: The keys of the writes that failed
+        """
+
+        writes = self.writes
+        self.writes = []
+        failed = []
+        for start in range(0, len(writes), self.limit):
+            chunk = writes[start:start + self.limit]
+            try:
+                self._commit(chunk)
+            except NotFound as e:
+                logger.warning(f'Batch write failed: {e}; '
+                               'retrying writes one by one')
+                for write in chunk:
+                    try:
+                        self._commit([write])
+                    except Exception as e:
+                        logger.error(f'Error writing to cloud: {e}')
+                        failed.append(write[3])
+            except Exception as e:
+                logger.error(f'Error writing batch to cloud: {e}')
+                failed.extend(write[3] for write in chunk)
+        return failed
+
+    def _commit(self, writes):
+        batch = self.db.batch()
+        for method, ref, data, key in writes:
+            if method == 'delete':
+                batch.delete(ref)
+            else:
+                getattr(batch, method)(ref, data)
+        self.round_trips += 1
+        batch.commit()
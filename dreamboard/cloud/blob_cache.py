@@ -0,0 +1,166 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Persistent local cache of image blobs downloaded from Cloud Storage.
+
+Blobs are cached by their storage path and MD5 hash, so a blob that has
+been replaced in the cloud is never served from the cache. The least
+recently used blobs are evicted once the cache exceeds its size limit.
+"""
+
+import base64
+from collections import OrderedDict
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+from dreamboard import constants
+
+
+logger = logging.getLogger(__name__)
+
+
+def blob_md5(data):
+    """The MD5 hash of blob data, encoded like Cloud Storage's
+    ``md5Hash``."""
+
+    return base64.b64encode(hashlib.md5(data).digest()).decode('ascii')
+
+
+class BlobCache:
+    """Stores blobs as files in ``directory``. Thread-safe.
+
+    The directory is scanned on first use; the files' modification
+    times serve as last access times.
+    """
+
+    def __init__(self, directory=None,
+                 max_bytes=constants.BLOB_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._entries = None
+        self._size = 0
+
+    @staticmethod
+    def key(path, md5):
+        return hashlib.sha1(f'{path}\n{md5}'.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    @property
+    def size(self):
+        with self.lock:
+            self._scan()
+            return self._size
+
+    def __contains__(self, path_and_md5):
+        with self.lock:
+            self._scan()
+            return self.key(*path_and_md5) in self._entries
+
+    def get(self, path, md5):
+        """:return: The cached data, or ``None``"""
+
+        key = self.key(path, md5)
+        with self.lock:
+            self._scan()
+            if key not in self._entries:
+                return None
+            try:
+                with open(self.path(key), 'rb') as f:
+                    data = f.read()
+                os.utime(self.path(key))
+            except OSError as e:
+                logger.warning(f'Error reading cached blob {path}: {e}')
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+        logger.debug(f'Using cached blob {path}')
+        return data
+
+    def put(self, path, md5, data):
+        if len(data) > self.max_bytes:
+            return
+        key = self.key(path, md5)
+        with self.lock:
+            self._scan()
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                # Write to a temporary file first so that a crash can't
+                # leave a truncated blob behind
+                fd, tmpname = tempfile.mkstemp(dir=self.directory,
+                                               suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmpname, self.path(key))
+            except OSError as e:
+                logger.warning(f'Error caching blob {path}: {e}')
+                return
+            if key in self._entries:
+                self._size -= self._entries[key]
+            self._entries[key] = len(data)
+            self._entries.move_to_end(key)
+            self._size += len(data)
+            self._evict()
+
+    def discard(self, path, md5):
+        with self.lock:
+            self._scan()
+            self._remove(self.key(path, md5))
+
+    def _remove(self, key):
+        self._remove_file(self.path(key))
+        self._size -= self._entries.pop(key, 0)
+
+    def _evict(self):
+        while self._size > self.max_bytes:
+            key = next(iter(self._entries))
+            logger.debug(f'Evicting cached blob {key}')
+            self._remove(key)
+
+    def _scan(self):
+        if self._entries is not None:
+            return
+        self._entries = OrderedDict()
+        self._size = 0
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith('.tmp'):
+                # Left over from an interrupted write
+                self._remove_file(entry.path)
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for mtime, key, size in sorted(entries):
+            self._entries[key] = size
+            self._size += size
+        logger.debug(f'Blob cache has {len(self._entries)} blobs, '
+                     f'{self._size} bytes')
+        self._evict()
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,71 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Local cache of the user's board metadata.
+
+Board documents only change when the user creates, opens or saves a
+board, and these changes are written through to the cache. Changes from
+other devices are picked up once the cache expires.
+"""
+
+import logging
+import time
+
+from dreamboard import constants
+
+
+logger = logging.getLogger(__name__)
+
+
+class BoardCache:
+
+    def __init__(self, ttl=constants.BOARD_CACHE_TTL_SEC):
+        self.ttl = ttl
+        self._boards = None
+        self._fetched_at = None
+
+    def __contains__(self, board_id):
+        return self.is_fresh() and board_id in self._boards
+
+    def is_fresh(self):
+        return (self._boards is not None
+                and time.monotonic() - self._fetched_at < self.ttl)
+
+    def get(self):
+        """The cached boards, latest updated first, or ``None`` if the
+        cache is empty or expired."""
+
+        if not self.is_fresh():
+            return None
+        boards = [dict(board) for board in self._boards.values()]
+        return sorted(boards, key=lambda b: b['updated_at'], reverse=True)
+
+    def set(self, boards):
+        self._boards = {board['id']: dict(board) for board in boards}
+        self._fetched_at = time.monotonic()
+
+    def update(self, board_id, **fields):
+        """Writes changes to a board through to the cache. Unknown boards
+        are added."""
+
+        if self._boards is None:
+            return
+        board = self._boards.setdefault(board_id, {'id': board_id})
+        board.update(fields)
+
+    def invalidate(self):
+        logger.debug('Invalidating board cache')
+        self._boards = None
+        self._fetched_at = None
@@ -1,18 +1,51 @@
 import logging
 import dreamboard.user_instance as user_instance
-from dreamboard import firebase
-from firebase_admin import storage, firestore
-from datetime import datetime
+from dreamboard import constants, firebase
+from dreamboard.cloud.batch_writer import BatchWriter
+from dreamboard.cloud.blob_cache import BlobCache, blob_md5
+from dreamboard.cloud.board_cache import BoardCache
+from dreamboard.cloud.journal import TRANSFORM_FIELDS, fields_delta
+from dreamboard.cloud.snapshot import (
+    SyncResult,
+    apply_result,
+    image_to_png,
+    image_to_preview,
+    take_snapshot,
+)
+from dreamboard.cloud.uploads import BucketStorage, UploadPool
+from firebase_admin import firestore
+from google.api_core.exceptions import NotFound
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+import hashlib
+from dreamboard.config import DreambSettings
 from dreamboard.items import DreambPixmapItem
-from PyQt6 import QtCore, QtGui
-import os
+from PyQt6 import QtGui
+import numpy as np
+import os.path
 import uuid
 
 logger = logging.getLogger(__name__)
 
 
-def fetch_boards():
-    """Fetch all board documents from Firestore."""
+board_cache = BoardCache()
+upload_pool = UploadPool()
+blob_cache = BlobCache()
+
+
+def fetch_boards(force=False):
+    """Fetch all board documents from Firestore.
+
+    The boards are fetched in one batched request and cached for
+    ``BOARD_CACHE_TTL_SEC``; pass ``force=True`` to bypass the cache.
+    """
+
+    if not force:
+        boards = board_cache.get()
+        if boards is not None:
+            logger.debug('Using cached boards.')
+            return boards
+
     db = firebase.get_firestore()
     boards = []
 
@@ -26,47 +59,141 @@ def fetch_boards():
         if user_doc.exists:
             # Get the list of board ids associated with the user
             board_ids = user_doc.to_dict().get("boards", [])
+            logger.debug(f'Board IDs {board_ids}')
 
-            print('Board IDs', board_ids)
-
-            for board_id in board_ids:
-                board_doc = boards_col.document(board_id).get()
+            # Fetch all boards in a single round trip
+            refs = [boards_col.document(board_id) for board_id in board_ids]
+            for board_doc in db.get_all(refs):
                 if board_doc.exists:
                     board = board_doc.to_dict()
                     board["id"] = board_doc.id
                     boards.append(board)
-                    logger.info('Fetched boards from cloud.')
+            logger.info(f'Fetched {len(boards)} boards from cloud.')
 
             boards = sorted(boards, key=lambda x: x['updated_at'], reverse=True)
+            board_cache.set(boards)
 
     except Exception as e:
         logger.error('Error fetching boards from cloud with error: ' + str(e))
 
-    print('Fetched boards from cloud.', boards)
     return boards
 
 
-def upload_to_firebase(file_data, file_name):
-    bucket = storage.bucket()
-    # Create a new blob and upload the file's content.
-    blob = bucket.blob(file_name)
+def get_upload_pool():
+    if upload_pool.storage is None:
+        upload_pool.storage = BucketStorage(firebase.get_storage())
+    return upload_pool
 
-    try:
-        blob.upload_from_string(
-            file_data, content_type='image/png'
-        )
-        logger.info('Uploaded image to cloud.')
-    except Exception as e:
-        logger.error('Error uploading image to cloud with error: ' + str(e))
 
+def get_blob_cache():
+    if blob_cache.directory is None:
+        blob_cache.directory = os.path.join(
+            os.path.dirname(DreambSettings().fileName()), 'BlobCache')
+    return blob_cache
+
+
+def blob_fields(data, folder="images", ext="png"):
+    """The fields of an image document that refer to its blob.
+
+    Blobs are named after the SHA-256 hash of their content, so that an
+    image used several times is stored only once.
+    """
+
+    content_hash = hashlib.sha256(data).hexdigest()
+    return {
+        "storage_url": f"{folder}/{content_hash}.{ext}",
+        "hash": content_hash,
+        "md5": blob_md5(data),
+    }
+
+
+class ImageUpload:
+    """Uploads an image and its preview to Cloud Storage in the
+    background, unless they are stored there already.
+
+    :param full: Whether to upload the image itself; otherwise, only its
+        preview is uploaded
+    """
+
+    def __init__(self, image, label=None, full=True):
+        self.label = label
+        #: Document fields of the uploaded blobs
+        self.fields = {"width": image.width(), "height": image.height()}
+        self.futures = []
+        self.preview_future = None
+
+        if full:
+            data = image_to_png(image)
+            blob = blob_fields(data)
+            self.fields.update(blob)
+            self.futures.append(self._submit(blob, data, "image/png"))
+
+        preview = image_to_preview(image)
+        if preview:
+            data, ext = preview
+            blob = blob_fields(data, "previews", ext)
+            content_type = "image/jpeg" if ext == "jpg" else "image/png"
+            self.preview_future = self._submit(blob, data, content_type)
+            self.preview_fields = {"preview_url": blob["storage_url"],
+                                   "preview_md5": blob["md5"]}
+
+    def _submit(self, blob, data, content_type):
+        future = get_upload_pool().submit(
+            blob["storage_url"], data, content_type, label=self.label,
+            skip_existing=True)
+
+        def cache(future):
+            # Opening the board again needn't download the image
+            if future.exception() is None:
+                get_blob_cache().put(blob["storage_url"], blob["md5"], data)
+
+        future.add_done_callback(cache)
+        return future
+
+    def wait(self):
+        """Waits for the uploads.
+
+        :return: The fields of the uploaded blobs, or ``None`` if the
+            image couldn't be uploaded. Without preview if only the
+            preview couldn't be uploaded.
+        """
+
+        if any(future.exception() for future in self.futures):
+            return None
+        fields = dict(self.fields)
+        if self.preview_future is not None:
+            if self.preview_future.exception() is None:
+                fields.update(self.preview_fields)
+            else:
+                logger.warning(f'Saving {self.label} without preview')
+        return fields
+
+    def uploaded(self):
+        """The futures of the files that have actually been uploaded."""
 
-def save_new_image_to_cloud(board_images_col, item):
-    # Get image data and upload to Cloud Storage
-    data = item.pixmap_to_bytes()
-    filepath = os.path.basename(item.filename)
-    filename = filepath.replace(" ", "-").lower()
+        futures = self.futures + [self.preview_future]
+        return {future for future in futures
+                if future is not None and future.done()
+                and future.exception() is None and future.result()}
+
+
+def upload_image(image):
+    """Starts uploading the image of an :class:`ImageSnapshot`.
+
+    :return: An :class:`ImageUpload`
+    """
+
+    return ImageUpload(image.image, image.filename)
+
+
+def save_new_image_to_cloud(board_images_col, filename, fields, writer, key=None, blob=None):
+    """Adds the creation of an uploaded image's document to ``writer``.
+
+    :param blob: The fields referring to the image's blob, see
+        :func:`blob_fields`
+    :return: The new image id
+    """
 
-    upload_to_firebase(data, filename)
     image_uuid = str(uuid.uuid4())
 
     # Create a new image document in Firestore under the board document
@@ -74,95 +201,158 @@ def save_new_image_to_cloud(board_images_col, item):
         "filename": filename,
         "storage_url": filename,
         "uuid": image_uuid,
-        "x": item.x(),
-        "y": item.y(),
-        "z": item.zValue(),
-        "scale": item.scale(),
-        "rotation": item.rotation(),
-        "flip": item.flip(),
-        "info_text": item.data(1)['meta']['info_text'] if item.data(1) else '',
-        "source_link": item.data(1)['meta']['source_link'] if item.data(1) else '',
-        "source_is_local": item.data(1)['meta']['source_is_local'] if item.data(1) else False,
+        **(blob or {}),
+        **fields,
         "created_at": firestore.SERVER_TIMESTAMP
     }
+    writer.set(board_images_col.document(image_uuid), image_data, key)
+    return image_uuid
 
-    try:
-        board_images_col.document(image_uuid).set(image_data)
-        logger.info('Saved new image to cloud.')
-        return image_uuid
-    except Exception as e:
-        logger.error('Error saving new image to cloud with error: ' + str(e))
 
+def update_image_in_cloud(board_images_col, image_id, fields, writer, key=None):
+    """Adds an update of the given fields of an image document to
+    ``writer``."""
 
-def update_image_in_cloud(board_images_col, item):
-    item_uuid = item.data(0).strip()
+    item_uuid = image_id.strip()
 
     updated_image_data = {
-        "x": item.x(),
-        "y": item.y(),
-        "z": item.zValue(),
-        "scale": item.scale(),
-        "rotation": item.rotation(),
-        "flip": item.flip(),
-        "info_text": item.data(1)['meta']['info_text'] if item.data(1) else '',
-        "source_link": item.data(1)['meta']['source_link'] if item.data(1) else '',
-        "source_is_local": item.data(1)['meta']['source_is_local'] if item.data(1) else False,
+        **fields,
         "updated_at": firestore.SERVER_TIMESTAMP
     }
-    try:
-        board_images_col.document(item_uuid).update(updated_image_data)
-        logger.info('Updated image in cloud.')
-    except Exception as e:
-        logger.error('Error updating image to cloud with error: ' + str(e))
+    writer.update(board_images_col.document(item_uuid), updated_image_data, key)
+
 
+def fetch_presets_from_cloud(board_ref):
+    """:return: The board's presets, by id"""
 
-def fetch_presets_from_cloud(board_ref, mainWindow):
+    presets = {}
     try:
         # Fetch all presets for this board
         board_presets_col = board_ref.collection("presets")
         presets_docs = board_presets_col.stream()
 
-        mainWindow.presets = {}
-
         for doc in presets_docs:
-            mainWindow.presets[doc.id] = doc.to_dict()
+            presets[doc.id] = doc.to_dict()
 
         logger.info('Fetched presets from cloud.')
     except Exception as e:
         logger.error('Error fetching presets from cloud with error: ' + str(e))
+    return presets
 
 
-def create_image_from_cloud(image_data, mainWindow, bucket):
+def download_image(bucket, image_data, cache=None):
+    """Downloads and decodes an image. Can run in any thread.
+
+    If a :class:`~dreamboard.cloud.blob_cache.BlobCache` is given, blobs
+    whose MD5 hash is known from the image document are read from the
+    cache if possible. For documents without hash, only the blob's
+    metadata is fetched to look it up.
+
+    :return: A ``QImage``, which is null if the image couldn't be loaded
+    """
+
+    path = image_data["storage_url"]
     try:
+        md5 = image_data.get("md5")
+        blob = bucket.blob(path)
+        if cache is not None and md5 is None:
+            blob = bucket.get_blob(path)
+            if blob is None:
+                raise FileNotFoundError(f'No such blob: {path}')
+            md5 = blob.md5_hash
+
+        if cache is not None and md5:
+            data = cache.get(path, md5)
+            if data is not None:
+                img = QtGui.QImage.fromData(data)
+                if not img.isNull():
+                    return img
+                cache.discard(path, md5)
+
         # Download the image from Cloud Storage
-        blob = bucket.blob(image_data["storage_url"])
-        image_data_bytes = blob.download_as_bytes()
+        data = blob.download_as_bytes()
+        img = QtGui.QImage.fromData(data)
+        if cache is not None and not img.isNull():
+            actual_md5 = blob_md5(data)
+            if md5 and actual_md5 != md5:
+                logger.warning(f'Blob {path} has changed since its image was saved')
+            cache.put(path, actual_md5, data)
+        return img
+    except Exception as e:
+        logger.error('Error downloading image from cloud with error: ' + str(e))
+        return QtGui.QImage()
+
+
+def load_image(bucket, image_data, cache=None, previews=False):
+    """Downloads and decodes an image, or its preview if it has one and
+    ``previews`` is set.
 
-        img = QtGui.QImage.fromData(image_data_bytes)
+    :return: A ``QImage``, which is null if the image couldn't be
+        loaded, and whether it is a preview
+    """
 
-        # Create a new item and add it to the scene
+    if previews and image_data.get("preview_url"):
+        preview_data = {"storage_url": image_data["preview_url"],
+                        "md5": image_data.get("preview_md5")}
+        img = download_image(bucket, preview_data, cache)
+        if not img.isNull():
+            return img, True
+    return download_image(bucket, image_data, cache), False
+
+
+def create_image_from_cloud(image_data, img, mainWindow, preview_loader=None):
+    """Creates an image item for ``add_item_later``.
+
+    :param preview_loader: If given, ``img`` is the image's preview, and
+        its full resolution is loaded by this
+        :class:`~dreamboard.cloud.previews.FullResolutionLoader`
+    :return: The item data
+    """
+
+    if preview_loader is None:
         item = DreambPixmapItem(img, image_data["filename"], mainWindow.toggleSidebar)
+    else:
+        item = DreambPixmapItem(QtGui.QImage(), image_data["filename"], mainWindow.toggleSidebar)
+        item.set_preview(img, image_data["width"], image_data["height"],
+                         preview_loader, image_data)
+    item.setData(0, image_data["uuid"])
+    item.setData(1, {
+        "meta": {
+            "info_text": image_data["info_text"],
+            "source_link": image_data["source_link"],
+            "source_is_local": image_data["source_is_local"]
+        }
+    })
 
-        item.set_pos_center(QtCore.QPointF(image_data["x"], image_data["y"]))
-        item.setRotation(image_data["rotation"])
-        item.setScale(image_data["scale"])
+    itemdata = {'type': 'pixmap', 'item': item}
+    for key in TRANSFORM_FIELDS:
+        if image_data.get(key) is not None:
+            itemdata[key] = image_data[key]
+    return itemdata
 
-        item.setData(0, image_data["uuid"])
 
-        item.setData(1, {
-            "meta": {
-                "info_text": image_data["info_text"],
-                "source_link": image_data["source_link"],
-                "source_is_local": image_data["source_is_local"]
-            }
-        })
+def order_by_distance(images_data, center=None):
+    """Sorts image documents by the distance of their position to
+    ``center``, or to the center of all positions if not given."""
+
+    if not images_data:
+        return []
+    positions = np.array([(d.get("x", 0), d.get("y", 0)) for d in images_data],
+                         dtype=float)
+    if center is None:
+        center = positions.mean(axis=0)
+    distances = ((positions - center) ** 2).sum(axis=1)
+    return [images_data[i] for i in np.argsort(distances, kind='stable')]
 
-        return item
-    except Exception as e:
-        logger.error('Error creating image from cloud with error: ' + str(e))
 
+def update_presets_in_cloud(db, doc_ref, local_presets, writer):
+    """Adds writes for adding and updating the presets to ``writer``. New
+    presets get the id of their document in ``local_presets``.
 
-def update_presets_in_cloud(db, doc_ref, local_presets):
+    :return: The new ids of the added presets, by their old id
+    """
+
+    preset_ids = {}
     board_presets_col = db.collection("boards").document(doc_ref.id).collection("presets")
     presets_docs = board_presets_col.stream()
 
@@ -172,159 +362,297 @@ def update_presets_in_cloud(db, doc_ref, local_presets):
         # Find presets that are in local_presets but not in the cloud
         if preset_id not in preset_doc_ids:
             logger.info(f'Preset {preset_id} added to cloud')
-            try:
-                _, new_preset_ref = board_presets_col.add(preset)
-                # replace preset_id with firestore id
-                local_presets.pop(preset_id)
-                local_presets[new_preset_ref.id] = preset
-            except Exception as e:
-                logger.error('Error adding preset to cloud with error: ' + str(e))
-                continue
-
+            new_preset_ref = board_presets_col.document()
+            writer.set(new_preset_ref, preset, ('preset', preset_id))
+            # replace preset_id with firestore id
+            local_presets.pop(preset_id)
+            local_presets[new_preset_ref.id] = preset
+            preset_ids[preset_id] = new_preset_ref.id
         else:
             logger.info(f'Preset {preset_id} updated in cloud')
-            try:
-                board_presets_col.document(preset_id).update(preset)
-            except Exception as e:
-                logger.error('Error updating preset to cloud with error: ' + str(e))
-                continue
+            writer.update(board_presets_col.document(preset_id), preset, ('preset', preset_id))
+
+    return preset_ids
+
+
+def create_board_in_cloud(db, user_doc, board_name):
+    """Creates a new board and adds it to the user's boards.
 
+    :return: The reference of the new board document, or ``None``
+    """
 
-def create_board_in_cloud(db, user_doc, board_name) -> str:
     users_col = db.collection("users")
 
     user_doc = users_col.document(user_instance.user.id).get()
     if user_doc.exists:
         # Create a new board document in Firestore
+        # Aware like the timestamps read from Firestore, which the board
+        # cache sorts together with these
+        now = datetime.now(timezone.utc)
         board_data = {
-            "created_at": datetime.now(),
-            "updated_at": datetime.now(),
+            "created_at": now,
+            "updated_at": now,
             "name": board_name  # use actual board name here
         }
 
         try:
             _, board_ref = db.collection("boards").add(board_data)
-            print('save to doc', user_doc)
-            user_doc.update({"boards": firestore.ArrayUnion([board_ref.id])})
-            return str(board_ref)
+            user_doc.reference.update({"boards": firestore.ArrayUnion([board_ref.id])})
+            board_cache.update(board_ref.id, **board_data)
+            return board_ref
         except Exception as e:
             logger.error('Error creating board in cloud with error: ' + str(e))
-            return ''
+            # The board may have been added to the user's boards or not
+            board_cache.invalidate()
 
 
 def save_dreamb_cloud(scene, local_presets, boards_local=None, current_board_id=None, worker=None):
-    logger.info('Saving...')
-    # Get Firestore client and Cloud Storage bucket
-    db = firebase.get_firestore()
-
-    # boards_local = list of boards with name and id
-    # current_board = id of current board
-
-    boards_cloud = fetch_boards()
-    print('Saving...')
-
-    # if current_board is not in boards_cloud, create it
+    """Sends the changes recorded in the scene's change journal to the
+    cloud and waits for the result. Does nothing if there are no changes.
 
-    if current_board_id and current_board_id not in [b["id"] for b in boards_cloud]:
-        board_name = [b["name"] for b in boards_local if b["id"] == current_board_id][0]
-        board_ref = create_board_in_cloud(db, user_instance.user, board_name)
-    elif (len(boards_cloud)):
-        board_ref = db.collection("boards").document(current_board_id)
+    See :class:`~dreamboard.cloud.sync.CloudSync` for syncing in the
+    background.
+    """
 
-        try:
-            board_ref.update({"updated_at": datetime.now()})
-        except Exception as e:
-            logger.error('Error updating board in cloud with error: ' + str(e))
-            return
-
-    update_presets_in_cloud(db, board_ref, local_presets)
-
-    board_images_col = db.collection("boards").document(board_ref.id).collection("images")
-
-    # Get a list of image ids already in the cloud, on board_images_col
-    cloud_images_docs = board_images_col.stream()
-    cloud_images = {doc.id: doc.to_dict() for doc in cloud_images_docs}
+    taken = take_snapshot(scene, local_presets, boards_local, current_board_id)
+    if taken is None:
+        return
+    snapshot, changes = taken
+    try:
+        result = sync_snapshot(snapshot, worker)
+    except Exception:
+        # Try again next time
+        scene.change_journal.restore(changes)
+        raise
+    apply_result(scene, changes, result, local_presets, boards_local)
 
-    metakeys_to_compare = ['info_text', 'source_link', 'source_is_local']
-    # Iterate over each item in the scene
-    properties = ['x', 'y', 'flip', 'rotation', 'scale']
 
-    for i, item in enumerate(scene.items()):
-        local_image_data = item.data(1)["meta"] if item.data(1) else {}
-        cloud_image_data = cloud_images.get(item.data(0))
+def sync_snapshot(snapshot, worker=None):
+    """Sends the changes of a :class:`SyncSnapshot` to the cloud. Doesn't
+    touch the scene, so this can run in any thread.
 
-        # if the image is new (i.e. the id is not in the cloud), save it
-        if (item.data(0) not in cloud_images):
-            new_uuid = save_new_image_to_cloud(board_images_col, item)
-            item.setData(0, new_uuid)
+    :return: A :class:`SyncResult`
+    """
 
-        # if the local item data is different from the cloud data, update it
-        elif not all(local_image_data.get(key) == cloud_image_data.get(key) for key in metakeys_to_compare):
-            print('mismatch meta data', item.data(1), cloud_image_data)
-            update_image_in_cloud(board_images_col, item)
+    logger.info('Saving...')
+    result = SyncResult(snapshot)
+    # Get Firestore client and Cloud Storage bucket
+    db = firebase.get_firestore()
+    writer = BatchWriter(db)
+    synced = snapshot.synced
 
-        if any(getattr(item, prop)() != cloud_image_data.get(prop) for prop in properties):
-            update_image_in_cloud(board_images_col, item)
+    # Touch the current board; if it doesn't exist in the cloud yet,
+    # create it. This needs no listing of all boards.
+    board_ref = db.collection("boards").document(snapshot.board_id)
+    now = datetime.now(timezone.utc)
+    try:
+        result.round_trips += 1
+        board_ref.update({"updated_at": now})
+        board_cache.update(snapshot.board_id, updated_at=now)
+    except NotFound:
+        if snapshot.board_id in board_cache:
+            # Deleted elsewhere
+            board_cache.invalidate()
+        # Fetching the user, adding the board and adding it to the user
+        result.round_trips += 3
+        board_ref = create_board_in_cloud(db, user_instance.user, snapshot.board_name)
+        if board_ref is None:
+            return result
+        result.new_board_id = board_ref.id
+        synced = {}
+    except Exception as e:
+        logger.error('Error updating board in cloud with error: ' + str(e))
+        return result
 
-        else:
-            logger.info('No changes to image in cloud.')
+    if snapshot.presets is not None:
+        result.round_trips += 1
+        result.preset_ids = update_presets_in_cloud(db, board_ref, dict(snapshot.presets), writer)
+    board_images_col = db.collection("boards").document(board_ref.id).collection("images")
+    sync_images(board_images_col, snapshot.images, synced, result, writer, worker)
+
+    # All document writes go out together
+    result.fail(writer.commit())
+    result.round_trips += writer.round_trips
+    result.complete = True
+
+    logger.info(f'Saved! Used {result.round_trips} Firestore round trips '
+                f'and {result.uploads} uploads.')
+    return result
+
+
+def sync_images(board_images_col, images, synced, result, writer, worker=None):
+    """Adds the changes of the given :class:`ImageSnapshot` objects,
+    compared to the last synced state, to ``writer`` and ``result``.
+
+    New images are uploaded in parallel while the other changes are
+    collected; their documents are added as their uploads finish. The
+    writes are keyed by ``('image', key)``.
+    """
+
+    uploads = []
+    for i, image in enumerate(images):
+        image_id = image.image_id
+        write_key = ('image', image.key)
+
+        if image.in_scene:
+            if image_id not in synced:
+                # The image is new
+                uploads.append((image, upload_image(image)))
+            else:
+                delta = fields_delta(synced[image_id], image.fields)
+                if not delta:
+                    logger.debug('No changes to image in cloud.')
+                else:
+                    update_image_in_cloud(board_images_col, image_id, delta, writer, write_key)
+                    result.updated[image.key] = (image_id, delta)
+
+        elif image_id in synced:
+            # The image has been deleted locally
+            writer.delete(board_images_col.document(image_id), write_key)
+            result.deleted[image.key] = image_id
 
         # Update the progress if a worker was provided
         if worker:
             worker.progress.emit(i)
 
-    # delete all items in the cloud that were deleted locally, i.e. if the id is in image_ids and not in scene.items
-    for cloud_image_id in cloud_images.keys():
-        if cloud_image_id not in [item.data(0) for item in scene.items()]:
-            try:
-                board_images_col.document(cloud_image_id).delete()
-            except Exception as e:
-                logger.error('Error deleting image from cloud with error: ' + str(e))
-                continue
+    uploaded = set()
+    for image, upload in uploads:
+        blob = upload.wait()
+        uploaded |= upload.uploaded()
+        new_uuid = None
+        if blob is not None:
+            new_uuid = save_new_image_to_cloud(
+                board_images_col, image.filename, image.fields, writer, ('image', image.key), blob)
+        if new_uuid:
+            result.uploaded[image.key] = (new_uuid, image.fields)
+        else:
+            result.failed.append(image.key)
+    result.uploads = len(uploaded)
+
 
-    logger.info('Saved!')
+def load_dreamb_cloud(scene, mainWindow, worker, board_id=None, center=None, preview_loader=None):
+    """Loads a board from the cloud; meant to run in a
+    :class:`~dreamboard.cloud.loading.CloudLoader` thread.
 
+    Once the board's documents are fetched, the worker's ``board_opened``
+    signal is emitted. Then the images are downloaded and decoded in
+    parallel, nearest to ``center`` first, and queued with
+    ``scene.add_item_later`` as they arrive.
+
+    If a ``preview_loader`` is given, the previews of images are loaded
+    instead, see :func:`create_image_from_cloud`.
+
+    :return: The id of the loaded board, the storage urls of the images
+        that couldn't be loaded and the loaded images that need to be
+        migrated, see :func:`migrate_images`
+    """
 
-def load_dreamb_cloud(scene, mainWindow, board_id=None):
     logger.info('Loading...')
     # Get Firestore client and Cloud Storage bucket
     db = firebase.get_firestore()
     bucket = firebase.get_storage()
+    cache = get_blob_cache()
+    errors = []
+    legacy = []
 
     # Fetch all boards, sorted by latest updated_at
     boards = fetch_boards()
 
-    # Make the boards available to the mainWindow
-    mainWindow.boards = boards
+    if not boards:
+        logger.info('No boards found.')
+        return None, errors, legacy
 
-    if len(boards) > 0:
-        if not board_id:
-            # Open the first board
-            board_id = boards[0]["id"]
+    if not board_id:
+        # Open the first board
+        board_id = boards[0]["id"]
+    elif not any(board["id"] == board_id for board in boards):
+        # E.g. created on another device since the boards were cached
+        boards = fetch_boards(force=True) or boards
+    board_ref = db.collection("boards").document(board_id)
+    presets = fetch_presets_from_cloud(board_ref)
 
-        mainWindow.current_board = board_id
-        board_ref = db.collection("boards").document(board_id)
+    try:
+        # Fetch all image documents for this board
+        images_data = [doc.to_dict() for doc in board_ref.collection("images").stream()]
+    except Exception as e:
+        logger.error('Error loading images from cloud with error: ' + str(e))
+        # Don't upload the images we know about again
+        worker.board_opened.emit(board_id, boards, presets, None)
+        return board_id, errors, legacy
+
+    synced = {image_data["uuid"]: image_data for image_data in images_data}
+    worker.board_opened.emit(board_id, boards, presets, synced)
+    images_data = order_by_distance(images_data, center)
+    worker.begin_processing.emit(len(images_data))
+
+    with ThreadPoolExecutor(constants.DOWNLOAD_CONCURRENCY) as executor:
+        previews = preview_loader is not None
+        downloads = {executor.submit(load_image, bucket, image_data, cache, previews): image_data
+                     for image_data in images_data}
+        for i, future in enumerate(as_completed(downloads)):
+            image_data = downloads[future]
+            img, is_preview = future.result()
+            if img.isNull():
+                errors.append(image_data["storage_url"])
+            else:
+                logger.debug(f'Loaded image {image_data["storage_url"]}')
+                scene.add_item_later(create_image_from_cloud(
+                    image_data, img, mainWindow, preview_loader if is_preview else None))
+                if needs_migration(image_data):
+                    legacy.append((image_data, img))
+            worker.progress.emit(i)
+            if worker.canceled:
+                executor.shutdown(wait=False, cancel_futures=True)
+                break
 
-        fetch_presets_from_cloud(board_ref, mainWindow)
+    logger.info('Loaded!')
+    return board_id, errors, legacy
 
-        try:
-            # Fetch all images for this board
-            images_col = board_ref.collection("images")
-            images_docs = images_col.stream()
 
-            items = []
-            # Iterate over each image
-            for image_doc in images_docs:
-                image_data = image_doc.to_dict()
-                logger.info(f'Loading image from file {image_data["storage_url"]}')
+def needs_migration(image_data):
+    """Whether an image has been saved before blobs were named after
+    their content or without a preview, e.g. before previews were
+    uploaded or because its preview upload failed."""
 
-                item = create_image_from_cloud(image_data, mainWindow, bucket)
+    if "hash" not in image_data or "width" not in image_data:
+        return True
+    # Small images are their own previews
+    size = max(image_data["width"], image_data.get("height", 0))
+    return size > constants.PREVIEW_SIZE and "preview_url" not in image_data
 
-                scene.addItem(item)
-                items.append(item)
-        except Exception as e:
-            logger.error('Error loading images from cloud with error: ' + str(e))
-    else:
-        logger.info('No boards found.')
 
-    logger.info('Loaded!')
+def migrate_images(board_id, images, canceled=None):
+    """Moves images saved before blobs were named after their content to
+    content-addressed blobs, see :func:`blob_fields`, and uploads
+    previews for images without.
+
+    The old blobs are kept, since images on other boards might still
+    refer to them.
+
+    :param images: Image documents and their loaded ``QImage``
+    :param canceled: Called between steps; stops the migration if it
+        returns ``True``. Unfinished images are migrated next time.
+    """
+
+    logger.info(f'Migrating {len(images)} images...')
+    db = firebase.get_firestore()
+    writer = BatchWriter(db)
+    board_images_col = db.collection("boards").document(board_id).collection("images")
+
+    uploads = []
+    for image_data, img in images:
+        if canceled and canceled():
+            return
+        full = "hash" not in image_data
+        uploads.append((image_data, ImageUpload(img, image_data["filename"], full)))
+
+    for image_data, upload in uploads:
+        if canceled and canceled():
+            return
+        blob = upload.wait()
+        if blob is not None:
+            writer.update(board_images_col.document(image_data["uuid"]), blob)
+
+    migrated = len(writer)
+    migrated -= len(writer.commit())
+    logger.info(f'Migrated {migrated} of {len(images)} images.')
@@ -0,0 +1,229 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Journal of local changes that haven't been synced to the cloud yet.
+
+The journal only remembers *which* items have been touched, by undo
+commands or by metadata edits. Whether an item has been added, changed
+or deleted is decided at sync time, by comparing it with the last synced
+state of the board. This way undoing and redoing any number of times
+still results in the right changes being sent.
+"""
+
+import json
+import logging
+import os
+import os.path
+
+from PyQt6 import QtCore, sip
+
+from dreamboard.undo import iter_commands
+
+
+logger = logging.getLogger(__name__)
+
+
+TRANSFORM_FIELDS = ('x', 'y', 'z', 'scale', 'rotation', 'flip')
+META_FIELDS = ('info_text', 'source_link', 'source_is_local')
+SYNCED_FIELDS = TRANSFORM_FIELDS + META_FIELDS
+
+
+def image_fields(item):
+    """The synced fields of an image item, as stored in the cloud."""
+
+    meta = item.data(1)['meta'] if item.data(1) else {}
+    return {
+        'x': item.x(),
+        'y': item.y(),
+        'z': item.zValue(),
+        'scale': item.scale(),
+        'rotation': item.rotation(),
+        'flip': item.flip(),
+        'info_text': meta.get('info_text', ''),
+        'source_link': meta.get('source_link', ''),
+        'source_is_local': meta.get('source_is_local', False),
+    }
+
+
+def command_items(command):
+    """All items affected by an undo command, including the commands
+    nested in it."""
+
+    items = []
+    for cmd in iter_commands(command):
+        if hasattr(cmd, 'items'):
+            items.extend(cmd.items)
+        elif hasattr(cmd, 'item'):
+            items.append(cmd.item)
+    return items
+
+
+def fields_delta(synced, fields):
+    """The fields that differ from their synced values."""
+
+    return {key: value for key, value in fields.items()
+            if synced.get(key) != value}
+
+
+class Changes:
+    """The changes taken out of the journal for one sync."""
+
+    def __init__(self, items=(), presets=False, board=False):
+        self.items = list(items)
+        self.presets = presets
+        self.board = board
+
+
+class ChangeJournal(QtCore.QObject):
+    """Records local changes and the state of the board as last synced.
+
+    The synced state maps image ids to their :func:`image_fields` and is
+    persisted per board in ``state_dir``, if given.
+
+    Commands can be pushed from loading threads; being a ``QObject``,
+    the journal still records them on the GUI thread.
+    """
+
+    def __init__(self, state_dir=None):
+        super().__init__()
+        self.state_dir = state_dir
+        self.board_id = None
+        self.synced = {}
+        self._items = set()
+        self._presets = False
+        self._board = False
+        self._undo_stack = None
+        self._undo_index = 0
+
+    def is_empty(self):
+        return not (self._items or self._presets or self._board)
+
+    def record(self, items):
+        self._items.update(items)
+
+    def record_presets(self):
+        self._presets = True
+
+    def record_board(self):
+        """Marks the board itself as changed, e.g. when it is new."""
+        self._board = True
+
+    def watch(self, undo_stack):
+        """Records the items of all commands done or undone on the
+        given stack."""
+
+        self._undo_stack = undo_stack
+        self._undo_index = undo_stack.index()
+        undo_stack.indexChanged.connect(self.on_undo_index_changed)
+        undo_stack.destroyed.connect(self.unwatch)
+
+    def unwatch(self):
+        self._undo_stack = None
+
+    @QtCore.pyqtSlot(int)
+    def on_undo_index_changed(self, index):
+        stack = self._undo_stack
+        if stack is None or sip.isdeleted(stack):
+            # The stack clears itself while being destroyed
+            return
+        if index == self._undo_index:
+            # A command has been merged into the current one
+            indices = [index - 1]
+        else:
+            indices = range(min(index, self._undo_index),
+                            max(index, self._undo_index))
+        self._undo_index = index
+        for i in indices:
+            command = stack.command(i)
+            if command is not None:
+                self.record(command_items(command))
+
+    def take(self):
+        """Removes all recorded changes from the journal and returns
+        them. Changes that couldn't be synced should be put back with
+        :meth:`restore`."""
+
+        changes = Changes(self._items, self._presets, self._board)
+        self._items = set()
+        self._presets = False
+        self._board = False
+        return changes
+
+    def restore(self, changes):
+        self._items.update(changes.items)
+        self._presets = self._presets or changes.presets
+        self._board = self._board or changes.board
+
+    def clear(self):
+        """Forgets all changes and the synced state, e.g. when the scene
+        is cleared."""
+
+        self.take()
+        self.board_id = None
+        self.synced = {}
+
+    def delta(self, image_id, fields):
+        """The fields that differ from the synced state of the image."""
+
+        return fields_delta(self.synced.get(image_id, {}), fields)
+
+    def mark_synced(self, image_id, fields):
+        self.synced.setdefault(image_id, {}).update(fields)
+
+    def forget(self, image_id):
+        self.synced.pop(image_id, None)
+
+    def reset(self, board_id, synced=None):
+        """Sets the board and its synced state, e.g. after loading it.
+
+        :param synced: The images as they are in the cloud, by id. If not
+            given, the persisted state of the board is used.
+        """
+
+        self.board_id = board_id
+        if synced is None:
+            self.synced = self.load_state(board_id)
+        else:
+            self.synced = {
+                image_id: {key: fields.get(key) for key in SYNCED_FIELDS}
+                for image_id, fields in synced.items()}
+            self.save_state()
+
+    def state_path(self, board_id):
+        if not (self.state_dir and board_id):
+            return None
+        return os.path.join(self.state_dir, f'{board_id}.json')
+
+    def load_state(self, board_id):
+        path = self.state_path(board_id)
+        if not path or not os.path.exists(path):
+            return {}
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f'Could not read sync state {path}: {e}')
+            return {}
+
+    def save_state(self):
+        path = self.state_path(self.board_id)
+        if not path:
+            return
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(self.synced, f)
+        except OSError as e:
+            logger.warning(f'Could not write sync state {path}: {e}')
@@ -0,0 +1,80 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Loading boards from the cloud in a background thread."""
+
+import logging
+
+from PyQt6 import QtCore
+
+from dreamboard.cloud.firebase_operations import (
+    load_dreamb_cloud,
+    migrate_images,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class CloudLoader(QtCore.QThread):
+    """Loads a board from the cloud.
+
+    Loaded items are queued in the scene; connect ``progress`` to add
+    them as they arrive. Once loaded, images of older boards are migrated
+    to content-addressed blobs.
+
+    :param preview_loader: If given, images are loaded as previews whose
+        full resolution is loaded by this
+        :class:`~dreamboard.cloud.previews.FullResolutionLoader`
+    """
+
+    #: Board id, all boards, the board's presets and the images as they
+    #: are in the cloud, by id (``None`` if they couldn't be fetched)
+    board_opened = QtCore.pyqtSignal(str, list, dict, object)
+    begin_processing = QtCore.pyqtSignal(int)
+    progress = QtCore.pyqtSignal(int)
+    #: Board id (empty if there is none) and images that couldn't be
+    #: loaded
+    loaded = QtCore.pyqtSignal(str, list)
+
+    def __init__(self, scene, main_window, board_id=None, center=None,
+                 preview_loader=None, parent=None):
+        super().__init__(parent)
+        self.scene = scene
+        self.main_window = main_window
+        self.board_id = board_id
+        self.center = center
+        self.preview_loader = preview_loader
+        self.canceled = False
+
+    def run(self):
+        try:
+            board_id, errors, legacy = load_dreamb_cloud(
+                self.scene, self.main_window, self, self.board_id,
+                self.center, self.preview_loader)
+        except Exception as e:
+            logger.error('Error loading board from cloud with error: '
+                         + str(e))
+            board_id, errors, legacy = None, [], []
+        self.loaded.emit(board_id or '', errors)
+
+        if legacy and not self.canceled:
+            try:
+                migrate_images(board_id, legacy, lambda: self.canceled)
+            except Exception as e:
+                logger.error('Error migrating images with error: ' + str(e))
+
+    def on_canceled(self):
+        self.canceled = True
@@ -0,0 +1,116 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Loading the full resolution of images opened as previews."""
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+from PyQt6 import QtCore, QtGui
+
+from dreamboard import constants, firebase
+from dreamboard.cloud.firebase_operations import (
+    download_image,
+    get_blob_cache,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class FullResolutionLoader(QtCore.QObject):
+    """Loads the full images of items that show a preview, see
+    :meth:`~dreamboard.items.DreambPixmapItem.set_preview`.
+
+    The items' ``preview_source`` is their image document.
+    """
+
+    #: Item and its full image, emitted from the download threads
+    loaded = QtCore.pyqtSignal(object, QtGui.QImage)
+
+    def __init__(self, max_workers=constants.DOWNLOAD_CONCURRENCY):
+        super().__init__()
+        self.max_workers = max_workers
+        self._executor = None
+        self.pending = {}
+        #: Items whose full image couldn't be loaded; they keep their
+        #: preview
+        self.failed = set()
+        self.loaded.connect(
+            self.on_loaded, QtCore.Qt.ConnectionType.QueuedConnection)
+
+    def request(self, item):
+        """Starts loading the item's full image in the background."""
+
+        if item in self.pending or item in self.failed:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.max_workers, thread_name_prefix='full-resolution')
+        logger.debug(f'Requesting full resolution of {item}')
+        self.pending[item] = self._executor.submit(
+            self._load, item, item.preview_source)
+
+    def load_now(self, item):
+        """Loads the item's full image on the current thread."""
+
+        self.apply(item, self.download(item.preview_source))
+
+    def download(self, image_data):
+        return download_image(
+            firebase.get_storage(), image_data, get_blob_cache())
+
+    def _load(self, item, image_data):
+        self.loaded.emit(item, self.download(image_data))
+
+    @QtCore.pyqtSlot(object, QtGui.QImage)
+    def on_loaded(self, item, image):
+        if self.pending.pop(item, None) is None:
+            # Canceled
+            return
+        self.apply(item, image)
+
+    def apply(self, item, image):
+        if item.preview_loader is not self:
+            return
+        if image.isNull():
+            logger.warning(f'Keeping preview of {item}')
+            self.failed.add(item)
+            return
+        item.set_full_resolution(image)
+
+    def clear(self):
+        """Cancels all pending loads, e.g. when the scene is cleared.
+
+        Downloads that are running already finish in the background;
+        their results are ignored.
+        """
+
+        for future in self.pending.values():
+            future.cancel()
+        self.pending = {}
+        self.failed = set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def close(self):
+        """Cancels all pending loads and waits for the running downloads
+        to finish, e.g. when quitting."""
+
+        executor = self._executor
+        self.clear()
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -0,0 +1,211 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Snapshots of the scene's changes, for syncing them in the background.
+
+A snapshot is taken on the GUI thread and contains plain values only,
+no items, so that it can be sent to the cloud from another thread. The
+outcome is collected in a :class:`SyncResult`, which is applied to the
+items and the change journal on the GUI thread again.
+"""
+
+from collections import namedtuple
+import copy
+import logging
+import os.path
+
+from PyQt6 import QtCore
+from PyQt6.QtCore import Qt
+
+from dreamboard import constants
+from dreamboard.cloud.journal import image_fields
+from dreamboard.items import DreambPixmapItem
+
+
+logger = logging.getLogger(__name__)
+
+
+#: A changed image. ``key`` is the index of its item in the changes,
+#: ``image`` is only set for new images.
+ImageSnapshot = namedtuple(
+    'ImageSnapshot',
+    ('key', 'image_id', 'in_scene', 'filename', 'fields', 'image'))
+
+#: The changes of a board. ``synced`` is the board's last synced state,
+#: ``presets`` is ``None`` if the presets haven't changed.
+SyncSnapshot = namedtuple(
+    'SyncSnapshot',
+    ('board_id', 'board_name', 'synced', 'presets', 'images'))
+
+
+def image_filename(item):
+    filepath = os.path.basename(item.filename)
+    return filepath.replace(" ", "-").lower()
+
+
+def image_to_png(image):
+    """Encodes a ``QImage`` as PNG. Unlike pixmaps, images can be
+    encoded outside of the GUI thread."""
+
+    return encode_image(image, 'PNG')
+
+
+def encode_image(image, fmt, quality=-1):
+    barray = QtCore.QByteArray()
+    buffer = QtCore.QBuffer(barray)
+    buffer.open(QtCore.QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, fmt, quality)
+    return barray.data()
+
+
+def image_to_preview(image, size=constants.PREVIEW_SIZE):
+    """Encodes a downscaled preview of a ``QImage``: as JPEG, or as PNG
+    if the image has an alpha channel.
+
+    :return: The data and its format (``'jpg'`` or ``'png'``), or
+        ``None`` if the image is small enough to be its own preview
+    """
+
+    if max(image.width(), image.height()) <= size:
+        return None
+    preview = image.scaled(size, size,
+                           Qt.AspectRatioMode.KeepAspectRatio,
+                           Qt.TransformationMode.SmoothTransformation)
+    if image.hasAlphaChannel():
+        return encode_image(preview, 'PNG'), 'png'
+    return (encode_image(preview, 'JPG', constants.PREVIEW_JPEG_QUALITY),
+            'jpg')
+
+
+def take_snapshot(scene, presets, boards, board_id):
+    """Takes the changes out of the scene's change journal.
+
+    :return: The snapshot and the journal's changes, which are needed to
+        apply the result, or ``None`` if there is nothing to sync
+    """
+
+    journal = scene.change_journal
+    if journal.is_empty():
+        logger.debug('No local changes, skipping sync.')
+        return None
+    if not board_id:
+        logger.info('No current board, nothing to save.')
+        return None
+    if journal.board_id != board_id:
+        # E.g. the board's images couldn't be loaded
+        journal.reset(board_id)
+
+    changes = journal.take()
+    changes.items = [item for item in changes.items
+                     if isinstance(item, DreambPixmapItem)]
+    images = []
+    for key, item in enumerate(changes.items):
+        image_id = item.data(0)
+        in_scene = item.scene() is scene
+        new = in_scene and image_id not in journal.synced
+        if new:
+            item.ensure_full_resolution()
+        images.append(ImageSnapshot(
+            key=key,
+            image_id=image_id,
+            in_scene=in_scene,
+            filename=image_filename(item) if new else None,
+            fields=image_fields(item) if in_scene else None,
+            image=item.pixmap().toImage() if new else None))
+
+    board_name = next(
+        (b['name'] for b in boards or [] if b['id'] == board_id), None)
+    snapshot = SyncSnapshot(
+        board_id=board_id,
+        board_name=board_name,
+        synced=copy.deepcopy(journal.synced),
+        presets=copy.deepcopy(presets) if changes.presets else None,
+        images=tuple(images))
+    return snapshot, changes
+
+
+class SyncResult:
+    """What has been synced of a snapshot."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        #: ``False`` if the sync failed as a whole
+        self.complete = False
+        #: The id of the board in the cloud, if it has been created
+        self.new_board_id = None
+        #: Image ids and synced fields of new and changed images, by key
+        self.uploaded = {}
+        self.updated = {}
+        #: Ids of deleted images, by key
+        self.deleted = {}
+        #: Keys of the images that couldn't be synced
+        self.failed = []
+        #: New preset ids, by their local id
+        self.preset_ids = {}
+        self.presets_failed = False
+        #: Number of Firestore requests and of uploaded files
+        self.round_trips = 0
+        self.uploads = 0
+
+    def fail(self, write_keys):
+        """Marks the writes with the given keys as failed.
+
+        :param write_keys: ``('image', key)`` or ``('preset', id)``
+        """
+
+        for kind, key in write_keys:
+            if kind == 'preset':
+                self.preset_ids.pop(key, None)
+                self.presets_failed = True
+                continue
+            for synced in (self.uploaded, self.updated, self.deleted):
+                synced.pop(key, None)
+            self.failed.append(key)
+
+
+def apply_result(scene, changes, result, presets=None, boards=None):
+    """Applies the result of a sync to the scene's change journal and
+    items, and new ids to the presets and boards."""
+
+    journal = scene.change_journal
+    if not result.complete:
+        # Try again next time
+        journal.restore(changes)
+        return
+
+    old_board_id = result.snapshot.board_id
+    if result.new_board_id:
+        journal.reset(result.new_board_id, {})
+        for board in boards or []:
+            if board['id'] == old_board_id:
+                board['id'] = result.new_board_id
+
+    for key, (image_id, fields) in result.uploaded.items():
+        changes.items[key].setData(0, image_id)
+        journal.mark_synced(image_id, fields)
+    for image_id, fields in result.updated.values():
+        journal.mark_synced(image_id, fields)
+    for image_id in result.deleted.values():
+        journal.forget(image_id)
+    journal.record(changes.items[key] for key in result.failed)
+    if result.presets_failed:
+        journal.record_presets()
+
+    if presets is not None:
+        for old_id, new_id in result.preset_ids.items():
+            if old_id in presets:
+                presets[new_id] = presets.pop(old_id)
+
+    journal.save_state()
@@ -0,0 +1,157 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Syncing the board to the cloud in a background thread."""
+
+import logging
+
+from PyQt6 import QtCore
+
+from dreamboard.cloud.firebase_operations import sync_snapshot
+from dreamboard.cloud.snapshot import SyncResult, apply_result, take_snapshot
+
+
+logger = logging.getLogger(__name__)
+
+
+class CloudSyncWorker(QtCore.QThread):
+    """Sends a snapshot to the cloud and emits ``synced`` with itself
+    when done; the result is in ``result``."""
+
+    progress = QtCore.pyqtSignal(int)
+    synced = QtCore.pyqtSignal(object)
+
+    def __init__(self, snapshot, changes, parent=None):
+        super().__init__(parent)
+        self.snapshot = snapshot
+        self.changes = changes
+        self.result = None
+
+    def run(self):
+        try:
+            self.result = sync_snapshot(self.snapshot, worker=self)
+        except Exception as e:
+            logger.error('Error syncing board to cloud with error: ' + str(e))
+            self.result = SyncResult(self.snapshot)
+        self.synced.emit(self)
+
+
+class CloudSync(QtCore.QObject):
+    """Syncs the scene's changes to the cloud, one run at a time.
+
+    The changes are taken from the scene on the GUI thread and sent in a
+    :class:`CloudSyncWorker`. The result, e.g. ids of new images and
+    boards, is applied back on the GUI thread via a queued signal.
+
+    :param main_window: Provides the ``presets``, ``boards`` and
+        ``current_board``
+    """
+
+    def __init__(self, scene, main_window):
+        super().__init__()
+        self.scene = scene
+        self.main_window = main_window
+        self.worker = None
+        # Waiting for all changes up to now to be synced, see sync_then
+        self._callbacks = []
+        # The run that includes the last of those changes
+        self._last_worker = None
+
+    def is_running(self):
+        return self.worker is not None
+
+    def start(self):
+        """Starts syncing in the background, unless the previous run is
+        still in flight or there is nothing to sync.
+
+        :return: ``True`` if a run has been started
+        """
+
+        if self.is_running():
+            logger.debug('Previous sync still running, skipping.')
+            return False
+        taken = self._take_snapshot()
+        if taken is None:
+            return False
+        # Owned by this object, so that dropping the reference once the
+        # result is applied doesn't destroy the still running thread
+        self.worker = CloudSyncWorker(*taken, parent=self)
+        self.worker.synced.connect(
+            self.on_synced, QtCore.Qt.ConnectionType.QueuedConnection)
+        self.worker.finished.connect(self.worker.deleteLater)
+        self.worker.start()
+        return True
+
+    def wait(self):
+        """Waits for a running sync and applies its result."""
+
+        worker = self.worker
+        if worker is not None:
+            worker.wait()
+            self.on_synced(worker)
+
+    def sync_then(self, callback):
+        """Syncs all changes made so far in the background and calls
+        ``callback`` on the GUI thread when done, e.g. to clear the scene.
+
+        The callback is called whether or not the sync succeeded.
+        """
+
+        self._callbacks.append(callback)
+        if not self.is_running():
+            self._sync_for_callbacks()
+
+    def _sync_for_callbacks(self):
+        if self.start():
+            self._last_worker = self.worker
+        else:
+            # Nothing (left) to sync
+            self._run_callbacks()
+
+    def _run_callbacks(self):
+        callbacks = self._callbacks
+        self._callbacks = []
+        self._last_worker = None
+        for callback in callbacks:
+            callback()
+
+    @QtCore.pyqtSlot(object)
+    def on_synced(self, worker):
+        if worker is not self.worker:
+            # Already applied while waiting for the worker
+            return
+        self.worker = None
+        self._apply(worker.changes, worker.result)
+        if self._callbacks:
+            if worker is self._last_worker:
+                # Failed changes are retried later, not before going on
+                self._run_callbacks()
+            else:
+                # Changes made while this run was in flight
+                self._sync_for_callbacks()
+
+    def _take_snapshot(self):
+        return take_snapshot(self.scene,
+                             self.main_window.presets,
+                             self.main_window.boards,
+                             self.main_window.current_board)
+
+    def _apply(self, changes, result):
+        apply_result(self.scene, changes, result,
+                     self.main_window.presets, self.main_window.boards)
+        old_board_id = result.snapshot.board_id
+        if (result.new_board_id
+                and self.main_window.current_board == old_board_id):
+            self.main_window.current_board = result.new_board_id
@@ -0,0 +1,335 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Parallel, resumable uploads of image files.
+
+Files up to ``UPLOAD_CHUNK_SIZE`` are uploaded in one request, larger
+ones in chunks, continuing from what the server has received after a
+failure. Failed requests are retried with exponential backoff.
+
+The storage backends have a common interface, so that uploads can go to
+a Cloud Storage bucket (:class:`BucketStorage`) or to a local directory
+(:class:`LocalStorage`).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import os.path
+import random
+import re
+import threading
+import time
+import uuid
+
+from google.api_core.exceptions import ServerError, TooManyRequests
+from PyQt6 import QtCore
+import requests
+
+from dreamboard import constants
+
+
+logger = logging.getLogger(__name__)
+
+
+class UploadError(Exception):
+    pass
+
+
+class TransientUploadError(UploadError):
+    """An error that might go away when trying again."""
+    pass
+
+
+class UploadCanceled(UploadError):
+    pass
+
+
+RETRY_ERRORS = (TransientUploadError, OSError, ServerError, TooManyRequests)
+
+
+def backoff_delay(attempt, delay=constants.UPLOAD_RETRY_DELAY_SEC):
+    """Time to wait before the given retry, starting at 1.
+
+    The delay doubles with each attempt and is randomised a bit, so that
+    parallel uploads don't retry all at the same time.
+    """
+
+    return delay * 2 ** (attempt - 1) * random.uniform(0.5, 1)
+
+
+def _wait_for_retry(attempt, retries, error, canceled=None):
+    if attempt > retries or (canceled and canceled()):
+        raise error
+    delay = backoff_delay(attempt)
+    logger.warning(f'Upload request failed: {error}; '
+                   f'retrying in {delay:.1f}s ({attempt}/{retries})')
+    time.sleep(delay)
+
+
+def with_retries(func, retries=constants.UPLOAD_RETRIES, canceled=None):
+    """Calls ``func`` until it succeeds, at most ``retries`` more times
+    if it fails with a transient error."""
+
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except RETRY_ERRORS as e:
+            attempt += 1
+            _wait_for_retry(attempt, retries, e, canceled)
+
+
+def upload_blob(storage, name, data, content_type='image/png',
+                progress=None, canceled=None,
+                chunk_size=constants.UPLOAD_CHUNK_SIZE,
+                retries=constants.UPLOAD_RETRIES):
+    """Uploads ``data`` to the storage under the given name.
+
+    :param progress: Called with the number of bytes uploaded so far and
+        the total size
+    :param canceled: Called between requests; the upload stops with
+        :class:`UploadCanceled` if it returns ``True``
+    """
+
+    size = len(data)
+    if size <= chunk_size:
+        with_retries(lambda: storage.upload(name, data, content_type),
+                     retries, canceled)
+        if progress:
+            progress(size, size)
+        return
+
+    session = with_retries(
+        lambda: storage.start_upload(name, content_type, size),
+        retries, canceled)
+    offset = 0
+    attempt = 0
+    while offset < size:
+        if canceled and canceled():
+            raise UploadCanceled(name)
+        try:
+            if attempt:
+                # The server might have received some of the failed chunk
+                offset = storage.query_offset(session, size)
+            if offset < size:
+                offset = storage.upload_chunk(
+                    session, data[offset:offset + chunk_size], offset, size)
+        except RETRY_ERRORS as e:
+            attempt += 1
+            _wait_for_retry(attempt, retries, e, canceled)
+            continue
+        attempt = 0
+        if progress:
+            progress(offset, size)
+
+
+class BucketStorage:
+    """Uploads to a Cloud Storage bucket, using the resumable upload
+    protocol for chunked uploads."""
+
+    def __init__(self, bucket, timeout=60):
+        self.bucket = bucket
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def exists(self, name):
+        return self.bucket.blob(name).exists(timeout=self.timeout)
+
+    def upload(self, name, data, content_type):
+        self.bucket.blob(name).upload_from_string(
+            data, content_type=content_type, timeout=self.timeout)
+
+    def start_upload(self, name, content_type, size):
+        """Starts a resumable upload and returns its session URL."""
+        return self.bucket.blob(name).create_resumable_upload_session(
+            content_type=content_type, size=size, timeout=self.timeout)
+
+    def upload_chunk(self, session, data, offset, size):
+        """Sends a chunk and returns the number of bytes the server has
+        persisted so far."""
+
+        end = offset + len(data) - 1
+        response = self.session.put(
+            session,
+            data=data,
+            headers={'Content-Range': f'bytes {offset}-{end}/{size}'},
+            timeout=self.timeout)
+        return self.persisted_size(response, size)
+
+    def query_offset(self, session, size):
+        response = self.session.put(
+            session,
+            data=b'',
+            headers={'Content-Range': f'bytes */{size}'},
+            timeout=self.timeout)
+        return self.persisted_size(response, size)
+
+    @staticmethod
+    def persisted_size(response, size):
+        status = response.status_code
+        if status in (200, 201):
+            return size
+        if status == 308:
+            # Incomplete; there is no range if nothing has been persisted
+            match = re.match(r'bytes=0-(\d+)',
+                             response.headers.get('Range', ''))
+            return int(match.group(1)) + 1 if match else 0
+        message = f'Upload request failed with status {status}'
+        if status == 429 or status >= 500:
+            raise TransientUploadError(message)
+        raise UploadError(message)
+
+
+class LocalStorage:
+    """Stores uploads as files in a local directory, e.g. for testing or
+    working without a connection."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def upload(self, name, data, content_type):
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        with open(self.path(name), 'wb') as f:
+            f.write(data)
+
+    def start_upload(self, name, content_type, size):
+        session = str(uuid.uuid4())
+        with self.lock:
+            self.sessions[session] = (name, bytearray())
+        return session
+
+    def upload_chunk(self, session, data, offset, size):
+        with self.lock:
+            if session not in self.sessions:
+                raise UploadError(f'Unknown upload session {session}')
+            name, received = self.sessions[session]
+            if offset != len(received):
+                raise UploadError(
+                    f'Expected chunk at {len(received)}, got {offset}')
+            received.extend(data)
+            if len(received) < size:
+                return len(received)
+            del self.sessions[session]
+        self.upload(name, bytes(received), None)
+        return size
+
+    def query_offset(self, session, size):
+        with self.lock:
+            if session not in self.sessions:
+                # The upload has been completed
+                return size
+            return len(self.sessions[session][1])
+
+
+class UploadPool(QtCore.QObject):
+    """Uploads files in background threads, at most
+    ``UPLOAD_CONCURRENCY`` at the same time.
+
+    The progress of each file is reported via signals, which can be
+    connected to widgets in the GUI thread. The signals identify files
+    by their name in the storage, which is unique. Only ``started``
+    carries the file's label for display, which defaults to its name.
+    """
+
+    #: Name, label and size of a file when its upload starts
+    started = QtCore.pyqtSignal(str, str, int)
+    #: Name, bytes uploaded so far and size
+    progress = QtCore.pyqtSignal(str, int, int)
+    #: Name and whether the upload was successful
+    file_finished = QtCore.pyqtSignal(str, bool)
+
+    def __init__(self, storage=None,
+                 max_workers=constants.UPLOAD_CONCURRENCY):
+        super().__init__()
+        self.storage = storage
+        self.max_workers = max_workers
+        self._executor = None
+        self._canceled = threading.Event()
+        self._lock = threading.Lock()
+        #: Uploads of content-addressed files, by name
+        self._shared = {}
+
+    def submit(self, name, data, content_type='image/png', label=None,
+               skip_existing=False):
+        """Starts uploading ``data`` under the given name.
+
+        :param skip_existing: For files named after their content: skip
+            the upload if the storage has the file already. Submitting
+            such a file again reuses the first upload.
+        :return: A :class:`~concurrent.futures.Future` which raises the
+            upload's error, if any. Its result is ``False`` if the
+            upload has been skipped, ``True`` otherwise
+        """
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.max_workers, thread_name_prefix='upload')
+            if not skip_existing:
+                return self._executor.submit(
+                    self._upload, name, data, content_type, label or name)
+            future = self._shared.get(name)
+            if (future is None or future.cancelled()
+                    or (future.done() and future.exception())):
+                future = self._executor.submit(
+                    self._upload_unless_exists, name, data, content_type,
+                    label or name)
+                self._shared[name] = future
+            return future
+
+    def _upload_unless_exists(self, name, data, content_type, label):
+        if with_retries(lambda: self.storage.exists(name),
+                        canceled=self._canceled.is_set):
+            logger.debug(f'{name} exists in cloud already.')
+            return False
+        return self._upload(name, data, content_type, label)
+
+    def _upload(self, name, data, content_type, label):
+        self.started.emit(name, label, len(data))
+        try:
+            upload_blob(
+                self.storage, name, data, content_type,
+                progress=lambda sent, size: self.progress.emit(
+                    name, sent, size),
+                canceled=self._canceled.is_set)
+        except Exception as e:
+            logger.error(f'Error uploading {name} to cloud with error: {e}')
+            self.file_finished.emit(name, False)
+            raise
+        logger.debug(f'Uploaded {name} to cloud.')
+        self.file_finished.emit(name, True)
+        return True
+
+    def close(self):
+        """Cancels all uploads and waits for the running requests to
+        finish. The pool can be used again afterwards."""
+
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._canceled.set()
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        self._shared = {}
+        self._canceled.clear()
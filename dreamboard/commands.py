@@ -13,7 +13,32 @@
 # You should have received a copy of the GNU General Public License
 # along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
 
-from PyQt6 import QtCore, QtGui
+import math
+import time
+
+from PyQt6 import QtGui
+
+import numpy as np
+
+from dreamboard import batch_transform
+from dreamboard import constants
+
+
+def items_memory_cost(items):
+    """The bytes of pixel data of the given items that are kept alive
+    only by undo commands, i.e. of items that aren't in a scene."""
+
+    return sum(item.memory_cost() for item in items
+               if not item.scene() and hasattr(item, 'memory_cost'))
+
+
+def spill_items(items, store):
+    """Moves the pixel data of the given items that aren't in a scene to
+    ``store``. It is restored when they get added to a scene again."""
+
+    for item in items:
+        if not item.scene() and hasattr(item, 'spill_pixmap'):
+            item.spill_pixmap(store)
 
 
 class InsertItems(QtGui.QUndoCommand):
@@ -35,19 +60,27 @@ class InsertItems(QtGui.QUndoCommand):
             for item in self.items:
                 self.old_positions.append(item.pos())
                 item.setPos(item.pos() + self.position - rect.center())
-        self.scene.clearSelection()
-        for item in self.items:
-            self.scene.addItem(item)
-            item.setSelected(True)
+        with self.scene.batch_selection():
+            self.scene.clearSelection()
+            for item in self.items:
+                self.scene.addItem(item)
+                item.setSelected(True)
 
     def undo(self):
-        self.scene.clearSelection()
-        for item in self.items:
-            self.scene.removeItem(item)
+        with self.scene.batch_selection():
+            self.scene.clearSelection()
+            for item in self.items:
+                self.scene.removeItem(item)
         if self.position:
             for item, pos in zip(self.items, self.old_positions):
                 item.setPos(pos)
 
+    def memory_cost(self):
+        return items_memory_cost(self.items)
+
+    def spill(self, store):
+        spill_items(self.items, store)
+
 
 class DeleteItems(QtGui.QUndoCommand):
 
@@ -61,17 +94,68 @@ class DeleteItems(QtGui.QUndoCommand):
             self.scene.removeItem(item)
 
     def undo(self):
-        self.scene.clearSelection()
-        for item in self.items:
-            item.setSelected(True)
-            self.scene.addItem(item)
+        with self.scene.batch_selection():
+            self.scene.clearSelection()
+            for item in self.items:
+                item.setSelected(True)
+                self.scene.addItem(item)
 
+    def memory_cost(self):
+        return items_memory_cost(self.items)
 
-class MoveItemsBy(QtGui.QUndoCommand):
+    def spill(self, store):
+        spill_items(self.items, store)
 
-    def __init__(self, items, delta, ignore_first_redo=False):
-        super().__init__('Move items')
+
+class MergeableTransformCommand(QtGui.QUndoCommand):
+    """Base for transformations that get merged into one undo step when
+    the same items are transformed repeatedly within
+    ``UNDO_MERGE_INTERVAL_MS``.
+
+    Subclasses need to set ``ID`` and override ``merge`` and, if steps
+    can cancel each other out, ``is_noop``.
+    """
+
+    ID = -1
+
+    def __init__(self, text, items):
+        super().__init__(text)
         self.items = items
+        self.timestamp = time.monotonic()
+
+    def id(self):
+        return self.ID
+
+    def merge(self, other):
+        """Adds ``other``'s transformation to this one if possible.
+
+        :return: ``True`` on success
+        """
+        return False
+
+    def is_noop(self):
+        """Whether the transformation has no effect (anymore)."""
+        return False
+
+    def mergeWith(self, other):
+        interval = (other.timestamp - self.timestamp) * 1000
+        if (other.id() != self.id()
+                or interval > constants.UNDO_MERGE_INTERVAL_MS
+                or set(other.items) != set(self.items)
+                or not self.merge(other)):
+            return False
+        self.timestamp = other.timestamp
+        # Lets the stack drop steps that cancel each other out
+        self.setObsolete(self.is_noop())
+        return True
+
+
+class MoveItemsBy(MergeableTransformCommand):
+
+    ID = 1
+
+    def __init__(self, items, delta, ignore_first_redo=False):
+        super().__init__('Move items', items)
         self.delta = delta
         self.ignore_first_redo = ignore_first_redo
 
@@ -86,14 +170,22 @@ class MoveItemsBy(QtGui.QUndoCommand):
         for item in self.items:
             item.moveBy(-self.delta.x(), -self.delta.y())
 
+    def merge(self, other):
+        self.delta = self.delta + other.delta
+        return True
 
-class ScaleItemsBy(QtGui.QUndoCommand):
+    def is_noop(self):
+        return self.delta.isNull()
+
+
+class ScaleItemsBy(MergeableTransformCommand):
     """Scale items by a given factor around the given anchor."""
 
+    ID = 2
+
     def __init__(self, items, factor, anchor, ignore_first_redo=False):
-        super().__init__('Scale items')
+        super().__init__('Scale items', items)
         self.ignore_first_redo = ignore_first_redo
-        self.items = items
         self.factor = factor
         self.anchor = anchor
 
@@ -101,23 +193,32 @@ class ScaleItemsBy(QtGui.QUndoCommand):
         if self.ignore_first_redo:
             self.ignore_first_redo = False
             return
-        for item in self.items:
-            item.setScale(item.scale() * self.factor,
-                          item.mapFromScene(self.anchor))
+        batch_transform.scale_items_by(self.items, self.factor, self.anchor)
 
     def undo(self):
-        for item in self.items:
-            item.setScale(item.scale() / self.factor,
-                          item.mapFromScene(self.anchor))
+        batch_transform.scale_items_by(
+            self.items, 1 / self.factor, self.anchor)
 
+    def merge(self, other):
+        # Scaling around different anchors doesn't add up to a
+        # single scale
+        if other.anchor != self.anchor:
+            return False
+        self.factor *= other.factor
+        return True
 
-class RotateItemsBy(QtGui.QUndoCommand):
+    def is_noop(self):
+        return math.isclose(self.factor, 1)
+
+
+class RotateItemsBy(MergeableTransformCommand):
     """Rotate items by a given delta around the given anchor."""
 
+    ID = 3
+
     def __init__(self, items, delta, anchor, ignore_first_redo=False):
-        super().__init__('Rotate items')
+        super().__init__('Rotate items', items)
         self.ignore_first_redo = ignore_first_redo
-        self.items = items
         self.delta = delta
         self.anchor = anchor
 
@@ -125,15 +226,20 @@ class RotateItemsBy(QtGui.QUndoCommand):
         if self.ignore_first_redo:
             self.ignore_first_redo = False
             return
-        for item in self.items:
-            item.setRotation(
-                item.rotation() + self.delta * item.flip(),
-                item.mapFromScene(self.anchor))
+        batch_transform.rotate_items_by(self.items, self.delta, self.anchor)
 
     def undo(self):
-        for item in self.items:
-            item.setRotation(item.rotation() - self.delta * item.flip(),
-                             item.mapFromScene(self.anchor))
+        batch_transform.rotate_items_by(
+            self.items, -self.delta, self.anchor)
+
+    def merge(self, other):
+        if other.anchor != self.anchor:
+            return False
+        self.delta += other.delta
+        return True
+
+    def is_noop(self):
+        return math.isclose(self.delta, 0, abs_tol=1e-9)
 
 
 class NormalizeItems(QtGui.QUndoCommand):
@@ -144,14 +250,14 @@ class NormalizeItems(QtGui.QUndoCommand):
         self.scale_factors = scale_factors
 
     def redo(self):
-        self.old_scale_factors = []
-        for item, factor in zip(self.items, self.scale_factors):
-            self.old_scale_factors.append(item.scale())
-            item.setScale(item.scale() * factor, item.center)
+        self.old_scale_factors = [item.scale() for item in self.items]
+        batch_transform.set_scales_in_place(
+            self.items,
+            np.multiply(self.old_scale_factors, self.scale_factors))
 
     def undo(self):
-        for item, factor in zip(self.items, self.old_scale_factors):
-            item.setScale(factor, item.center)
+        batch_transform.set_scales_in_place(
+            self.items, self.old_scale_factors)
 
 
 class FlipItems(QtGui.QUndoCommand):
@@ -163,8 +269,7 @@ class FlipItems(QtGui.QUndoCommand):
         self.vertical = vertical
 
     def redo(self):
-        for item in self.items:
-            item.do_flip(self.vertical, item.mapFromScene(self.anchor))
+        batch_transform.flip_items(self.items, self.anchor, self.vertical)
 
     def undo(self):
         self.redo()
@@ -276,24 +381,30 @@ class ResetTransforms(QtGui.QUndoCommand):
 
 class ArrangeItems(QtGui.QUndoCommand):
 
-    def __init__(self, scene, items, positions):
+    def __init__(self, scene, items, positions, scales=None):
         super().__init__('Arrange items')
         self.scene = scene
         self.items = items
         self.positions = positions
+        self.scales = scales
 
     def redo(self):
-        self.old_positions = []
-        for item, pos in zip(self.items, self.positions):
-            self.old_positions.append(item.pos())
-            orig_topleft = item.mapToScene(QtCore.QPointF(0, 0))
-            rect_topleft = self.scene.itemsBoundingRect(
-                items=[item]).topLeft()
-            item.setPos(pos + orig_topleft - rect_topleft)
+        self.old_positions = [item.pos() for item in self.items]
+        if self.scales is not None:
+            self.old_scales = [item.scale() for item in self.items]
+            batch_transform.set_scales_in_place(self.items, self.scales)
+        batch_transform.move_bounds_to(
+            self.items,
+            [pos.x() for pos in self.positions],
+            [pos.y() for pos in self.positions])
 
     def undo(self):
-        for item, pos in zip(self.items, self.old_positions):
-            item.setPos(pos)
+        if self.scales is not None:
+            batch_transform.set_scales_in_place(self.items, self.old_scales)
+        batch_transform.set_positions(
+            self.items,
+            [pos.x() for pos in self.old_positions],
+            [pos.y() for pos in self.old_positions])
 
 
 class CropItem(QtGui.QUndoCommand):
@@ -40,3 +40,47 @@ COLORS = {
 }
 
 SAVE_INTERVAL_SEC = 60
+# Board metadata fetched from the cloud is reused for this long
+BOARD_CACHE_TTL_SEC = 300
+# Number of images uploaded to the cloud at the same time
+UPLOAD_CONCURRENCY = 4
+# Images larger than this are uploaded in chunks of this size, so that
+# a failed upload can be resumed. Must be a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = 2 * 1024 * 1024
+# Failed requests of an upload are retried this often, waiting twice as
+# long as before each time
+UPLOAD_RETRIES = 5
+UPLOAD_RETRY_DELAY_SEC = 0.5
+# Maximum number of writes in one Firestore write batch
+FIRESTORE_BATCH_LIMIT = 500
+# Number of images downloaded and decoded at the same time when a board
+# is loaded from the cloud
+DOWNLOAD_CONCURRENCY = 8
+# Size limit of the local cache of images downloaded from the cloud, in
+# bytes. The least recently used images are evicted first
+BLOB_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# Images are uploaded with a preview downscaled to at most this many
+# pixels per side, which is loaded first when a board is opened
+PREVIEW_SIZE = 256
+PREVIEW_JPEG_QUALITY = 85
+
+# Pan, zoom and drag input is applied at most once per frame
+FRAME_INTERVAL_MS = 16
+# Portion of the remaining zoom applied per frame when zoom is animated
+ZOOM_ANIMATION_STEP = 0.5
+# Time without input after which the view is re-rendered in high quality
+RENDER_IDLE_MS = 150
+# Time budget per idle step for building cached viewport tiles
+TILE_BUILD_BUDGET_MS = 8
+# Pixel data of deleted items kept in memory for undo, in bytes. Beyond
+# that, it is moved to a temporary file
+UNDO_MEMORY_LIMIT = 512 * 1024 * 1024
+# Repeated moves, scales or rotations of the same items within this
+# interval are merged into one undo step
+UNDO_MERGE_INTERVAL_MS = 1500
+# Time after which the search for a tighter packing of items stops
+# and the best packing found so far is used
+PACK_TIME_BUDGET_MS = 1000
+# Up to this many items are packed on the GUI thread, larger
+# selections are packed in a background thread
+PACK_SYNC_MAX_ITEMS = 24
@@ -239,21 +239,23 @@ class SQLiteIO:
                 self.write()
 
     def write_data(self):
-        to_delete = self.fetchall('SELECT id from ITEMS')
+        to_delete = set(self.fetchall('SELECT id from ITEMS'))
         to_save = list(self.scene.items_for_save())
+        to_update = []
         if self.worker:
             self.worker.begin_processing.emit(len(to_save))
         for i, item in enumerate(to_save):
             logger.debug(f'Saving {item} with id {item.save_id}')
             if item.save_id:
-                self.update_item(item)
-                to_delete.remove((item.save_id,))
+                to_update.append(item)
+                to_delete.discard((item.save_id,))
             else:
                 self.insert_item(item)
             if self.worker:
                 self.worker.progress.emit(i)
                 if self.worker.canceled:
                     break
+        self.update_items(to_update)
         self.delete_items(to_delete)
         self.connection.commit()
         if self.worker:
@@ -294,12 +296,23 @@ class SQLiteIO:
         We only update the item data, not the pixmap data, as pixmap
         data never changes and is also time-consuming to save.
         """
-        self.ex(
+        self.update_items([item])
+
+    def update_items(self, items):
+        """Update the data of several items in one go.
+
+        The transformation values are taken from the scene's transform
+        store in a single array operation.
+        """
+        if not items:
+            return
+        values = self.scene.transform_store.get(
+            items,
+            columns=('x', 'y', 'z', 'scale', 'rotation', 'flip')).tolist()
+        self.exmany(
             'UPDATE items SET x=?, y=?, z=?, scale=?, rotation=?, flip=?, '
             'data=? '
             'WHERE id=?',
-            (item.pos().x(), item.pos().y(), item.zValue(), item.scale(),
-             item.rotation(), item.flip(),
-             json.dumps(item.get_extra_save_data()),
-             item.save_id))
+            ((*row, json.dumps(item.get_extra_save_data()), item.save_id)
+             for item, row in zip(items, values)))
         self.connection.commit()
@@ -44,6 +44,13 @@ def register_item(cls):
 class DreambItemMixin(SelectableMixin):
     """Base for all items added by the user."""
 
+    GEOMETRY_CHANGES = (
+        QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged,
+        QGraphicsItem.GraphicsItemChange.ItemTransformHasChanged,
+        QGraphicsItem.GraphicsItemChange.ItemRotationHasChanged,
+        QGraphicsItem.GraphicsItemChange.ItemScaleHasChanged,
+    )
+
     def set_pos_center(self, pos):
         """Sets the position using the item's center as the origin point."""
         self.setPos(pos - self.center_scene_coords)
@@ -81,18 +88,52 @@ class DreambItemMixin(SelectableMixin):
         if kwargs.get('flip', 1) != self.flip():
             self.do_flip()
 
+    def on_geometry_change(self):
+        """Lets the scene know that the item's extent in scene coordinates
+        may have changed."""
+
+        if self.scene():
+            self.scene().on_item_geometry_change(self)
+
+    def itemChange(self, change, value):
+        if change in self.GEOMETRY_CHANGES:
+            self.on_geometry_change()
+        value = super().itemChange(change, value)
+        if (change == QGraphicsItem.GraphicsItemChange.ItemSelectedChange
+                and self.scene()):
+            # The scene emits selectionChanged before the item gets
+            # notified with ItemSelectedHasChanged, so we need to
+            # update the scene's selection state beforehand.
+            self.scene().on_item_selected_change(self, bool(value))
+        return value
+
 
 @register_item
 class DreambPixmapItem(DreambItemMixin, QtWidgets.QGraphicsPixmapItem):
     """Class for images added by the user."""
 
     TYPE = 'pixmap'
+    POSITION_CHANGES = (
+        QGraphicsItem.GraphicsItemChange.ItemPositionChange,
+        QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged,
+    )
     CROP_HANDLE_SIZE = 15
+    # Don't downscale proxies for fast rendering below this size
+    PROXY_MIN_SIZE = 128
+    INFO_ICON_RECT = QtCore.QRectF(24, 24, 64, 64)
 
     infoIconClicked = QtCore.pyqtSignal(QtWidgets.QGraphicsPixmapItem)
 
     def __init__(self, image, filename=None, info_icon_callback=None):
         super().__init__(QtGui.QPixmap.fromImage(image))
+        self._proxies = {}
+        # Set while the pixmap is a downscaled preview, see set_preview
+        self.preview_loader = None
+        self.preview_source = None
+        self.preview_factor = 1
+        # Set while the pixel data is spilled to disk, see spill_pixmap
+        self.spill_key = None
+        self.spill_store = None
         self.save_id = None
         self.filename = filename
         self.reset_crop()
@@ -103,7 +144,10 @@ class DreambPixmapItem(DreambItemMixin, QtWidgets.QGraphicsPixmapItem):
         self.isNew = False
         self.info_icon_callback = info_icon_callback
         self.init_selectable()
-        self.info_icon = QtGui.QPixmap(os.path.join(current_dir, "assets/icon_info.png"))
+        self.info_icon = QtGui.QPixmap(
+            os.path.join(current_dir, "assets/icon_info.png")).scaled(
+                self.INFO_ICON_RECT.size().toSize(),
+                Qt.AspectRatioMode.KeepAspectRatio)
         self.info_icon_visible = False
 
     @classmethod
@@ -129,6 +173,7 @@ class DreambPixmapItem(DreambItemMixin, QtWidgets.QGraphicsPixmapItem):
         self.prepareGeometryChange()
         self._crop = value
         self.update()
+        self.on_geometry_change()
 
     def bounding_rect_unselected(self):
         if self.crop_mode:
@@ -144,7 +189,14 @@ class DreambPixmapItem(DreambItemMixin, QtWidgets.QGraphicsPixmapItem):
                          self.crop.height()]}
 
     def pixmap_to_bytes(self):
-        """Convert the pixmap data to PNG bytestring."""
+        """Convert the pixmap data to PNG bytestring.
+
+        This runs in the saving thread, so it doesn't load the full
+        image of a preview; that has to happen on the GUI thread before.
+        """
+        if self.is_preview():
+            raise ValueError(f'{self} only has a preview, '
+                             'its full image needs to be loaded first')
         barray = QtCore.QByteArray()
         buffer = QtCore.QBuffer(barray)
         buffer.open(QtCore.QIODevice.OpenModeFlag.WriteOnly)
@@ -154,8 +206,136 @@ class DreambPixmapItem(DreambItemMixin, QtWidgets.QGraphicsPixmapItem):
 
     def setPixmap(self, pixmap):
         super().setPixmap(pixmap)
+        self._proxies = {}
+        self.preview_loader = None
+        self.preview_source = None
+        self.preview_factor = 1
         self.reset_crop()
 
+    def is_preview(self):
+        return self.preview_loader is not None
+
+    def set_preview(self, image, width, height, loader, source=None):
+        """Shows a downscaled preview of an image of the given size.
+
+        The item has the geometry of the full image. Its full resolution
+        is loaded by ``loader``, via ``loader.request(item)`` once the
+        item is shown magnified or ``loader.load_now(item)`` once the
+        pixel data is needed, which call :meth:`set_full_resolution`.
+
+        :param source: Whatever ``loader`` needs to load the image
+        """
+
+        # Bypass setPixmap so that the crop can be set to the full size
+        QtWidgets.QGraphicsPixmapItem.setPixmap(
+            self, QtGui.QPixmap.fromImage(image))
+        self._proxies = {}
+        self.preview_loader = loader
+        self.preview_source = source
+        self.preview_factor = image.width() / width if width else 1
+        self.crop = QtCore.QRectF(0, 0, width, height)
+
+    def set_full_resolution(self, image):
+        """Replaces the preview with the full image, keeping the crop."""
+
+        logger.debug(f'Setting full resolution of {self}')
+        QtWidgets.QGraphicsPixmapItem.setPixmap(
+            self, QtGui.QPixmap.fromImage(image))
+        self._proxies = {}
+        self.preview_loader = None
+        self.preview_source = None
+        self.preview_factor = 1
+        self.update()
+
+    def ensure_full_resolution(self):
+        """Loads the full image now if the item shows a preview."""
+
+        if self.is_preview():
+            self.preview_loader.load_now(self)
+
+    def memory_cost(self):
+        """Approximate size of the pixel data in bytes."""
+        pixmap = self.pixmap()
+        return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+    def spill_pixmap(self, store):
+        """Moves the pixel data to the given
+        :class:`~dreamboard.undo.PixelSpillStore` to free memory.
+
+        Crop and all other properties are kept. The pixel data is read
+        back with :meth:`restore_pixmap`.
+        """
+
+        if self.spill_key is not None or self.pixmap().isNull():
+            return
+        self.spill_key = store.put(self.pixmap().toImage(), owner=self)
+        self.spill_store = store
+        # Bypass setPixmap so that the crop doesn't get reset
+        QtWidgets.QGraphicsPixmapItem.setPixmap(self, QtGui.QPixmap())
+        self._proxies = {}
+
+    def restore_pixmap(self):
+        if self.spill_key is None:
+            return
+        logger.debug(f'Restoring spilled pixel data of {self}')
+        image = self.spill_store.take(self.spill_key)
+        self.spill_key = None
+        self.spill_store = None
+        QtWidgets.QGraphicsPixmapItem.setPixmap(
+            self, QtGui.QPixmap.fromImage(image))
+
+    def get_proxy(self, level_of_detail):
+        """Returns a downscaled copy of the pixmap that is good enough for
+        painting at the given level of detail during interactions, or
+        the pixmap itself if no downscaling is needed.
+
+        Proxies are scaled down by powers of two and cached.
+        """
+
+        pixmap = self.pixmap()
+        size = max(pixmap.width(), pixmap.height())
+        level = 0
+        while (level_of_detail <= 0.5 ** (level + 1)
+               and size / 2 ** (level + 1) >= self.PROXY_MIN_SIZE):
+            level += 1
+        if level == 0:
+            return pixmap
+        if level not in self._proxies:
+            logger.debug(f'Creating level {level} proxy for {self}')
+            self._proxies[level] = pixmap.scaled(
+                max(1, round(pixmap.width() / 2 ** level)),
+                max(1, round(pixmap.height() / 2 ** level)),
+                Qt.AspectRatioMode.IgnoreAspectRatio,
+                Qt.TransformationMode.FastTransformation)
+        return self._proxies[level]
+
+    def paint_pixmap(self, painter, option):
+        """Paints the cropped pixmap, using a low resolution proxy while
+        the scene is in fast rendering mode.
+
+        A preview requests its full resolution once it is shown
+        magnified."""
+
+        pixmap = self.pixmap()
+        proxy = pixmap
+        fast = self.scene() and self.scene().fast_rendering
+        if fast or self.is_preview():
+            lod = option.levelOfDetailFromTransform(painter.worldTransform())
+            if self.is_preview() and lod > self.preview_factor:
+                self.preview_loader.request(self)
+            if fast:
+                proxy = self.get_proxy(lod / self.preview_factor)
+        if proxy.size() != pixmap.size() or self.is_preview():
+            factor_x = proxy.width() / pixmap.width() * self.preview_factor
+            factor_y = proxy.height() / pixmap.height() * self.preview_factor
+            source = QtCore.QRectF(
+                self.crop.x() * factor_x, self.crop.y() * factor_y,
+                self.crop.width() * factor_x,
+                self.crop.height() * factor_y)
+            painter.drawPixmap(self.crop, proxy, source)
+            return
+        painter.drawPixmap(self.crop, pixmap, self.crop)
+
     def pixmap_from_bytes(self, data):
         """Set image pimap from a bytestring."""
         pixmap = QtGui.QPixmap()
@@ -163,6 +343,8 @@ class DreambPixmapItem(DreambItemMixin, QtWidgets.QGraphicsPixmapItem):
         self.setPixmap(pixmap)
 
     def create_copy(self):
+        self.restore_pixmap()
+        self.ensure_full_resolution()
         item = DreambPixmapItem(QtGui.QImage(), self.filename)
         item.setPixmap(self.pixmap())
         item.setPos(self.pos())
@@ -175,6 +357,7 @@ class DreambPixmapItem(DreambItemMixin, QtWidgets.QGraphicsPixmapItem):
         return item
 
     def copy_to_clipboard(self, clipboard):
+        self.ensure_full_resolution()
         clipboard.setPixmap(self.pixmap())
 
     def reset_crop(self):
@@ -312,16 +495,20 @@ class DreambPixmapItem(DreambItemMixin, QtWidgets.QGraphicsPixmapItem):
                 self.draw_crop_rect(painter, handle())
             self.draw_crop_rect(painter, self.crop_temp)
         else:
-            painter.drawPixmap(self.crop, self.pixmap(), self.crop)
-            self.paint_selectable(painter, option, widget)
+            self.paint_pixmap(painter, option)
 
-        if self.is_hovered and self.info_icon:
-            painter.drawPixmap(24, 24, self.info_icon.scaled(QtCore.QSize(64, 64), Qt.AspectRatioMode.KeepAspectRatio))
+    def paint_overlay(self, painter):
+        if not self.crop_mode:
+            super().paint_overlay(painter)
+        if self.is_hovered and not self.info_icon.isNull():
+            painter.drawPixmap(self.INFO_ICON_RECT.topLeft(), self.info_icon)
 
     def enter_crop_mode(self):
         logger.debug(f'Entering crop mode on {self}')
+        self.ensure_full_resolution()
         self.prepareGeometryChange()
         self.crop_mode = True
+        self.on_geometry_change()
         self.crop_temp = QtCore.QRectF(self.crop)
         self.crop_mode_move = None
         self.crop_mode_event_start = None
@@ -336,6 +523,7 @@ class DreambPixmapItem(DreambItemMixin, QtWidgets.QGraphicsPixmapItem):
                 commands.CropItem(self, self.crop_temp))
         self.prepareGeometryChange()
         self.crop_mode = False
+        self.on_geometry_change()
         self.crop_temp = None
         self.crop_mode_move = None
         self.crop_mode_event_start = None
@@ -353,12 +541,16 @@ class DreambPixmapItem(DreambItemMixin, QtWidgets.QGraphicsPixmapItem):
 
     def hoverEnterEvent(self, event):
         self.is_hovered = True
-        self.update()  # Call this to force a repaint
+        if self.scene():
+            self.scene().on_item_hover_change(self, True)
+        self.update_overlay(self.INFO_ICON_RECT)
         super().hoverEnterEvent(event)
 
     def hoverLeaveEvent(self, event):
         self.is_hovered = False
-        self.update()  # Call this to force a repaint
+        if self.scene():
+            self.scene().on_item_hover_change(self, False)
+        self.update_overlay(self.INFO_ICON_RECT)
         super().hoverLeaveEvent(event)
 
     def hoverMoveEvent(self, event):
@@ -380,7 +572,7 @@ class DreambPixmapItem(DreambItemMixin, QtWidgets.QGraphicsPixmapItem):
 
     def mousePressEvent(self, event):
         # x,y, width, height of icon
-        if QtCore.QRectF(24, 24, 64, 64).contains(event.pos()):
+        if self.INFO_ICON_RECT.contains(event.pos()):
             self.showSidebar()
         else:
             # Pass the event to the parent class, so it can be handled normally.
@@ -465,8 +657,14 @@ class DreambPixmapItem(DreambItemMixin, QtWidgets.QGraphicsPixmapItem):
         self.isNew = value
 
     def itemChange(self, change, value):
-        if change == QGraphicsItem.GraphicsItemChange.ItemPositionChange:
+        if change in self.POSITION_CHANGES:
             self.hasChanged = True
+            scene = self.scene()
+            if scene and scene.in_geometry_batch():
+                # Many items are being moved at once; the scene updates
+                # its caches for all of them at the end, so skip the
+                # notifications of the base classes
+                return value
 
         return super().itemChange(change, value)
 
@@ -486,6 +684,7 @@ class DreambTextItem(DreambItemMixin, QtWidgets.QGraphicsTextItem):
         self.is_editable = True
         self.edit_mode = False
         self.setDefaultTextColor(QtGui.QColor(*COLORS['Scene:Text']))
+        self.document().contentsChanged.connect(self.on_geometry_change)
 
     @classmethod
     def create_from_data(cls, **kwargs):
@@ -512,7 +711,6 @@ class DreambTextItem(DreambItemMixin, QtWidgets.QGraphicsTextItem):
         painter.drawRect(QtWidgets.QGraphicsTextItem.boundingRect(self))
         option.state = QtWidgets.QStyle.StateFlag.State_Enabled
         super().paint(painter, option, widget)
-        self.paint_selectable(painter, option, widget)
 
     def create_copy(self):
         item = DreambTextItem(self.toPlainText())
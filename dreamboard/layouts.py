@@ -0,0 +1,159 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Layouts for many items, computed from arrays of item sizes.
+
+Each layout takes an array of shape ``(n, 2)`` with the items' widths
+and heights and returns two arrays: one of the same shape with the top
+left corners of the items, starting at (0, 0), and one of shape
+``(n,)`` with the factors by which the items need to be scaled to
+fit. The positions refer to the scaled sizes. Items are placed in the
+given order. The layouts aim for a roughly square overall shape.
+"""
+
+import logging
+import math
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+def reading_order(bounds):
+    """Indices that sort items by their current location, top to bottom,
+    then left to right.
+
+    :param bounds: Array of shape ``(n, 4)`` with columns left, top,
+        right, bottom
+    """
+
+    return np.lexsort((bounds[:, 0], bounds[:, 1]))
+
+
+def layout_size(sizes, positions):
+    """Width and height of the area covered by the laid out items."""
+
+    if not len(sizes):
+        return (0, 0)
+    far = positions + sizes
+    return tuple(far.max(axis=0).tolist())
+
+
+def grid(sizes, columns=None):
+    """Places items centered in equally sized cells, row by row.
+
+    The cells are as large as the largest item in each dimension.
+    """
+
+    sizes = np.asarray(sizes, dtype=float).reshape(-1, 2)
+    count = len(sizes)
+    if not count:
+        return np.zeros((0, 2)), np.ones(0)
+    cell = sizes.max(axis=0)
+    if columns is None:
+        columns = max(1, min(count, math.ceil(
+            math.sqrt(count * cell[1] / max(cell[0], 1)))))
+    index = np.arange(count)
+    cells = np.stack((index % columns, index // columns), axis=1)
+    return cells * cell + (cell - sizes) / 2, np.ones(count)
+
+
+def masonry(sizes, columns=None):
+    """Places items in columns of equal width, each item going into the
+    currently shortest column.
+
+    The columns are as wide as the widest item, narrower items are
+    centered in their column.
+    """
+
+    sizes = np.asarray(sizes, dtype=float).reshape(-1, 2)
+    count = len(sizes)
+    if not count:
+        return np.zeros((0, 2)), np.ones(0)
+    column_width = sizes[:, 0].max()
+    if columns is None:
+        columns = max(1, min(count, round(
+            math.sqrt(sizes[:, 1].sum() / max(column_width, 1)))))
+
+    # Picking the shortest column depends on all previous items, so
+    # this can't be done as one array operation
+    heights = [0.0] * columns
+    column = np.empty(count, dtype=np.intp)
+    top = np.empty(count)
+    for i, height in enumerate(sizes[:, 1].tolist()):
+        c = heights.index(min(heights))
+        column[i] = c
+        top[i] = heights[c]
+        heights[c] += height
+
+    left = column * column_width + (column_width - sizes[:, 0]) / 2
+    return np.stack((left, top), axis=1), np.ones(count)
+
+
+def justified_rows(sizes, row_width=None):
+    """Places items in rows of equal width. The items of each row are
+    scaled to a shared height at which they fill the row exactly.
+
+    The last row keeps the average item height if its items don't fill
+    it, and stays left aligned.
+    """
+
+    sizes = np.asarray(sizes, dtype=float).reshape(-1, 2)
+    count = len(sizes)
+    if not count:
+        return np.zeros((0, 2)), np.ones(0)
+
+    # Scale all items to the same height first, which only leaves the
+    # widths to distribute
+    heights = np.maximum(sizes[:, 1], 1)
+    height = heights.mean()
+    widths = sizes[:, 0] * height / heights
+    if row_width is None:
+        rows = max(1, round(math.sqrt(widths.sum() / height)))
+        row_width = widths.sum() / rows
+
+    # Break rows greedily: each row takes items until they reach the
+    # row width, then gets scaled down to fit
+    ends = np.cumsum(widths)
+    starts = ends - widths
+    row = np.empty(count, dtype=np.intp)
+    first = 0
+    row_count = 0
+    while first < count:
+        last = np.searchsorted(ends, starts[first] + row_width, side='left')
+        last = min(last + 1, count)
+        row[first:last] = row_count
+        row_count += 1
+        first = last
+
+    row_starts = np.searchsorted(row, np.arange(row_count))
+    used = np.bincount(row, weights=widths, minlength=row_count)
+    row_scales = row_width / used
+    row_scales[-1] = min(row_scales[-1], 1)
+    scales = row_scales[row]
+    left = (starts - starts[row_starts[row]]) * scales
+
+    row_heights = height * row_scales
+    row_tops = np.concatenate(([0], np.cumsum(row_heights)[:-1]))
+    return (np.stack((left, row_tops[row]), axis=1),
+            height / heights * scales)
+
+
+LAYOUTS = {
+    'grid': grid,
+    'masonry': masonry,
+    'rows': justified_rows,
+}
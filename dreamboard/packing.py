@@ -0,0 +1,165 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Packing of item sizes into a square-ish area.
+
+The side length of the smallest square container that ``rpack`` can
+fill is searched within a time budget: The container grows until the
+items fit, then the side length is bisected. Placing all items in a
+single row is always possible, so there is a valid result from the
+start and the search can stop at any time.
+"""
+
+from collections import OrderedDict
+import logging
+import math
+import time
+
+from PyQt6 import QtCore
+
+import rpack
+
+from dreamboard import constants
+
+
+logger = logging.getLogger(__name__)
+
+
+def pack_in_row(sizes):
+    """Positions for placing all items next to each other."""
+
+    positions = []
+    x = 0
+    for width, height in sizes:
+        positions.append((x, 0))
+        x += width
+    return positions
+
+
+def pack(sizes, time_budget=constants.PACK_TIME_BUDGET_MS, canceled=None):
+    """Packs rectangles of the given (width, height) sizes tightly.
+
+    :param time_budget: Time in milliseconds after which the search stops
+        and the best packing found so far is returned. A single packing
+        attempt is not interrupted, so this can be exceeded a bit.
+    :param canceled: Optional callable; the search stops as soon as it
+        returns ``True``.
+    :return: List of (x, y) positions in the order of ``sizes``
+    """
+
+    deadline = time.monotonic() + time_budget / 1000
+    best = pack_in_row(sizes)
+    if not sizes:
+        return best
+
+    # The minimal area the items need if they could be packed optimally
+    min_area = sum(w * h for w, h in sizes)
+    low = max(math.ceil(math.sqrt(min_area)), max(w for w, h in sizes))
+    high = None
+    side = low
+
+    # Packing into a much too large container is slow, while impossible
+    # packings fail fast. So grow the container from the lower bound
+    # until the items fit, then bisect between the last two sizes.
+    attempts = 0
+    while high is None or low < high:
+        if time.monotonic() > deadline:
+            logger.debug(f'Packing time budget exceeded after {attempts} '
+                         f'attempts, container size {high}')
+            break
+        if canceled and canceled():
+            break
+        attempts += 1
+        try:
+            positions = rpack.pack(sizes, max_width=side, max_height=side)
+        except rpack.PackingImpossibleError:
+            low = side + 1
+        else:
+            best = positions
+            high = side
+        if high is None:
+            side = max(math.ceil(side * 1.2), low)
+        else:
+            side = (low + high) // 2
+    return best
+
+
+class PackingCache:
+    """Packing results by the multiset of item sizes.
+
+    Items of the same size are interchangeable, so a result can be reused
+    for the same sizes in any order. Not thread-safe.
+    """
+
+    MAX_ENTRIES = 32
+
+    def __init__(self):
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def sort_order(sizes):
+        return sorted(range(len(sizes)), key=lambda i: sizes[i])
+
+    def get(self, sizes):
+        """The cached positions in the order of ``sizes``, or ``None``."""
+
+        order = self.sort_order(sizes)
+        key = tuple(sizes[i] for i in order)
+        cached = self.entries.get(key)
+        if cached is None:
+            return None
+        self.entries.move_to_end(key)
+        positions = [None] * len(sizes)
+        for i, pos in zip(order, cached):
+            positions[i] = pos
+        return positions
+
+    def put(self, sizes, positions):
+        order = self.sort_order(sizes)
+        key = tuple(sizes[i] for i in order)
+        self.entries[key] = tuple(positions[i] for i in order)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.MAX_ENTRIES:
+            self.entries.popitem(last=False)
+
+
+class PackingWorker(QtCore.QThread):
+    """Packs item sizes in a background thread.
+
+    Emits ``packed`` with itself and the positions unless it has been
+    canceled. The result isn't cached here, since :class:`PackingCache`
+    is only ever used from the GUI thread.
+    """
+
+    packed = QtCore.pyqtSignal(object, list)
+
+    def __init__(self, sizes, parent=None):
+        super().__init__(parent)
+        self.sizes = sizes
+        self.canceled = False
+
+    def run(self):
+        logger.debug(f'Packing {len(self.sizes)} items in background')
+        positions = pack(self.sizes, canceled=lambda: self.canceled)
+        if self.canceled:
+            logger.debug('Packing canceled')
+            return
+        self.packed.emit(self, positions)
+
+    def on_canceled(self):
+        self.canceled = True
@@ -13,29 +13,70 @@
 # You should have received a copy of the GNU General Public License
 # along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
 
+from contextlib import contextmanager
 from queue import Queue
 import logging
-import math
 
 from PyQt6 import QtCore, QtWidgets
 from PyQt6.QtCore import Qt
 
+import numpy as np
 import rpack
 
-from dreamboard import commands
+from dreamboard import commands, constants, layouts, packing
+from dreamboard.cloud.journal import ChangeJournal
 from dreamboard.items import item_registry
 from dreamboard.selection import MultiSelectItem, RubberbandItem
+from dreamboard.spatial_index import SpatialIndex
+from dreamboard.transform_store import TransformStore
 
 
 logger = logging.getLogger(__name__)
 
 
+def get_item_bounds(item):
+    """The item's extent in scene coordinates as a tuple
+    ``(left, top, right, bottom)``, not including selection handles."""
+
+    rect = item.mapRectToScene(item.bounding_rect_unselected())
+    return (rect.left(), rect.top(), rect.right(), rect.bottom())
+
+
+def unite_bounds(bounds1, bounds2):
+    """Returns the smallest bounds containing both ``bounds1`` and
+    ``bounds2``. Either of them can be ``None``."""
+
+    if bounds1 is None:
+        return bounds2
+    if bounds2 is None:
+        return bounds1
+    return (min(bounds1[0], bounds2[0]),
+            min(bounds1[1], bounds2[1]),
+            max(bounds1[2], bounds2[2]),
+            max(bounds1[3], bounds2[3]))
+
+
+def bounds_to_rect(bounds):
+    if bounds is None:
+        return QtCore.QRectF(0, 0, 0, 0)
+    return QtCore.QRectF(QtCore.QPointF(bounds[0], bounds[1]),
+                         QtCore.QPointF(bounds[2], bounds[3]))
+
+
 class DreambGraphicsScene(QtWidgets.QGraphicsScene):
+
+    # Above this many selected items, find the ones needing a selection
+    # overlay via the spatial index instead of testing each of them
+    OVERLAY_QUERY_THRESHOLD = 32
+
     def __init__(self, undo_stack):
         super().__init__()
         self.move_active = False
         self.rubberband_active = False
         self.undo_stack = undo_stack
+        # Local changes not yet synced to the cloud
+        self.change_journal = ChangeJournal()
+        self.change_journal.watch(undo_stack)
         self.max_z = 0
         self.min_z = 0
         self.Z_STEP = 0.001
@@ -47,14 +88,254 @@ class DreambGraphicsScene(QtWidgets.QGraphicsScene):
         self.internal_clipboard = []
         self.edit_item = None
         self.crop_item = None
+        # Set by the view while the user pans, zooms or drags
+        self.fast_rendering = False
+        self.transform_store = TransformStore()
+        self.spatial_index = SpatialIndex(self.transform_store)
+        self._selection_batch_depth = 0
+        self._geometry_batch_depth = 0
+        self.packing_cache = packing.PackingCache()
+        self.packing_worker = None
+        self.packing_items = []
+        self.reset_bounds_cache()
+        self.reset_selection_cache()
 
     def addItem(self, item):
         logger.debug(f'Adding item {item}')
+        if hasattr(item, 'restore_pixmap'):
+            # Pixel data might have been spilled to disk by the undo stack
+            item.restore_pixmap()
         super().addItem(item)
+        if hasattr(item, 'save_id'):
+            self._items_bounds[item] = None
+            self._stale_bounds_items.add(item)
+            self.transform_store.add(item)
+            self.spatial_index.add(item)
+            if item.isSelected():
+                self.on_item_selected_change(item, True)
 
     def removeItem(self, item):
         logger.debug(f'Removing item {item}')
         super().removeItem(item)
+        self.transform_store.remove(item)
+        self.spatial_index.remove(item)
+        self.on_item_selected_change(item, False)
+        self._hovered_items.pop(item, None)
+        if item in self._items_bounds:
+            bounds = self._items_bounds.pop(item)
+            self._stale_bounds_items.discard(item)
+            if self._is_on_hull(bounds):
+                self._bounds_dirty = True
+
+    def clear(self):
+        self.cancel_packing(wait=True)
+        super().clear()
+        self.transform_store.clear()
+        self.spatial_index.clear()
+        self.reset_bounds_cache()
+        self.reset_selection_cache()
+
+    def reset_bounds_cache(self):
+        """Forget all cached item bounds.
+
+        The bounding box of all user items is maintained incrementally
+        as items get added, removed or transformed, so that it doesn't
+        have to be recalculated from all items on every zoom or pan.
+        """
+
+        self._items_bounds = {}
+        self._stale_bounds_items = set()
+        self._bounds = None
+        self._bounds_dirty = False
+
+    def on_item_geometry_change(self, item):
+        """Called by user items when their extent in scene coordinates
+        may have changed. The actual bounds are recalculated lazily."""
+
+        if self._geometry_batch_depth:
+            return
+        if item in self._items_bounds:
+            self._stale_bounds_items.add(item)
+            self.transform_store.mark_stale(item)
+            self.spatial_index.mark_stale(item)
+            if item in self._selected_items:
+                self._selection_rect = None
+
+    def on_items_geometry_change(self, items):
+        """Like :meth:`on_item_geometry_change` for many items at once
+        whose new transformations have been set with
+        :meth:`TransformStore.apply`, so that the store is up to date."""
+
+        items = [item for item in items if item in self._items_bounds]
+        self._stale_bounds_items.update(items)
+        for item in items:
+            self.spatial_index.mark_stale(item)
+        if not self._selected_items.keys().isdisjoint(items):
+            self._selection_rect = None
+
+    def in_geometry_batch(self):
+        """Whether item geometry is currently being changed with
+        :meth:`batch_geometry_change`."""
+
+        return self._geometry_batch_depth > 0
+
+    @contextmanager
+    def batch_geometry_change(self, items):
+        """Context manager for changing the geometry of many items at once
+        with :meth:`TransformStore.apply`.
+
+        The items' individual change notifications are ignored while
+        the context is active; the scene's caches are updated once for
+        all ``items`` at the end.
+        """
+
+        self._geometry_batch_depth += 1
+        try:
+            yield
+        finally:
+            self._geometry_batch_depth -= 1
+            if not self._geometry_batch_depth:
+                self.on_items_geometry_change(items)
+
+    def reset_selection_cache(self):
+        """Forget the cached selection state.
+
+        The selected user items are tracked incrementally via the
+        items' selection changes, so that the frequent checks for the
+        kind of the current selection don't need to filter all
+        selected items each time.
+        """
+
+        # A dict is used as an ordered set
+        self._selected_items = {}
+        self._selection_rect = None
+        # The single selected item showing selection handles
+        self._handles_item = None
+        # Items whose selection overlay needs to be repainted
+        self._overlay_changed_items = {}
+        self._hovered_items = {}
+
+    @contextmanager
+    def batch_selection(self):
+        """Context manager for changing the selection of many items at once.
+
+        ``selectionChanged`` is suppressed while the context is active
+        and emitted once at the end if the selection has changed.
+        Batches can be nested; only the outermost one emits the signal.
+        """
+
+        self._selection_batch_depth += 1
+        if self._selection_batch_depth == 1:
+            before = list(self._selected_items)
+            blocked = self.blockSignals(True)
+        try:
+            yield
+        finally:
+            self._selection_batch_depth -= 1
+            if self._selection_batch_depth == 0:
+                self._update_handles_item()
+                self.blockSignals(blocked)
+                if before != list(self._selected_items):
+                    self.selectionChanged.emit()
+
+    def on_item_selected_change(self, item, value):
+        """Called by user items after their selection state has
+        changed."""
+
+        if value and item.scene() is self:
+            self._selected_items[item] = None
+            self._selection_rect = None
+            self._overlay_changed_items[item] = None
+        elif item in self._selected_items:
+            del self._selected_items[item]
+            self._selection_rect = None
+            self._overlay_changed_items[item] = None
+        if not self._selection_batch_depth:
+            # Batches update the handles once at the end, so that
+            # intermediate single selections don't change any geometry
+            self._update_handles_item()
+
+    def _update_handles_item(self):
+        if len(self._selected_items) == 1:
+            item = next(iter(self._selected_items))
+        else:
+            item = None
+        if item is not self._handles_item:
+            if self._handles_item:
+                self._handles_item.set_handles_margin(False)
+            self._handles_item = item
+            if item:
+                item.set_handles_margin(True)
+
+    def update_overlay(self, rect):
+        """Schedules a repaint of the selection and hover overlay in the
+        given scene rect, without marking any items as changed."""
+
+        for view in self.views():
+            view.update_overlay(rect)
+
+    def overlay_items(self, rect):
+        """The items that need to paint selection or hover chrome in the
+        given scene rect, in painting order."""
+
+        if len(self._selected_items) > self.OVERLAY_QUERY_THRESHOLD:
+            selected = self._selected_items
+            items = [item for item in self.spatial_index.query(rect)
+                     if item in selected]
+        else:
+            items = list(self._selected_items)
+        items.extend(item for item in self._hovered_items
+                     if item not in self._selected_items)
+        if self.multi_select_item.scene():
+            items.append(self.multi_select_item)
+        return items
+
+    def on_item_hover_change(self, item, value):
+        """Called by items that paint hover chrome when the mouse
+        enters or leaves them."""
+
+        if value and item.scene() is self:
+            self._hovered_items[item] = None
+        else:
+            self._hovered_items.pop(item, None)
+
+    def _is_on_hull(self, bounds):
+        """Whether the given item bounds touch the edge of the cached
+        bounding box, i.e. whether the bounding box might shrink when
+        the item is moved or removed."""
+
+        if not bounds or not self._bounds:
+            return False
+        return (bounds[0] <= self._bounds[0]
+                or bounds[1] <= self._bounds[1]
+                or bounds[2] >= self._bounds[2]
+                or bounds[3] >= self._bounds[3])
+
+    def _update_bounds_cache(self):
+        if not self._bounds_dirty:
+            for item in self._stale_bounds_items:
+                if self._is_on_hull(self._items_bounds[item]):
+                    self._bounds_dirty = True
+                    break
+                bounds = get_item_bounds(item)
+                self._items_bounds[item] = bounds
+                self._bounds = unite_bounds(self._bounds, bounds)
+            self._stale_bounds_items.clear()
+
+        if self._bounds_dirty:
+            logger.trace('Recalculating bounding box of all items')
+            self._bounds = None
+            for item in self._items_bounds:
+                bounds = get_item_bounds(item)
+                self._items_bounds[item] = bounds
+                self._bounds = unite_bounds(self._bounds, bounds)
+            self._stale_bounds_items.clear()
+            self._bounds_dirty = False
+
+    def has_items(self):
+        """Checks whether there are any user items in the scene."""
+
+        return bool(self._items_bounds)
 
     def cancel_crop_mode(self):
         """Cancels an ongoing crop mode, if there is any."""
@@ -67,7 +348,8 @@ class DreambGraphicsScene(QtWidgets.QGraphicsScene):
             self.internal_clipboard.append(item)
 
     def paste_from_internal_clipboard(self, position):
-        self.set_selected_all_items(False)
+        # Inserting the copies replaces the current selection
+        self.cancel_crop_mode()
         copies = []
         for item in self.internal_clipboard:
             copy = item.create_copy()
@@ -82,6 +364,7 @@ class DreambGraphicsScene(QtWidgets.QGraphicsScene):
         logger.debug(f'Raise to top, delta: {delta}')
         for item in items:
             item.setZValue(item.zValue() + delta)
+        self.change_journal.record(items)
 
     def lower_to_bottom(self):
         self.cancel_crop_mode()
@@ -92,6 +375,23 @@ class DreambGraphicsScene(QtWidgets.QGraphicsScene):
 
         for item in items:
             item.setZValue(item.zValue() + delta)
+        self.change_journal.record(items)
+
+    def _push_normalize(self, items, values, exponent=1):
+        """Scales items so that ``values`` (one per item) all become their
+        average. ``exponent`` is the power of the item scale the values
+        grow with, e.g. 2 for areas."""
+
+        valid = values > 0
+        if np.count_nonzero(valid) < 2:
+            return
+        avg = values[valid].mean()
+        logger.debug(f'Calculated average {avg}')
+
+        scale_factors = np.ones(len(items))
+        scale_factors[valid] = (avg / values[valid]) ** (1 / exponent)
+        self.undo_stack.push(
+            commands.NormalizeItems(items, scale_factors))
 
     def normalize_width_or_height(self, mode):
         """Scale the selected images to have the same width or height, as
@@ -101,22 +401,10 @@ class DreambGraphicsScene(QtWidgets.QGraphicsScene):
         """
 
         self.cancel_crop_mode()
-        values = []
         items = self.selectedItems(user_only=True)
-        for item in items:
-            rect = self.itemsBoundingRect(items=[item])
-            values.append(getattr(rect, mode)())
-        if len(values) < 2:
-            return
-        avg = sum(values) / len(values)
-        logger.debug(f'Calculated average {mode} {avg}')
-
-        scale_factors = []
-        for item in items:
-            rect = self.itemsBoundingRect(items=[item])
-            scale_factors.append(avg / getattr(rect, mode)())
-        self.undo_stack.push(
-            commands.NormalizeItems(items, scale_factors))
+        sizes = self.transform_store.sizes(items)
+        column = 0 if mode == 'width' else 1
+        self._push_normalize(items, sizes[:, column])
 
     def normalize_height(self):
         """Scale selected images to the same height."""
@@ -133,24 +421,9 @@ class DreambGraphicsScene(QtWidgets.QGraphicsScene):
         """
 
         self.cancel_crop_mode()
-        sizes = []
         items = self.selectedItems(user_only=True)
-        for item in items:
-            rect = self.itemsBoundingRect(items=[item])
-            sizes.append(rect.width() * rect.height())
-
-        if len(sizes) < 2:
-            return
-
-        avg = sum(sizes) / len(sizes)
-        logger.debug(f'Calculated average size {avg}')
-
-        scale_factors = []
-        for item in items:
-            rect = self.itemsBoundingRect(items=[item])
-            scale_factors.append(math.sqrt(avg / rect.width() / rect.height()))
-        self.undo_stack.push(
-            commands.NormalizeItems(items, scale_factors))
+        sizes = self.transform_store.sizes(items)
+        self._push_normalize(items, sizes[:, 0] * sizes[:, 1], exponent=2)
 
     def arrange(self, vertical=False):
         """Arrange items in a line (horizontally or vertically)."""
@@ -194,35 +467,107 @@ class DreambGraphicsScene(QtWidgets.QGraphicsScene):
                                   [r['item'] for r in rects],
                                   positions))
 
-    def arrange_optimal(self):
+    def arrange_layout(self, name):
+        """Arrange items with one of the layouts in
+        :data:`dreamboard.layouts.LAYOUTS`, keeping their current
+        reading order."""
+
         self.cancel_crop_mode()
 
         items = self.selectedItems(user_only=True)
         if len(items) < 2:
             return
 
-        sizes = []
-        for item in items:
-            rect = self.itemsBoundingRect(items=[item])
-            sizes.append((round(rect.width()), round(rect.height())))
+        bounds = self.transform_store.bounds(items)
+        order = layouts.reading_order(bounds)
+        items = [items[i] for i in order]
+        sizes = (bounds[:, 2:] - bounds[:, :2])[order]
+        positions, factors = layouts.LAYOUTS[name](sizes)
+        scales = None
+        if not np.all(factors == 1):
+            sizes = sizes * factors[:, np.newaxis]
+            scales = (self.transform_store.column('scale', items)
+                      * factors).tolist()
 
+        # We want the items to center around the selection's center,
+        # not (0, 0)
+        width, height = layouts.layout_size(sizes, positions)
         center = self.get_selection_center()
+        positions += (round(center.x() - width/2),
+                      round(center.y() - height/2))
+        self.undo_stack.push(commands.ArrangeItems(
+            self, items,
+            [QtCore.QPointF(x, y) for x, y in positions.tolist()],
+            scales))
+
+    def _packing_sizes(self, items):
+        bounds = self.transform_store.bounds(items)
+        sizes = np.round(bounds[:, 2:] - bounds[:, :2]).astype(int)
+        return [tuple(size) for size in sizes.tolist()]
+
+    def cancel_packing(self, wait=False):
+        """Cancels the running background packing, if any.
+
+        :param wait: Also block until all packing threads, including
+            previously canceled ones, have finished, so that they can be
+            destroyed safely.
+        """
 
-        # The minimal area the items need if they could be packed optimally;
-        # we use this as a starting shape for the packing algorithm
-        min_area = sum(map(lambda s: s[0] * s[1], sizes))
-        width = math.ceil(math.sqrt(min_area))
+        if self.packing_worker is not None:
+            self.packing_worker.on_canceled()
+            self.packing_worker = None
+            self.packing_items = []
+        if wait:
+            for worker in self.findChildren(packing.PackingWorker):
+                worker.wait()
 
-        positions = None
-        while not positions:
-            try:
-                positions = rpack.pack(
-                    sizes, max_width=width, max_height=width)
-            except rpack.PackingImpossibleError:
-                width = math.ceil(width * 1.2)
+    def arrange_optimal(self):
+        self.cancel_crop_mode()
+        self.cancel_packing()
 
+        items = self.selectedItems(user_only=True)
+        if len(items) < 2:
+            return
+
+        sizes = self._packing_sizes(items)
+        positions = self.packing_cache.get(sizes)
+        if positions is None and len(items) <= constants.PACK_SYNC_MAX_ITEMS:
+            positions = packing.pack(sizes)
+            self.packing_cache.put(sizes, positions)
+
+        if positions is not None:
+            self._apply_packing(items, sizes, positions)
+            return
+
+        # Large selections are packed in the background; the result is
+        # only applied if the selection hasn't changed in the meantime
+        worker = packing.PackingWorker(sizes, parent=self)
+        worker.packed.connect(self.on_packing_finished)
+        worker.finished.connect(worker.deleteLater)
+        self.packing_worker = worker
+        self.packing_items = items
+        worker.start()
+
+    def on_packing_finished(self, worker, positions):
+        # Cached on the GUI thread, even if the result isn't applied
+        self.packing_cache.put(worker.sizes, positions)
+        if worker is not self.packing_worker or worker.canceled:
+            return
+        self.packing_worker = None
+        items = self.packing_items
+        self.packing_items = []
+        if set(self.selectedItems(user_only=True)) != set(items):
+            logger.debug('Selection changed while packing, ignoring result')
+            return
+        if self._packing_sizes(items) != worker.sizes:
+            logger.debug('Items changed while packing, ignoring result')
+            return
+        self._apply_packing(items, worker.sizes, positions)
+
+    def _apply_packing(self, items, sizes, positions):
         # We want the items to center around the selection's center,
         # not (0, 0)
+        center = self.get_selection_center()
         bounds = rpack.bbox_size(sizes, positions)
         diff = center - QtCore.QPointF(bounds[0]/2, bounds[1]/2)
         positions = [QtCore.QPointF(*pos) + diff for pos in positions]
@@ -250,30 +595,39 @@ class DreambGraphicsScene(QtWidgets.QGraphicsScene):
     def set_selected_all_items(self, value):
         """Sets the selection mode of all items to ``value``."""
         self.cancel_crop_mode()
-        for item in self.items():
-            item.setSelected(value)
+        if not value:
+            self.clearSelection()
+            return
+        with self.batch_selection():
+            for item in self.items():
+                item.setSelected(value)
+
+    def selection_count(self):
+        """The number of currently selected user items."""
+
+        return len(self._selected_items)
 
     def has_selection(self):
         """Checks whether there are currently items selected."""
 
-        return bool(self.selectedItems(user_only=True))
+        return bool(self._selected_items)
 
     def has_single_selection(self):
         """Checks whether there's currently exactly one item selected."""
 
-        return len(self.selectedItems(user_only=True)) == 1
+        return len(self._selected_items) == 1
 
     def has_multi_selection(self):
         """Checks whether there are currently more than one items selected."""
 
-        return len(self.selectedItems(user_only=True)) > 1
+        return len(self._selected_items) > 1
 
     def has_croppable_selection(self):
         """Checks whether the current selection is croppable, i.e. a
         single selection whose item is croppable."""
 
         if self.has_single_selection():
-            return self.selectedItems(user_only=True)[0].is_croppable
+            return next(iter(self._selected_items)).is_croppable
         return False
 
     def mousePressEvent(self, event):
@@ -329,7 +683,7 @@ class DreambGraphicsScene(QtWidgets.QGraphicsScene):
                 self.addItem(self.rubberband_item)
                 self.rubberband_item.bring_to_front()
             self.rubberband_item.fit(self.event_start, event.scenePos())
-            self.setSelectionArea(self.rubberband_item.shape())
+            self.set_selection_rect(self.rubberband_item.rect())
             self.views()[0].reset_previous_transform()
         super().mouseMoveEvent(event)
 
@@ -352,6 +706,59 @@ class DreambGraphicsScene(QtWidgets.QGraphicsScene):
         self.move_active = False
         super().mouseReleaseEvent(event)
 
+    def set_selection_rect(self, rect):
+        """Selects exactly the user items intersecting ``rect``.
+
+        Only the items whose selection state actually changes are
+        touched, so dragging a rubberband over a large board stays cheap.
+        """
+
+        hits = dict.fromkeys(self.spatial_index.query(rect, exact=True))
+        with self.batch_selection():
+            for item in list(self._selected_items):
+                if item not in hits:
+                    item.setSelected(False)
+            for item in hits:
+                if not item.isSelected():
+                    item.setSelected(True)
+
+    def items_in_rect(self, rect):
+        """Returns the user items whose bounding boxes intersect
+        ``rect``, in no particular order."""
+
+        return self.spatial_index.query(rect)
+
+    def nearest_items(self, point, count=1, exclude=None):
+        """Returns up to ``count`` user items closest to ``point``,
+        nearest first."""
+
+        return self.spatial_index.nearest(point, count, exclude)
+
+    def itemAt(self, pos, device_transform):
+        """Re-implemented to look up user items in the spatial index
+        instead of going through Qt's scene index.
+
+        Selected items and the multi select outline are always checked
+        since their selection handles reach beyond their bounds.
+        """
+
+        candidates = dict.fromkeys(self.spatial_index.query_point(pos))
+        candidates.update(dict.fromkeys(self._selected_items))
+        if self.multi_select_item.scene():
+            candidates[self.multi_select_item] = None
+        hits = [item for item in candidates
+                if item.isVisible()
+                and item.contains(item.mapFromScene(pos))]
+        if not hits:
+            return None
+
+        top_z = max(item.zValue() for item in hits)
+        top = [item for item in hits if item.zValue() == top_z]
+        if len(top) > 1:
+            # Let Qt decide the stacking order of items on the same level
+            return super().itemAt(pos, device_transform)
+        return top[0]
+
     def selectedItems(self, user_only=False):
         """If ``user_only`` is set to ``True``, only return items added
         by the user (i.e. no multi select outlines and other UI items).
@@ -359,10 +766,9 @@ class DreambGraphicsScene(QtWidgets.QGraphicsScene):
         User items are items that have a ``save_id`` attribute.
         """
 
-        items = super().selectedItems()
         if user_only:
-            return list(filter(lambda i: hasattr(i, 'save_id'), items))
-        return items
+            return list(self._selected_items)
+        return super().selectedItems()
 
     def items_for_save(self):
 
@@ -379,54 +785,69 @@ class DreambGraphicsScene(QtWidgets.QGraphicsScene):
             item.save_id = None
 
     def on_view_scale_change(self):
-        for item in self.selectedItems():
-            item.on_view_scale_change()
+        # Only items with selection handles or in crop mode have a
+        # bounding rect that depends on the view's scale
+        if self._handles_item:
+            self._handles_item.on_view_scale_change()
+        if self.crop_item and self.crop_item is not self._handles_item:
+            self.crop_item.on_view_scale_change()
+        if self.multi_select_item.scene():
+            self.multi_select_item.on_view_scale_change()
 
     def itemsBoundingRect(self, selection_only=False, items=None):
         """Returns the bounding rect of the scene's items; either all of them
         or only selected ones, or the items givin in ``items``.
 
         Re-implemented to not include the items's selection handles.
-        """
 
-        def filter_user_items(ilist):
-            return list(filter(lambda i: hasattr(i, 'save_id'), ilist))
+        The bounding rect of all items is cached and only recalculated
+        when necessary.
+        """
 
         if selection_only:
-            base = filter_user_items(self.selectedItems())
+            if self._selection_rect is None:
+                self._selection_rect = self.transform_store.bounding_rect(
+                    self.selectedItems(user_only=True))
+            return QtCore.QRectF(self._selection_rect)
         elif items:
             base = items
         else:
-            base = filter_user_items(self.items())
-
-        if not base:
-            return QtCore.QRectF(0, 0, 0, 0)
+            self._update_bounds_cache()
+            return bounds_to_rect(self._bounds)
 
-        x = []
-        y = []
+        if self.transform_store.contains_all(base):
+            return self.transform_store.bounding_rect(base)
 
+        # Items that haven't been added to the scene yet
+        bounds = None
         for item in base:
-            for corner in item.corners_scene_coords:
-                x.append(corner.x())
-                y.append(corner.y())
-
-        return QtCore.QRectF(
-            QtCore.QPointF(min(x), min(y)),
-            QtCore.QPointF(max(x), max(y)))
+            bounds = unite_bounds(bounds, get_item_bounds(item))
+        return bounds_to_rect(bounds)
 
     def get_selection_center(self):
         rect = self.itemsBoundingRect(selection_only=True)
         return (rect.topLeft() + rect.bottomRight()) / 2
 
     def on_selection_change(self):
-        if self.has_multi_selection():
-            self.multi_select_item.fit_selection_area(
-                self.itemsBoundingRect(selection_only=True))
-        if self.has_multi_selection() and not self.multi_select_item.scene():
-            self.addItem(self.multi_select_item)
-            self.multi_select_item.bring_to_front()
-        if not self.has_multi_selection() and self.multi_select_item.scene():
-            self.removeItem(self.multi_select_item)
+        changed = [item for item in self._overlay_changed_items
+                   if item in self.transform_store]
+        self._overlay_changed_items = {}
+        if changed:
+            self.update_overlay(self.transform_store.bounding_rect(changed))
+
+        # The multi select item is selected itself; adding or removing
+        # it must not trigger another round of selection changes
+        with self.batch_selection():
+            if self.has_multi_selection():
+                self.multi_select_item.fit_selection_area(
+                    self.itemsBoundingRect(selection_only=True))
+            if (self.has_multi_selection()
+                    and not self.multi_select_item.scene()):
+                self.addItem(self.multi_select_item)
+                self.multi_select_item.bring_to_front()
+            if (not self.has_multi_selection()
+                    and self.multi_select_item.scene()):
+                self.removeItem(self.multi_select_item)
 
     def on_change(self, region):
         if (self.multi_select_item.scene()
@@ -444,6 +865,13 @@ class DreambGraphicsScene(QtWidgets.QGraphicsScene):
 
         self.items_to_add.put((itemdata, selected))
 
+    def discard_queued_items(self):
+        """Forgets items added via ``add_items_later`` that haven't been
+        added to the scene yet."""
+
+        while not self.items_to_add.empty():
+            self.items_to_add.get()
+
     def add_queued_items(self):
         """Adds items added via ``add_items_later``"""
 
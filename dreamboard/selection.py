@@ -23,6 +23,7 @@ from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import QGraphicsItem
 
 from dreamboard.assets import DreambAssets
+from dreamboard import batch_transform
 from dreamboard import commands
 from dreamboard.config import CommandlineArgs
 from dreamboard.constants import COLORS
@@ -132,12 +133,15 @@ class SelectableMixin(BaseItemMixin):
         self.setAcceptHoverEvents(True)
         self.setFlags(
             QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsMovable
-            | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsSelectable)
+            | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsSelectable
+            | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
 
         self.viewport_scale = 1
         self.reset_actions()
         self.is_editable = False
         self.is_hovered = False
+        self._handles_margin = False
+        self.invalidate_handles_cache()
 
     def reset_actions(self):
         self.scale_active = False
@@ -152,17 +156,52 @@ class SelectableMixin(BaseItemMixin):
     def fixed_length_for_viewport(self, value):
         """The interactable areas need to stay the same size on the
         screen so we need to adjust the values according to the scale
-        factor sof the view and the item."""
+        factor sof the view and the item.
 
-        if self.scene():
-            scale = self.scene().views()[0].get_scale()
-            self._view_scale = scale
+        The view's scale is the one last stored with
+        :meth:`update_view_scale`, so that the view isn't queried on
+        every paint. This also keeps the last known scaling factor for
+        items that have already been removed from the scene but whose
+        boundingRect is still needed.
+        """
 
-        # It can happen that the item is already removed from
-        # the scene but its boundingRect is still needed. Keep the
-        # last known scaling factor for that case
         return value / getattr(self, '_view_scale', 1) / self.scale()
 
+    def update_view_scale(self):
+        """Stores the view's scale. Called when the item is added to a
+        scene, when it gets selection handles, and on scale changes
+        while it has handles or is being cropped."""
+
+        if self.scene() and self.scene().views():
+            self._view_scale = self.scene().views()[0].get_scale()
+
+    def invalidate_handles_cache(self):
+        self._handles_cache_key = None
+        self._handles_cache = {}
+
+    def get_handles_cache(self):
+        """A dict for caching the geometry of the selection handles.
+
+        The geometry only depends on the item's rect, the item's scale
+        and the view's scale; the cache is emptied when any of these
+        changes. The view's scale is the one stored by
+        :meth:`update_view_scale`.
+        """
+
+        rect = self.bounding_rect_unselected()
+        key = (rect.x(), rect.y(), rect.width(), rect.height(),
+               self.scale(), getattr(self, '_view_scale', 1))
+        if key != self._handles_cache_key:
+            self._handles_cache_key = key
+            self._handles_cache = {}
+        return self._handles_cache
+
+    def get_cached_handle(self, name, func):
+        cache = self.get_handles_cache()
+        if name not in cache:
+            cache[name] = func()
+        return cache[name]
+
     @property
     def select_resize_size(self):
         return self.fixed_length_for_viewport(self.SELECT_RESIZE_SIZE)
@@ -176,6 +215,10 @@ class SelectableMixin(BaseItemMixin):
          even if it is covered by selection scale/flip/... handles.
          This ensures that small items can always still be moved/edited.
         """
+        return self.get_cached_handle(
+            'free_center', self._make_handle_free_center)
+
+    def _make_handle_free_center(self):
         size = self.fixed_length_for_viewport(self.SELECT_FREE_CENTER)
         return QtCore.QRectF(
             self.center.x() - size/2,
@@ -206,6 +249,26 @@ class SelectableMixin(BaseItemMixin):
             self.draw_debug_shape(
                 painter, self.select_handle_free_center(), 255, 0, 255)
 
+    def paint_overlay(self, painter):
+        """Paints the selection outline and handles.
+
+        This is called by the view in a single pass after all items
+        have been painted, with the painter set up in item coordinates.
+        Changing the selection thus never requires repainting the
+        item's content.
+        """
+
+        self.paint_selectable(painter, None, None)
+
+    def update_overlay(self, rect=None):
+        """Schedules a repaint of the overlay in ``rect`` (in item
+        coordinates, defaults to the bounding rect) without marking the
+        item itself as changed."""
+
+        if self.scene():
+            self.scene().update_overlay(
+                self.mapRectToScene(rect or self.boundingRect()))
+
     def paint_selectable(self, painter, option, widget):
         self.paint_debug(painter, option, widget)
 
@@ -242,16 +305,36 @@ class SelectableMixin(BaseItemMixin):
 
         return [self.mapToScene(corner) for corner in self.corners]
 
+    def get_scale_rect(self, corner, margin=0):
+        size = self.select_resize_size
+        return QtCore.QRectF(
+            corner.x() - size/2 - margin,
+            corner.y() - size/2 - margin,
+            size + 2 * margin,
+            size + 2 * margin)
+
     def get_scale_bounds(self, corner, margin=0):
         """The interactable shape of the scale handles. The scale handles sit
         centered around the visible handle."""
-        path = QtGui.QPainterPath()
-        path.addRect(QtCore.QRectF(
-            corner.x() - self.select_resize_size/2 - margin,
-            corner.y() - self.select_resize_size/2 - margin,
-            self.select_resize_size + 2 * margin,
-            self.select_resize_size + 2 * margin))
-        return path
+
+        def make_path():
+            path = QtGui.QPainterPath()
+            path.addRect(self.get_scale_rect(corner, margin))
+            return path
+
+        if margin:
+            return make_path()
+        return self.get_cached_handle(
+            ('scale', corner.x(), corner.y()), make_path)
+
+    def get_rotate_rect(self, corner):
+        """The whole square containing the rotate area of a corner,
+        including its scale area."""
+
+        d = self.get_corner_direction(corner)
+        p1 = corner - d * self.select_resize_size / 2
+        p2 = p1 + d * (self.select_resize_size + self.select_rotate_size)
+        return utils.get_rect_from_points(p1, p2)
 
     def get_rotate_bounds(self, corner):
         """The interactable shape of the rotation area. It sits around the
@@ -264,18 +347,25 @@ class SelectableMixin(BaseItemMixin):
          └───┘
         """
 
-        path = QtGui.QPainterPath()
+        def make_path():
+            path = QtGui.QPainterPath()
+            path.addRect(self.get_rotate_rect(corner))
+            # Substract the scale area:
+            # We need to make the substracted shape slightly bigger due to:
+            # https://bugreports.qt.io/browse/QTBUG-57567
+            return path - self.get_scale_bounds(corner, margin=0.001)
 
-        # The whole square containing the rotate area:
-        d = self.get_corner_direction(corner)
-        p1 = corner - d * self.select_resize_size / 2
-        p2 = p1 + d * (self.select_resize_size + self.select_rotate_size)
-        path.addRect(utils.get_rect_from_points(p1, p2))
+        return self.get_cached_handle(
+            ('rotate', corner.x(), corner.y()), make_path)
 
-        # Substract the scale area:
-        # We need to make the substracted shape slightly bigger due to:
-        # https://bugreports.qt.io/browse/QTBUG-57567
-        return path - self.get_scale_bounds(corner, margin=0.001)
+    def get_handle_rects(self):
+        """The corners together with their scale and rotate rects, for
+        quick hit testing. The rotate rects include the scale areas, so
+        the scale rects need to be checked first."""
+
+        return self.get_cached_handle('handle_rects', lambda: [
+            (corner, self.get_scale_rect(corner), self.get_rotate_rect(corner))
+            for corner in self.corners])
 
     def get_flip_bounds(self):
         """The interactactable shape of the flip handles.
@@ -291,6 +381,9 @@ class SelectableMixin(BaseItemMixin):
           └───┘
         """
 
+        return self.get_cached_handle('flip', self._make_flip_bounds)
+
+    def _make_flip_bounds(self):
         outer_margin = self.select_resize_size / 2
         inner_margin = self.select_resize_size / 2
         origin = self.bounding_rect_unselected().topLeft()
@@ -333,27 +426,44 @@ class SelectableMixin(BaseItemMixin):
             }
         ]
 
+    def set_handles_margin(self, value):
+        """Sets whether the bounding rect includes the interactive areas
+        of the selection handles. This only changes when the item gets
+        or loses selection handles, not on every selection change."""
+
+        if value != self._handles_margin:
+            self.prepareGeometryChange()
+            self._handles_margin = value
+            if value:
+                # Only the item with handles is told about scale changes
+                self.update_view_scale()
+
     def boundingRect(self):
-        if not self.has_selection_outline():
+        if not self._handles_margin:
             return self.bounding_rect_unselected()
 
         # Add extra space for the interactive areas
-        margin = self.select_resize_size / 2 + self.select_rotate_size
+        margin = self.get_cached_handle(
+            'margin',
+            lambda: self.select_resize_size / 2 + self.select_rotate_size)
         return self.bounding_rect_unselected().marginsAdded(
             QtCore.QMarginsF(margin, margin, margin, margin))
 
     def shape(self):
-        path = QtGui.QPainterPath()
         if self.has_selection_handles():
-            margin = self.select_resize_size / 2
-            rect = self.bounding_rect_unselected().marginsAdded(
-                QtCore.QMarginsF(margin, margin, margin, margin))
-            path.addRect(rect)
-            for corner in self.corners:
-                path.addPath(self.get_rotate_bounds(corner))
-        else:
-            rect = self.bounding_rect_unselected()
-            path.addRect(rect)
+            return self.get_cached_handle('shape', self._make_handles_shape)
+        path = QtGui.QPainterPath()
+        path.addRect(self.bounding_rect_unselected())
+        return path
+
+    def _make_handles_shape(self):
+        path = QtGui.QPainterPath()
+        margin = self.select_resize_size / 2
+        rect = self.bounding_rect_unselected().marginsAdded(
+            QtCore.QMarginsF(margin, margin, margin, margin))
+        path.addRect(rect)
+        for corner in self.corners:
+            path.addPath(self.get_rotate_bounds(corner))
         return path
 
     def hoverMoveEvent(self, event):
@@ -367,12 +477,12 @@ class SelectableMixin(BaseItemMixin):
             self.setCursor(Qt.CursorShape.ArrowCursor)
             return
 
-        for corner in self.corners:
+        for corner, scale_rect, rotate_rect in self.get_handle_rects():
             # See if we need to change the cursor for interactable areas
-            if self.get_scale_bounds(corner).contains(event.pos()):
+            if scale_rect.contains(event.pos()):
                 self.setCursor(self.get_corner_scale_cursor(corner))
                 return
-            elif self.get_rotate_bounds(corner).contains(event.pos()):
+            elif rotate_rect.contains(event.pos()):
                 self.setCursor(DreambAssets().cursor_rotate)
                 return
         for edge in self.get_flip_bounds():
@@ -409,9 +519,9 @@ class SelectableMixin(BaseItemMixin):
 
         if (event.button() == Qt.MouseButton.LeftButton
                 and self.has_selection_handles()):
-            for corner in self.corners:
+            for corner, scale_rect, rotate_rect in self.get_handle_rects():
                 # Check if we are in one of the corner's scale areas
-                if self.get_scale_bounds(corner).contains(event.pos()):
+                if scale_rect.contains(event.pos()):
                     # Start scale action for this corner
                     self.scale_active = True
                     self.event_direction = self.get_direction_from_center(
@@ -423,7 +533,7 @@ class SelectableMixin(BaseItemMixin):
                     event.accept()
                     return
                 # Check if we are in one of the corner's rotate areas
-                if self.get_rotate_bounds(corner).contains(event.pos()):
+                if rotate_rect.contains(event.pos()):
                     # Start rotate action
                     self.rotate_active = True
                     self.event_anchor = self.center_scene_coords
@@ -541,19 +651,23 @@ class SelectableMixin(BaseItemMixin):
 
         if self.scale_active:
             factor = self.get_scale_factor(event)
-            for item in self.selection_action_items():
-                item.setScale(item.scale_orig_factor * factor,
-                              item.mapFromScene(self.event_anchor))
+            items = self.selection_action_items()
+            batch_transform.set_scales(
+                items,
+                [item.scale_orig_factor * factor for item in items],
+                self.event_anchor)
             event.accept()
             return
         if self.rotate_active:
             snap = (event.modifiers() == Qt.KeyboardModifier.ControlModifier
                     or event.modifiers() == Qt.KeyboardModifier.ShiftModifier)
             delta = self.get_rotate_delta(event.scenePos(), snap)
-            for item in self.selection_action_items():
-                item.setRotation(
-                    item.rotate_orig_degrees + delta * item.flip(),
-                    item.mapFromScene(self.event_anchor))
+            items = self.selection_action_items()
+            batch_transform.set_rotations(
+                items,
+                [item.rotate_orig_degrees + delta * item.flip()
+                 for item in items],
+                self.event_anchor)
             event.accept()
             return
         if self.flip_active:
@@ -603,12 +717,15 @@ class SelectableMixin(BaseItemMixin):
 
     def on_view_scale_change(self):
         self.prepareGeometryChange()
+        self.update_view_scale()
+        self.invalidate_handles_cache()
 
     def itemChange(self, change, value):
         if change == QGraphicsItem.GraphicsItemChange.ItemSelectedChange:
-            self.prepareGeometryChange()
             if hasattr(self, 'on_selected_change'):
                 self.on_selected_change(value)
+        if change == QGraphicsItem.GraphicsItemChange.ItemSceneHasChanged:
+            self.update_view_scale()
         return super().itemChange(change, value)
 
 
@@ -620,12 +737,14 @@ class MultiSelectItem(SelectableMixin,
         super().__init__()
         logger.debug(f'Initialized {self}')
         self.init_selectable()
+        self._handles_margin = True
 
     def __str__(self):
         return (f'MultiSelectItem {self.width} x {self.height}')
 
     def paint(self, painter, option, widget):
-        self.paint_selectable(painter, option, widget)
+        # The outline and handles are painted in the view's overlay pass
+        pass
 
     def has_selection_outline(self):
         return True
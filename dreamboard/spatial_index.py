@@ -0,0 +1,287 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Spatial index over the scene bounds of all user items.
+
+The index is a packed R-tree with a single level of leaf nodes: Items
+are sorted into nodes of ``NODE_CAPACITY`` neighbouring items with the
+sort-tile-recursive algorithm, and queries test the node bounds first
+and then only the items of matching nodes. Both steps are array
+operations, which in Python is a lot faster than walking a deeper tree
+node by node.
+
+Items that are added or moved out of their node's bounds after the
+tree has been packed are kept in a small list of unpacked items that
+gets checked on every query, until the tree is packed again.
+"""
+
+import logging
+import math
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+def rect_to_bounds(rect):
+    return (rect.left(), rect.top(), rect.right(), rect.bottom())
+
+
+def quads_intersect_bounds(corners, bounds):
+    """Checks which of the given rectangles intersect the axis aligned
+    ``bounds`` (left, top, right, bottom).
+
+    :param corners: The corners of possibly rotated rectangles as an
+        array of shape ``(n, 4, 2)``, in clockwise or counter-clockwise
+        order.
+    :return: A boolean array of length n.
+    """
+
+    left, top, right, bottom = bounds
+    rect = np.array([[left, top], [right, top], [right, bottom],
+                     [left, bottom]])
+    # Separating axis test. The axes of the bounds are covered by
+    # comparing the bounding boxes, the remaining axes are the edges
+    # of the rectangles.
+    axes = corners[:, [1, 3], :] - corners[:, 0:1, :]
+    quad_proj = np.einsum('nkd,nad->nak', corners, axes)
+    rect_proj = np.einsum('kd,nad->nak', rect, axes)
+    separated = ((quad_proj.max(axis=2) < rect_proj.min(axis=2))
+                 | (rect_proj.max(axis=2) < quad_proj.min(axis=2)))
+    quad_min = corners.min(axis=1)
+    quad_max = corners.max(axis=1)
+    overlap = ((quad_min[:, 0] <= right) & (quad_max[:, 0] >= left)
+               & (quad_min[:, 1] <= bottom) & (quad_max[:, 1] >= top))
+    return overlap & ~separated.any(axis=1)
+
+
+class SpatialIndex:
+
+    NODE_CAPACITY = 32
+
+    def __init__(self, store):
+        """:param store: The scene's
+            :class:`~dreamboard.transform_store.TransformStore`, which
+            calculates the bounds of changed items."""
+
+        self.store = store
+        self.clear()
+
+    def clear(self):
+        self._bounds = np.full((self.NODE_CAPACITY, 4), np.nan)
+        self._items = []
+        self._rows = {}
+        self._free_rows = []
+        self._stale = set()
+        self._unpacked = set()
+        self._removed_count = 0
+        self._order = np.empty(0, dtype=np.intp)
+        self._node_bounds = np.empty((0, 4))
+        self._node_of_row = np.full(self.NODE_CAPACITY, -1, dtype=np.intp)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, item):
+        return item in self._rows
+
+    def add(self, item):
+        if item in self._rows:
+            self.mark_stale(item)
+            return
+        if self._free_rows:
+            row = self._free_rows.pop()
+            self._items[row] = item
+        else:
+            row = len(self._items)
+            self._items.append(item)
+            if row == len(self._bounds):
+                self._grow()
+        self._rows[item] = row
+        self._node_of_row[row] = -1
+        self._unpacked.add(row)
+        self._stale.add(item)
+
+    def _grow(self):
+        size = len(self._bounds)
+        self._bounds = np.concatenate(
+            (self._bounds, np.full((size, 4), np.nan)))
+        self._node_of_row = np.concatenate(
+            (self._node_of_row, np.full(size, -1, dtype=np.intp)))
+
+    def remove(self, item):
+        row = self._rows.pop(item, None)
+        if row is None:
+            return
+        self._items[row] = None
+        self._bounds[row] = np.nan
+        self._node_of_row[row] = -1
+        self._free_rows.append(row)
+        self._stale.discard(item)
+        self._unpacked.discard(row)
+        self._removed_count += 1
+
+    def mark_stale(self, item):
+        """Marks the item's bounds as outdated; they will be re-read
+        from the transform store before the next query."""
+
+        if item in self._rows:
+            self._stale.add(item)
+
+    def refresh(self):
+        """Updates the bounds of all changed items and repacks the tree
+        if it has become too unbalanced."""
+
+        if self._stale:
+            items = list(self._stale)
+            rows = np.fromiter((self._rows[item] for item in items),
+                               dtype=np.intp, count=len(items))
+            bounds = self.store.bounds(items)
+            self._bounds[rows] = bounds
+            self._stale.clear()
+
+            # Items that have left their node's bounds need to be
+            # checked separately until the next repack
+            nodes = self._node_of_row[rows]
+            packed = nodes >= 0
+            node_bounds = self._node_bounds[nodes[packed]]
+            moved_out = ((bounds[packed, 0] < node_bounds[:, 0])
+                         | (bounds[packed, 1] < node_bounds[:, 1])
+                         | (bounds[packed, 2] > node_bounds[:, 2])
+                         | (bounds[packed, 3] > node_bounds[:, 3]))
+            moved_rows = rows[packed][moved_out]
+            self._node_of_row[moved_rows] = -1
+            self._unpacked.update(moved_rows.tolist())
+
+        threshold = max(self.NODE_CAPACITY, len(self._rows) // 8)
+        if (len(self._unpacked) > threshold
+                or self._removed_count > threshold):
+            self.pack()
+
+    def pack(self):
+        """Sorts all items into nodes with the sort-tile-recursive
+        algorithm."""
+
+        logger.debug(f'Packing spatial index with {len(self)} items')
+        rows = np.fromiter(self._rows.values(), dtype=np.intp,
+                           count=len(self._rows))
+        self._node_of_row[:] = -1
+        self._unpacked.clear()
+        self._removed_count = 0
+        if not len(rows):
+            self._order = np.empty(0, dtype=np.intp)
+            self._node_bounds = np.empty((0, 4))
+            return
+
+        bounds = self._bounds[rows]
+        center_x = bounds[:, 0] + bounds[:, 2]
+        center_y = bounds[:, 1] + bounds[:, 3]
+        num_nodes = math.ceil(len(rows) / self.NODE_CAPACITY)
+        slice_size = self.NODE_CAPACITY * math.ceil(math.sqrt(num_nodes))
+        slices = np.empty(len(rows), dtype=np.intp)
+        slices[np.argsort(center_x, kind='stable')] = (
+            np.arange(len(rows)) // slice_size)
+        order = np.lexsort((center_y, slices))
+
+        self._order = rows[order]
+        starts = np.arange(0, len(rows), self.NODE_CAPACITY)
+        ordered = bounds[order]
+        self._node_bounds = np.column_stack((
+            np.minimum.reduceat(ordered[:, 0], starts),
+            np.minimum.reduceat(ordered[:, 1], starts),
+            np.maximum.reduceat(ordered[:, 2], starts),
+            np.maximum.reduceat(ordered[:, 3], starts)))
+        self._node_of_row[self._order] = (
+            np.arange(len(rows)) // self.NODE_CAPACITY)
+
+    def _candidate_rows(self, bounds):
+        left, top, right, bottom = bounds
+        nodes = self._node_bounds
+        node_hits = ((nodes[:, 0] <= right) & (nodes[:, 2] >= left)
+                     & (nodes[:, 1] <= bottom) & (nodes[:, 3] >= top))
+        positions = node_hits[np.arange(len(self._order))
+                              // self.NODE_CAPACITY]
+        rows = self._order[positions]
+        # Rows that have been removed or moved out since packing
+        rows = rows[self._node_of_row[rows] >= 0]
+        if self._unpacked:
+            rows = np.concatenate((rows, np.fromiter(
+                self._unpacked, dtype=np.intp, count=len(self._unpacked))))
+        return rows
+
+    def query(self, rect, exact=False):
+        """Returns the items intersecting the given ``QRectF`` in scene
+        coordinates.
+
+        :param exact: If ``False``, test the items' bounding boxes,
+            otherwise test their actual (possibly rotated) extent.
+        """
+
+        bounds = rect_to_bounds(rect)
+        self.refresh()
+        rows = self._candidate_rows(bounds)
+        left, top, right, bottom = bounds
+        candidates = self._bounds[rows]
+        hits = ((candidates[:, 0] <= right) & (candidates[:, 2] >= left)
+                & (candidates[:, 1] <= bottom) & (candidates[:, 3] >= top))
+        items = [self._items[row] for row in rows[hits].tolist()]
+        if exact and items:
+            corners = self.store.corners(items)
+            inside = quads_intersect_bounds(corners, bounds)
+            items = [item for item, hit in zip(items, inside) if hit]
+        return items
+
+    def query_point(self, point):
+        """Returns the items whose bounding boxes contain the given
+        ``QPointF``."""
+
+        x = point.x()
+        y = point.y()
+        self.refresh()
+        rows = self._candidate_rows((x, y, x, y))
+        candidates = self._bounds[rows]
+        hits = ((candidates[:, 0] <= x) & (candidates[:, 2] >= x)
+                & (candidates[:, 1] <= y) & (candidates[:, 3] >= y))
+        return [self._items[row] for row in rows[hits].tolist()]
+
+    def nearest(self, point, count=1, exclude=None):
+        """Returns up to ``count`` items closest to the given ``QPointF``,
+        nearest first. The distance is measured to the items' bounding
+        boxes; items containing the point have a distance of 0.
+
+        :param exclude: Items that should not be returned.
+        """
+
+        self.refresh()
+        rows = np.fromiter(self._rows.values(), dtype=np.intp,
+                           count=len(self._rows))
+        if exclude:
+            excluded = {self._rows[item] for item in exclude
+                        if item in self._rows}
+            rows = rows[~np.isin(rows, list(excluded))]
+        if not len(rows):
+            return []
+
+        bounds = self._bounds[rows]
+        x = point.x()
+        y = point.y()
+        dx = np.maximum(np.maximum(bounds[:, 0] - x, x - bounds[:, 2]), 0)
+        dy = np.maximum(np.maximum(bounds[:, 1] - y, y - bounds[:, 3]), 0)
+        distances = np.hypot(dx, dy)
+        count = min(count, len(rows))
+        closest = np.argpartition(distances, count - 1)[:count]
+        closest = closest[np.argsort(distances[closest], kind='stable')]
+        return [self._items[row] for row in rows[closest].tolist()]
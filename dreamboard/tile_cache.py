@@ -0,0 +1,113 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Cache of rendered screen-space tiles of the scene.
+
+Tiles are laid out on a grid in scaled scene coordinates, i.e. scene
+coordinates multiplied with the view's current zoom factor. This way
+the tiles stay valid while panning and only need to be discarded when
+the zoom changes or the items in them change.
+"""
+
+from collections import OrderedDict
+import logging
+import math
+
+from PyQt6 import QtCore
+
+
+logger = logging.getLogger(__name__)
+
+
+class TileCache:
+
+    TILE_SIZE = 256
+    MAX_TILES = 256
+
+    def __init__(self):
+        self.scale = None
+        self.tiles = OrderedDict()
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def __contains__(self, key):
+        return key in self.tiles
+
+    def clear(self):
+        self.tiles.clear()
+
+    def set_scale(self, scale):
+        """Sets the zoom factor the tiles are rendered at. Changing it
+        discards all tiles."""
+
+        if scale != self.scale:
+            logger.trace(f'Clearing tile cache for new scale {scale}')
+            self.clear()
+            self.scale = scale
+
+    def get(self, key):
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def put(self, key, tile):
+        self.tiles[key] = tile
+        self.tiles.move_to_end(key)
+        while len(self.tiles) > self.MAX_TILES:
+            self.tiles.popitem(last=False)
+
+    def keys_for_rect(self, rect):
+        """The keys of all tiles covering ``rect``, given in scaled scene
+        coordinates."""
+
+        size = self.TILE_SIZE
+        left = math.floor(rect.left() / size)
+        top = math.floor(rect.top() / size)
+        right = math.ceil(rect.right() / size)
+        bottom = math.ceil(rect.bottom() / size)
+        return [(x, y) for y in range(top, max(bottom, top + 1))
+                for x in range(left, max(right, left + 1))]
+
+    def tile_rect(self, key):
+        """The area of a tile in scaled scene coordinates."""
+
+        return QtCore.QRectF(key[0] * self.TILE_SIZE,
+                             key[1] * self.TILE_SIZE,
+                             self.TILE_SIZE,
+                             self.TILE_SIZE)
+
+    def scene_rect(self, key):
+        """The area of a tile in scene coordinates."""
+
+        rect = self.tile_rect(key)
+        return QtCore.QRectF(rect.x() / self.scale, rect.y() / self.scale,
+                             rect.width() / self.scale,
+                             rect.height() / self.scale)
+
+    def invalidate(self, scene_rect):
+        """Discards all tiles intersecting ``scene_rect``, given in scene
+        coordinates."""
+
+        if not self.tiles or self.scale is None:
+            return
+        rect = QtCore.QRectF(scene_rect.x() * self.scale,
+                             scene_rect.y() * self.scale,
+                             scene_rect.width() * self.scale,
+                             scene_rect.height() * self.scale)
+        for key in list(self.tiles):
+            if self.tile_rect(key).intersects(rect):
+                del self.tiles[key]
@@ -0,0 +1,232 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Columnar storage of the transformations of all user items in a scene.
+
+Position, z value, scale, rotation, flip and the item's unselected
+bounding rect (i.e. the crop rect for images) are kept in one NumPy
+array with a row per item, so that bulk operations (bounding boxes,
+sizes, saving) can be done as array operations instead of calling
+Qt getters item by item.
+
+The store is kept in sync by the scene: Items notify the scene when
+they change, and their rows get refreshed lazily before the next read.
+"""
+
+import logging
+
+import numpy as np
+from PyQt6 import QtCore, QtGui, QtWidgets
+
+
+logger = logging.getLogger(__name__)
+
+
+class TransformStore:
+
+    COLUMNS = ('x', 'y', 'z', 'scale', 'rotation', 'flip',
+               'rect_x', 'rect_y', 'rect_width', 'rect_height')
+    COL = {name: i for i, name in enumerate(COLUMNS)}
+    MIN_CAPACITY = 64
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.data = np.zeros((self.MIN_CAPACITY, len(self.COLUMNS)))
+        self._items = []
+        self._rows = {}
+        self._stale = set()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item):
+        return item in self._rows
+
+    @property
+    def items(self):
+        """All stored items in row order."""
+        return list(self._items)
+
+    def add(self, item):
+        if item in self._rows:
+            self.mark_stale(item)
+            return
+        if len(self._items) == self.data.shape[0]:
+            self.data = np.resize(self.data, (self.data.shape[0] * 2,
+                                              len(self.COLUMNS)))
+        self._rows[item] = len(self._items)
+        self._items.append(item)
+        self._stale.add(item)
+
+    def remove(self, item):
+        """Removes the item's row by moving the last row into its place."""
+
+        row = self._rows.pop(item, None)
+        if row is None:
+            return
+        self._stale.discard(item)
+        last = len(self._items) - 1
+        if row != last:
+            moved = self._items[last]
+            self._items[row] = moved
+            self._rows[moved] = row
+            self.data[row] = self.data[last]
+        self._items.pop()
+
+    def mark_stale(self, item):
+        """Marks the item's row as outdated; it will be re-read from the
+        item before the next access."""
+
+        if item in self._rows:
+            self._stale.add(item)
+
+    def contains_all(self, items):
+        return all(item in self._rows for item in items)
+
+    def refresh(self):
+        """Re-reads the rows of all items that have changed."""
+
+        for item in self._stale:
+            self.data[self._rows[item]] = self.read_item(item)
+        self._stale.clear()
+
+    @staticmethod
+    def read_item(item):
+        pos = item.pos()
+        rect = item.bounding_rect_unselected()
+        return (pos.x(), pos.y(), item.zValue(), item.scale(),
+                item.rotation(), item.flip(),
+                rect.x(), rect.y(), rect.width(), rect.height())
+
+    def rows(self, items=None):
+        """The row indices of the given items, or all rows."""
+
+        if items is None:
+            return np.arange(len(self._items))
+        return np.fromiter((self._rows[item] for item in items),
+                           dtype=np.intp, count=len(items))
+
+    def get(self, items=None, columns=None):
+        """Returns a 2D array of the given columns (or all columns) for the
+        given items (or all items)."""
+
+        self.refresh()
+        data = self.data[self.rows(items)]
+        if columns is not None:
+            data = data[:, [self.COL[name] for name in columns]]
+        return data
+
+    def column(self, name, items=None):
+        self.refresh()
+        return self.data[self.rows(items), self.COL[name]]
+
+    def corners(self, items=None):
+        """The corners of the items' unselected bounding rects in scene
+        coordinates, as an array of shape ``(n, 4, 2)``."""
+
+        data = self.get(items)
+        c = self.COL
+        left = data[:, c['rect_x']]
+        top = data[:, c['rect_y']]
+        right = left + data[:, c['rect_width']]
+        bottom = top + data[:, c['rect_height']]
+        local_x = np.stack((left, right, right, left), axis=1)
+        local_y = np.stack((top, top, bottom, bottom), axis=1)
+
+        # Qt applies scale and rotation first, then the item's transform
+        # (which we only use for flipping), then the position
+        scale = data[:, c['scale'], np.newaxis]
+        rotation = data[:, c['rotation'], np.newaxis]
+        angle = np.radians(rotation)
+        cos = np.cos(angle)
+        sin = np.sin(angle)
+        # Like Qt, use exact values for multiples of 90 degrees
+        quarter = np.mod(rotation, 90) == 0
+        cos = np.where(quarter, np.round(cos), cos)
+        sin = np.where(quarter, np.round(sin), sin)
+        scene_x = (local_x * cos - local_y * sin) * scale
+        scene_y = (local_x * sin + local_y * cos) * scale
+        scene_x = scene_x * data[:, c['flip'], np.newaxis]
+        scene_x += data[:, c['x'], np.newaxis]
+        scene_y += data[:, c['y'], np.newaxis]
+        return np.stack((scene_x, scene_y), axis=2)
+
+    def bounds(self, items=None):
+        """The items' extents in scene coordinates, as an array of shape
+        ``(n, 4)`` with columns left, top, right, bottom."""
+
+        corners = self.corners(items)
+        return np.concatenate((corners.min(axis=1), corners.max(axis=1)),
+                              axis=1)
+
+    def sizes(self, items=None):
+        """The items' widths and heights in scene coordinates, as an array
+        of shape ``(n, 2)``."""
+
+        bounds = self.bounds(items)
+        return bounds[:, 2:] - bounds[:, :2]
+
+    def bounding_rect(self, items=None):
+        """The bounding rect of the given items as a ``QRectF``."""
+
+        bounds = self.bounds(items)
+        if not len(bounds):
+            return QtCore.QRectF(0, 0, 0, 0)
+        left, top = bounds[:, :2].min(axis=0).tolist()
+        right, bottom = bounds[:, 2:].max(axis=0).tolist()
+        return QtCore.QRectF(QtCore.QPointF(left, top),
+                             QtCore.QPointF(right, bottom))
+
+    def apply(self, items, x=None, y=None, scale=None, rotation=None,
+              flip=None):
+        """Sets position, scale, rotation and flip of many items at once.
+
+        Each value can be a sequence with one value per item or
+        ``None`` to leave it unchanged. The values are applied directly
+        without the anchor handling of the items' own setters.
+        """
+
+        rows = self.rows(items)
+        self.refresh()
+        c = self.COL
+        if x is not None:
+            self.data[rows, c['x']] = x
+        if y is not None:
+            self.data[rows, c['y']] = y
+        if scale is not None:
+            self.data[rows, c['scale']] = scale
+        if rotation is not None:
+            self.data[rows, c['rotation']] = np.mod(rotation, 360)
+        if flip is not None:
+            self.data[rows, c['flip']] = flip
+
+        values = self.data[rows].tolist()
+        for item, row in zip(items, values):
+            if x is not None or y is not None:
+                QtWidgets.QGraphicsItem.setPos(
+                    item, row[c['x']], row[c['y']])
+            if scale is not None:
+                item.prepareGeometryChange()
+                QtWidgets.QGraphicsItem.setScale(item, row[c['scale']])
+            if rotation is not None:
+                QtWidgets.QGraphicsItem.setRotation(
+                    item, row[c['rotation']])
+            if flip is not None:
+                QtWidgets.QGraphicsItem.setTransform(
+                    item, QtGui.QTransform.fromScale(row[c['flip']], 1))
+            # The new values are already in the store
+            self._stale.discard(item)
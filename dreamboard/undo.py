@@ -0,0 +1,206 @@
+# This file is part of DreamBoard.
+#
+# DreamBoard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DreamBoard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DreamBoard.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Undo stack with a memory budget.
+
+Items that have been deleted (or whose insertion has been undone) are
+only kept alive by the undo commands referencing them. Their pixel data
+can take up a lot of memory, so once the commands on the stack exceed
+the budget, the pixel data of the oldest ones is moved to a temporary
+SQLite file. It is read back when the items are added to the scene
+again.
+"""
+
+import logging
+import os
+import sqlite3
+import tempfile
+import weakref
+
+from PyQt6 import QtGui
+
+from dreamboard import constants
+
+
+logger = logging.getLogger(__name__)
+
+
+class PixelSpillStore:
+    """Temporary on-disk storage for pixel data.
+
+    Similar to an sqlar archive, but images are stored as raw pixels so
+    that spilling and reloading doesn't need to encode or decode them.
+    The file is created on first use and removed on :meth:`close`.
+    """
+
+    def __init__(self):
+        self._connection = None
+        self._tmpdir = None
+        self._finalizers = {}
+
+    def __len__(self):
+        return len(self._finalizers)
+
+    def __contains__(self, key):
+        return key in self._finalizers
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._tmpdir = tempfile.TemporaryDirectory(
+                prefix=constants.APPNAME)
+            path = os.path.join(self._tmpdir.name, 'undo.sqlite')
+            logger.debug(f'Creating undo spill store at {path}')
+            self._connection = sqlite3.connect(path)
+            # The data is temporary, no need for crash safety
+            self._connection.execute('PRAGMA journal_mode=OFF')
+            self._connection.execute('PRAGMA synchronous=OFF')
+            self._connection.execute(
+                'CREATE TABLE pixels ('
+                'id INTEGER PRIMARY KEY, '
+                'width INTEGER NOT NULL, '
+                'height INTEGER NOT NULL, '
+                'bytes_per_line INTEGER NOT NULL, '
+                'format INTEGER NOT NULL, '
+                'data BLOB NOT NULL)')
+        return self._connection
+
+    def put(self, image, owner):
+        """Stores a ``QImage`` and returns its key.
+
+        The data is discarded automatically when ``owner`` is garbage
+        collected before the image has been taken out again.
+        """
+
+        if image.colorCount():
+            # Keep it simple and don't store color tables
+            image = image.convertToFormat(
+                QtGui.QImage.Format.Format_ARGB32_Premultiplied)
+        bits = image.constBits()
+        bits.setsize(image.sizeInBytes())
+        with self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO pixels '
+                '(width, height, bytes_per_line, format, data) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (image.width(), image.height(), image.bytesPerLine(),
+                 image.format().value, bytes(bits)))
+        key = cursor.lastrowid
+        finalizer = weakref.finalize(owner, self.discard, key)
+        finalizer.atexit = False
+        self._finalizers[key] = finalizer
+        return key
+
+    def take(self, key):
+        """Removes the image with the given key from the store and
+        returns it."""
+
+        row = self.connection.execute(
+            'SELECT width, height, bytes_per_line, format, data '
+            'FROM pixels WHERE id=?', (key,)).fetchone()
+        self.discard(key)
+        width, height, bytes_per_line, fmt, data = row
+        image = QtGui.QImage(data, width, height, bytes_per_line,
+                             QtGui.QImage.Format(fmt))
+        # The image doesn't own the buffer yet
+        return image.copy()
+
+    def discard(self, key):
+        finalizer = self._finalizers.pop(key, None)
+        if finalizer is None:
+            return
+        finalizer.detach()
+        if self._connection is not None:
+            with self._connection:
+                self._connection.execute(
+                    'DELETE FROM pixels WHERE id=?', (key,))
+
+    def close(self):
+        for finalizer in self._finalizers.values():
+            finalizer.detach()
+        self._finalizers = {}
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
+
+
+def iter_commands(command):
+    """The command itself and all commands nested in it, e.g. the
+    commands of a macro."""
+
+    yield command
+    for i in range(command.childCount()):
+        yield from iter_commands(command.child(i))
+
+
+class DreambUndoStack(QtGui.QUndoStack):
+    """Undo stack that keeps the memory used by its commands within a
+    byte budget.
+
+    Commands can report the bytes of pixel data that only they keep
+    alive with a ``memory_cost()`` method and move that data to disk with
+    ``spill(store)``. Commands farthest away from the current index are
+    spilled first.
+    """
+
+    def __init__(self, parent=None, memory_limit=constants.UNDO_MEMORY_LIMIT):
+        super().__init__(parent)
+        self.memory_limit = memory_limit
+        self.spill_store = PixelSpillStore()
+        self.indexChanged.connect(self.enforce_memory_limit)
+        self.destroyed.connect(self.spill_store.close)
+
+    def push(self, command):
+        super().push(command)
+        # When the undo limit is reached, the index doesn't change
+        self.enforce_memory_limit()
+
+    def commands_at(self, index):
+        return iter_commands(self.command(index))
+
+    def command_memory_cost(self, index):
+        return sum(command.memory_cost()
+                   for command in self.commands_at(index)
+                   if hasattr(command, 'memory_cost'))
+
+    def memory_cost(self):
+        """The bytes of pixel data kept alive only by the undo stack."""
+
+        return sum(self.command_memory_cost(i) for i in range(self.count()))
+
+    def enforce_memory_limit(self):
+        if self.memory_cost() <= self.memory_limit:
+            return
+
+        index = self.index()
+        order = sorted(range(self.count()),
+                       key=lambda i: abs(i + 0.5 - index), reverse=True)
+        for i in order:
+            if not self.command_memory_cost(i):
+                continue
+            logger.debug(f'Spilling pixel data of undo command {i}')
+            try:
+                for command in self.commands_at(i):
+                    if hasattr(command, 'spill'):
+                        command.spill(self.spill_store)
+            except sqlite3.Error:
+                logger.exception('Error while spilling undo data to disk')
+                return
+            # Commands can share items, so recalculate the whole cost
+            if self.memory_cost() <= self.memory_limit:
+                return
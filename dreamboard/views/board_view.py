@@ -15,9 +15,11 @@
 
 from functools import partial
 import logging
+import math
 import os
 import os.path
 
+import numpy as np
 from PyQt6 import QtCore, QtGui, QtWidgets
 from PyQt6.QtCore import Qt, QTimer
 
@@ -28,7 +30,13 @@ from dreamboard import fileio
 from dreamboard import widgets
 from dreamboard.main_controls import MainControlsMixin
 from dreamboard.scene import DreambGraphicsScene
-from dreamboard.cloud.firebase_operations import save_dreamb_cloud, load_dreamb_cloud
+from dreamboard.selection import SelectableMixin
+from dreamboard.tile_cache import TileCache
+from dreamboard.undo import DreambUndoStack
+from dreamboard.cloud.firebase_operations import upload_pool
+from dreamboard.cloud.loading import CloudLoader
+from dreamboard.cloud.previews import FullResolutionLoader
+from dreamboard.cloud.sync import CloudSync
 from dreamboard.actions.event_handling_mixin import EventHandlingMixin
 
 commandline_args = CommandlineArgs()
@@ -43,12 +51,13 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
         self.parent = parent
         self.settings = DreambSettings()
         self.welcome_overlay = widgets.WelcomeOverlay(self)
+        self.upload_progress = widgets.UploadProgress(self, upload_pool)
 
         self.setBackgroundBrush(
             QtGui.QBrush(QtGui.QColor(*constants.COLORS['Scene:Canvas'])))
         self.setFrameShape(QtWidgets.QFrame.Shape.NoFrame)
 
-        self.undo_stack = QtGui.QUndoStack(self)
+        self.undo_stack = DreambUndoStack(self)
         self.undo_stack.setUndoLimit(100)
         self.undo_stack.canRedoChanged.connect(self.on_can_redo_changed)
         self.undo_stack.canUndoChanged.connect(self.on_can_undo_changed)
@@ -60,12 +69,43 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
         self.zoom_active = False
         self.movewin_active = False
 
+        # Pan, zoom and drag events are coalesced and applied once per
+        # frame, see ``schedule_frame``
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setInterval(constants.FRAME_INTERVAL_MS)
+        self.frame_timer.timeout.connect(self.on_frame)
+        self.pending_pan = QtCore.QPointF()
+        self.pending_zoom = 1
+        self.pending_zoom_anchor = None
+        self.pending_mouse_move = None
+
+        # While the user interacts, render fast and in lower quality,
+        # then re-render in high quality once input has been idle
+        self.render_idle_timer = QTimer(self)
+        self.render_idle_timer.setSingleShot(True)
+        self.render_idle_timer.setInterval(constants.RENDER_IDLE_MS)
+        self.render_idle_timer.timeout.connect(self.on_render_idle)
+
+        # Optional cache of rendered viewport tiles for static boards
+        self.tile_cache = TileCache()
+        self.tile_build_queue = []
+        self.tile_build_timer = QTimer(self)
+        self.tile_build_timer.setSingleShot(True)
+        self.tile_build_timer.timeout.connect(self.build_tiles)
+
         self.scene = DreambGraphicsScene(self.undo_stack)
+        self.scene.change_journal.state_dir = os.path.join(
+            os.path.dirname(self.settings.fileName()), 'sync')
+        self.cloud_sync = CloudSync(self.scene, parent)
+        self.cloud_loader = None
+        self.cloud_load_count = 0
+        self.full_resolution_loader = FullResolutionLoader()
         self.scene.changed.connect(self.on_scene_changed)
         self.scene.selectionChanged.connect(self.on_selection_changed)
         self.setScene(self.scene)
 
-        # self.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        self.setRenderHint(QtGui.QPainter.RenderHint.SmoothPixmapTransform)
         self.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing)
         # self.setRenderHint(QPainter.RenderHint.TextAntialiasing)
         # self.setRenderHint(QPainter.RenderHint.LosslessImageRendering)
@@ -76,17 +116,17 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
             self.open_from_file(commandline_args.filename)
         self.update_window_title()
 
-        load_dreamb_cloud(self.scene, parent)
-        QTimer.singleShot(0, lambda: self.fit_rect(self.scene.itemsBoundingRect()))
+        self.load_from_cloud()
 
         # Context menu and actions
         self.build_menu_and_actions()
         self.control_target = self
         self.init_main_controls()
 
+        # Changes are synced in the background; a run is skipped if the
+        # previous one is still in flight
         self.timer = QTimer()
-
-        self.timer.timeout.connect(lambda: save_dreamb_cloud(self.scene, self.parent.presets, self.parent.boards, self.parent.current_board))
+        self.timer.timeout.connect(self.cloud_sync.start)
         self.timer.start(constants.SAVE_INTERVAL_SEC * 1000)
 
     @property
@@ -112,7 +152,9 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
         self.parent.setWindowTitle(title)
 
     def on_scene_changed(self, region):
-        if not self.scene.items():
+        for rect in region:
+            self.tile_cache.invalidate(rect)
+        if not self.scene.has_items():
             logger.debug('No items in scene')
             self.setTransform(QtGui.QTransform())
             self.welcome_overlay.show()
@@ -144,9 +186,25 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
         return QtCore.QPoint(round(self.size().width() / 2),
                              round(self.size().height() / 2))
 
+    def get_visible_scene_rect(self):
+        """The part of the scene currently shown in the viewport."""
+
+        return self.mapToScene(self.viewport().rect()).boundingRect()
+
+    def visible_items(self):
+        """The user items currently (at least partially) in view."""
+
+        return self.scene.items_in_rect(self.get_visible_scene_rect())
+
     def clear_scene(self):
         logging.debug('Clearing scene...')
+        # Results of a running sync or load belong to the old scene
+        self.cloud_sync.wait()
+        self.cancel_loading_from_cloud()
+        self.full_resolution_loader.clear()
         self.scene.clear()
+        self.scene.change_journal.clear()
+        self.tile_cache.clear()
         self.undo_stack.clear()
         self.filename = None
         self.setTransform(QtGui.QTransform())
@@ -194,6 +252,7 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
         else:
             self.filename = filename
             self.scene.add_queued_items()
+            self.scene.change_journal.record(self.scene.items())
             self.on_action_fit_scene()
 
     def open_from_file(self, filename):
@@ -209,6 +268,59 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
             parent=self)
         self.worker.start()
 
+    def load_from_cloud(self, board_id=None):
+        """Loads a board from the cloud in the background. Images appear
+        as they arrive, the ones in the middle of the view first."""
+
+        center = self.mapToScene(self.viewport().rect().center())
+        # Signals of canceled loaders may still be queued; they are told
+        # apart by their number
+        self.cloud_load_count += 1
+        number = self.cloud_load_count
+        # The view owns the loader, so that it isn't destroyed before its
+        # thread has finished
+        self.cloud_loader = CloudLoader(
+            self.scene, self.parent, board_id, (center.x(), center.y()),
+            self.full_resolution_loader, parent=self)
+        self.cloud_loader.finished.connect(self.cloud_loader.deleteLater)
+        self.cloud_loader.board_opened.connect(
+            partial(self.on_cloud_board_opened, number))
+        self.cloud_loader.progress.connect(self.on_items_loaded)
+        self.cloud_loader.loaded.connect(
+            partial(self.on_cloud_loading_finished, number))
+        self.cloud_loader.start()
+
+    def cancel_loading_from_cloud(self):
+        loader = self.cloud_loader
+        if loader is None:
+            return
+        loader.on_canceled()
+        loader.wait()
+        self.cloud_loader = None
+        self.cloud_load_count += 1
+        self.scene.discard_queued_items()
+
+    def on_cloud_board_opened(self, number, board_id, boards, presets,
+                              synced):
+        if number != self.cloud_load_count:
+            return
+        self.parent.boards = boards
+        self.parent.current_board = board_id
+        self.parent.presets = presets
+        self.scene.change_journal.reset(board_id, synced)
+        self.update_presets_menu()
+        self._recent_boards_submenu.clear()
+        self._build_recent_boards(self._recent_boards_submenu)
+
+    def on_cloud_loading_finished(self, number, board_id, errors):
+        if number != self.cloud_load_count:
+            return
+        self.cloud_loader = None
+        self.scene.add_queued_items()
+        self.on_action_fit_scene()
+        if errors:
+            logger.warning(f'Could not load {len(errors)} images from cloud')
+
     def on_open_board(self, board):
         print('open board', board["id"], self.parent.current_board)
 
@@ -216,43 +328,80 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
                                               QtWidgets.QMessageBox.StandardButton.Yes | QtWidgets.QMessageBox.StandardButton.Cancel)
 
         if reply and board["id"] != self.parent.current_board:
-            # save current board
-            save_dreamb_cloud(self.scene, self.parent.presets, self.parent.boards, self.parent.current_board)
-            self.clear_scene()
-            self.parent.presets = {}
-            # load new board with the id in board.id
-            load_dreamb_cloud(self.scene, self.parent, board["id"])
-            self.update_presets_menu()
-            self.on_action_fit_scene()
+            # save current board, then load the new one
+            self.sync_to_cloud_then(partial(self.open_board, board["id"]))
+
+    def open_board(self, board_id):
+        self.clear_scene()
+        self.parent.presets = {}
+        self.update_presets_menu()
+        self.load_from_cloud(board_id)
 
     def on_action_new_board(self):
         print('new board')
         board_name, ok = QtWidgets.QInputDialog.getText(self, "Save Board", "Enter board name:")
-        default_new_board_id = "NEW"
         if ok:
-            new_board = {"name": board_name, "id": default_new_board_id}
-
-            self.parent.boards.append(new_board)
-
-            self.clear_scene()
-            self.update_presets_menu()
-            save_dreamb_cloud(self.scene, self.parent.presets, self.parent.boards, default_new_board_id)
-            QtWidgets.QMessageBox.information(
-                self,
-                'SUCCESS',
-                ('<p>Saved board with the name %s</p>' % board_name))
+            self.sync_to_cloud_then(partial(self.create_board, board_name))
         else:
             print('no board name entered')
 
+    def create_board(self, board_name):
+        default_new_board_id = "NEW"
+        new_board = {"name": board_name, "id": default_new_board_id}
+
+        self.parent.boards.append(new_board)
+
+        self.clear_scene()
+        self.parent.current_board = default_new_board_id
+        self.scene.change_journal.record_board()
+        self.update_presets_menu()
+        # Replaces the default id with the board's id in the cloud
+        self.sync_to_cloud_then(partial(
+            QtWidgets.QMessageBox.information,
+            self,
+            'SUCCESS',
+            ('<p>Saved board with the name %s</p>' % board_name)))
+
+    def sync_to_cloud_then(self, callback):
+        """Syncs the board to the cloud in the background and calls
+        ``callback`` when done. The window is blocked meanwhile, so that
+        the board can't be changed any further."""
+
+        progress = QtWidgets.QProgressDialog(
+            'Saving board to cloud...', '', 0, 0, self)
+        progress.setCancelButton(None)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def on_synced():
+            progress.reset()
+            progress.hide()
+            progress.deleteLater()
+            callback()
+
+        self.cloud_sync.sync_then(on_synced)
+
     def on_apply_preset(self, preset):
         selected_preset = self.parent.presets[preset]
-        for item in self.scene.items():
-            item_uuid = item.data(0).replace('-', '_')
-            item_transforms = selected_preset['images'][item_uuid] if item_uuid in selected_preset['images'] else {}
-
-            item.setPos(QtCore.QPointF(float(item_transforms['x']), float(item_transforms['y'])))
-            item.setRotation(item_transforms['rotation'])
-            item.setScale(item_transforms['scale'])
+        items = []
+        values = []
+        for item in self.scene.transform_store.items:
+            item_uuid = (item.data(0) or '').replace('-', '_')
+            if item_uuid in selected_preset['images']:
+                item_transforms = selected_preset['images'][item_uuid]
+                items.append(item)
+                values.append((item_transforms['x'],
+                               item_transforms['y'],
+                               item_transforms['rotation'],
+                               item_transforms['scale']))
+
+        if items:
+            values = np.array(values, dtype=float)
+            self.scene.transform_store.apply(
+                items, x=values[:, 0], y=values[:, 1],
+                rotation=values[:, 2], scale=values[:, 3])
+            # Not undoable, so the journal doesn't see it otherwise
+            self.scene.change_journal.record(items)
         self.on_action_fit_scene()
 
     def update_presets_menu(self):
@@ -275,6 +424,8 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
     def do_save(self, filename, create_new):
         if not filename.endswith('.dreamb'):
             filename = f'{filename}.dreamb'
+        if not self.load_full_resolution_for_save():
+            return
         self.worker = fileio.ThreadedIO(
             fileio.save_dreamb, filename, self.scene, create_new=create_new)
         self.worker.finished.connect(self.on_saving_finished)
@@ -284,14 +435,32 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
             parent=self)
         self.worker.start()
 
+    def load_full_resolution_for_save(self):
+        """Loads the full images of items that show a preview, which
+        need to be written to the file.
+
+        This happens here on the GUI thread, since the file is written
+        in a background thread. Returns ``False`` after showing a warning
+        if any full image couldn't be loaded.
+        """
+
+        previews = [item for item in self.scene.items_for_save()
+                    if hasattr(item, 'is_preview') and item.is_preview()]
+        for item in previews:
+            item.ensure_full_resolution()
+        missing = [item for item in previews if item.is_preview()]
+        if missing:
+            QtWidgets.QMessageBox.warning(
+                self,
+                'Problem saving file',
+                ('<p>%s image(s) could not be downloaded in full '
+                 'resolution.</p><p>Please try again later.</p>')
+                % len(missing))
+            return False
+        return True
+
     def do_save_cloud(self):
-        self.worker = fileio.ThreadedIO(lambda: save_dreamb_cloud(self.scene, self.parent.presets, self.parent.boards, self.parent.current_board))
-        self.worker.finished.connect(self.on_saving_finished)
-        # self.progress = widgets.DreambProgressDialog(
-        #    'Saving to cloud...',
-        #    worker=self.worker,
-        #    parent=self)
-        self.worker.start()
+        self.cloud_sync.start()
 
     def on_insert_images_finished(self, new_scene, filename, errors):
         """Callback for when loading of images is finished.
@@ -342,12 +511,11 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
 
     def on_selection_changed(self):
         logger.debug('Currently selected items: %s',
-                     len(self.scene.selectedItems(user_only=True)))
+                     self.scene.selection_count())
         self.actiongroup_set_enabled('active_when_selection',
                                      self.scene.has_selection())
         self.actiongroup_set_enabled('active_when_croppable',
                                      self.scene.has_croppable_selection())
-        self.viewport().repaint()
 
     def recalc_scene_rect(self):
         """Resize the scene rectangle so that it is always one view width
@@ -359,13 +527,12 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
             return
         logger.trace('Recalculating scene rectangle...')
         try:
-            topleft = self.mapFromScene(
-                self.scene.itemsBoundingRect().topLeft())
+            rect = self.scene.itemsBoundingRect()
+            topleft = self.mapFromScene(rect.topLeft())
             topleft = self.mapToScene(QtCore.QPoint(
                 topleft.x() - self.size().width(),
                 topleft.y() - self.size().height()))
-            bottomright = self.mapFromScene(
-                self.scene.itemsBoundingRect().bottomRight())
+            bottomright = self.mapFromScene(rect.bottomRight())
             bottomright = self.mapToScene(QtCore.QPoint(
                 bottomright.x() + self.size().width(),
                 bottomright.y() + self.size().height()))
@@ -386,10 +553,9 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
             arguments and turns it into a number, for ex. ``min`` or ``max``.
         """
 
-        topleft = self.mapFromScene(
-            self.scene.itemsBoundingRect().topLeft())
-        bottomright = self.mapFromScene(
-            self.scene.itemsBoundingRect().bottomRight())
+        rect = self.scene.itemsBoundingRect()
+        topleft = self.mapFromScene(rect.topLeft())
+        bottomright = self.mapFromScene(rect.bottomRight())
         return func(bottomright.x() - topleft.x(),
                     bottomright.y() - topleft.y())
 
@@ -402,7 +568,7 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
         return self.transform().m11()
 
     def pan(self, delta):
-        if not self.scene.items():
+        if not self.scene.has_items():
             logger.debug('No items in scene; ignore pan')
             return
 
@@ -412,9 +578,23 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
         vscroll.setValue(round(vscroll.value() + delta.y()))
 
     def zoom(self, delta, anchor):
-        if not self.scene.items():
-            logger.debug('No items in scene; ignore zoom')
+        if delta == 0:
             return
+        factor = 1 + abs(delta / 1000)
+        if delta < 0:
+            factor = 1 / factor
+        self.zoom_by_factor(factor, anchor)
+
+    def zoom_by_factor(self, factor, anchor):
+        """Zooms by ``factor`` while keeping ``anchor`` (in view
+        coordinates) fixed.
+
+        :return: ``False`` if the zoom limit has been reached.
+        """
+
+        if not self.scene.has_items():
+            logger.debug('No items in scene; ignore zoom')
+            return False
 
         # We calculate where the anchor is before and after the zoom
         # and then move the view accordingly to keep the anchor fixed
@@ -424,30 +604,250 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
         anchor = QtCore.QPoint(round(anchor.x()),
                                round(anchor.y()))
         ref_point = self.mapToScene(anchor)
-        if delta == 0:
-            return
-        factor = 1 + abs(delta / 1000)
-        if delta > 0:
+        if factor > 1:
             if self.get_zoom_size(max) < 10000000:
                 self.scale(factor, factor)
             else:
                 logger.debug('Maximum zoom size reached')
-                return
+                return False
         else:
             if self.get_zoom_size(min) > 50:
-                self.scale(1/factor, 1/factor)
+                self.scale(factor, factor)
             else:
                 logger.debug('Minimum zoom size reached')
-                return
+                return False
 
         self.pan(self.mapFromScene(ref_point) - anchor)
         self.reset_previous_transform()
+        return True
+
+    def request_pan(self, delta):
+        """Pans by ``delta`` with the next frame."""
+
+        self.pending_pan += delta
+        self.schedule_frame()
+
+    def request_zoom(self, delta, anchor):
+        """Zooms by ``delta`` (see ``zoom``) with the next frame."""
+
+        if delta == 0:
+            return
+        factor = 1 + abs(delta / 1000)
+        if delta < 0:
+            factor = 1 / factor
+        self.pending_zoom *= factor
+        self.pending_zoom_anchor = anchor
+        self.schedule_frame()
+
+    def request_mouse_move(self, event):
+        """Passes a mouse move on to the scene with the next frame.
+
+        Only the most recent move is kept; dragging items and the
+        rubberband only depends on the current mouse position.
+        """
+
+        self.begin_fast_rendering()
+        if self.frame_timer.isActive():
+            self.pending_mouse_move = event.clone()
+        else:
+            self.pending_mouse_move = None
+            super().mouseMoveEvent(event)
+            self.frame_timer.start()
+
+    def has_pending_input(self):
+        return (self.pending_mouse_move is not None
+                or self.pending_zoom != 1
+                or not self.pending_pan.isNull())
+
+    def begin_fast_rendering(self):
+        """Switches to fast rendering until input has been idle for
+        ``RENDER_IDLE_MS``."""
+
+        if not self.scene.fast_rendering:
+            logger.trace('Switching to fast rendering')
+            self.scene.fast_rendering = True
+            self.setRenderHint(
+                QtGui.QPainter.RenderHint.SmoothPixmapTransform, False)
+        self.render_idle_timer.start()
+
+    def on_render_idle(self):
+        logger.trace('Switching to high quality rendering')
+        self.scene.fast_rendering = False
+        self.setRenderHint(QtGui.QPainter.RenderHint.SmoothPixmapTransform)
+        self.viewport().update()
+
+    def update_overlay(self, rect):
+        """Schedules a repaint of the selection and hover overlay in the
+        given scene rect."""
+
+        # Leave room for handles, which have a fixed size on screen
+        margin = (SelectableMixin.SELECT_RESIZE_SIZE // 2
+                  + SelectableMixin.SELECT_ROTATE_SIZE
+                  + SelectableMixin.SELECT_HANDLE_SIZE)
+        rect = self.mapFromScene(rect).boundingRect()
+        self.viewport().update(rect.adjusted(
+            -margin, -margin, margin, margin))
+
+    def drawForeground(self, painter, rect):
+        """Paints selection outlines, handles and hover icons of all
+        items in a single pass on top of the scene."""
+
+        super().drawForeground(painter, rect)
+        for item in self.scene.overlay_items(rect):
+            painter.save()
+            painter.setTransform(item.sceneTransform(), True)
+            item.paint_overlay(painter)
+            painter.restore()
+
+    def tile_cache_enabled(self):
+        return self.settings.value('View/tile_cache', False, type=bool)
+
+    def get_scaled_viewport_offset(self):
+        """The position of the scaled scene coordinates' origin in
+        viewport coordinates."""
+
+        transform = self.viewportTransform()
+        return QtCore.QPointF(transform.dx(), transform.dy())
+
+    def get_tile_keys(self, rect, margin=0):
+        """The keys of the cache tiles covering the viewport ``rect``,
+        optionally extended by ``margin`` tiles on each side."""
+
+        size = self.tile_cache.TILE_SIZE * margin
+        rect = QtCore.QRectF(rect).translated(
+            -self.get_scaled_viewport_offset())
+        return self.tile_cache.keys_for_rect(
+            rect.marginsAdded(QtCore.QMarginsF(size, size, size, size)))
+
+    def render_tile(self, key):
+        ratio = self.viewport().devicePixelRatioF()
+        size = round(self.tile_cache.TILE_SIZE * ratio)
+        tile = QtGui.QPixmap(size, size)
+        tile.setDevicePixelRatio(ratio)
+        tile.fill(self.backgroundBrush().color())
+        painter = QtGui.QPainter(tile)
+        painter.setRenderHints(self.renderHints())
+        self.scene.render(
+            painter,
+            QtCore.QRectF(0, 0, self.tile_cache.TILE_SIZE,
+                          self.tile_cache.TILE_SIZE),
+            self.tile_cache.scene_rect(key),
+            Qt.AspectRatioMode.IgnoreAspectRatio)
+        painter.end()
+        return tile
+
+    def build_tiles(self):
+        """Renders queued tiles while input is idle, a few at a time so
+        that the UI stays responsive."""
+
+        if self.scene.fast_rendering:
+            # Wait until the user has stopped interacting
+            self.tile_build_timer.start(constants.RENDER_IDLE_MS)
+            return
+
+        timer = QtCore.QElapsedTimer()
+        timer.start()
+        while self.tile_build_queue:
+            key = self.tile_build_queue.pop(0)
+            if key not in self.tile_cache:
+                self.tile_cache.put(key, self.render_tile(key))
+            if timer.elapsed() > constants.TILE_BUILD_BUDGET_MS:
+                break
+        if self.tile_build_queue:
+            self.tile_build_timer.start(0)
+
+    def paint_from_tile_cache(self, event):
+        """Paints the exposed area from cached tiles if all of them are
+        available and queues the missing ones otherwise.
+
+        :return: ``True`` if the area has been painted.
+        """
+
+        self.tile_cache.set_scale(self.get_scale())
+        rect = event.rect()
+        keys = self.get_tile_keys(QtCore.QRectF(rect))
+        tiles = [self.tile_cache.get(key) for key in keys]
+        if any(tile is None for tile in tiles):
+            # Render the visible tiles and the ones around them, so
+            # that they are available for panning
+            visible = self.get_tile_keys(
+                QtCore.QRectF(self.viewport().rect()), margin=1)
+            self.tile_build_queue = [
+                key for key in visible if key not in self.tile_cache]
+            self.tile_build_timer.start(constants.RENDER_IDLE_MS)
+            return False
+
+        offset = self.get_scaled_viewport_offset()
+        painter = QtGui.QPainter(self.viewport())
+        painter.setClipRegion(event.region())
+        for key, tile in zip(keys, tiles):
+            painter.drawPixmap(
+                self.tile_cache.tile_rect(key).topLeft() + offset, tile)
+        painter.setTransform(self.viewportTransform())
+        self.drawForeground(painter, self.mapToScene(rect).boundingRect())
+        painter.end()
+        return True
+
+    def paintEvent(self, event):
+        if self.tile_cache_enabled() and self.scene.has_items():
+            if self.paint_from_tile_cache(event):
+                return
+        super().paintEvent(event)
+
+    def schedule_frame(self):
+        """Applies pending input right away if no frame has been drawn
+        recently, otherwise leaves it to the next frame tick.
+
+        This bounds the cost of panning, zooming and dragging by the
+        frame rate instead of the rate of incoming input events, which
+        can be a lot higher for high-rate mice and trackpads.
+        """
+
+        self.begin_fast_rendering()
+        if not self.frame_timer.isActive():
+            self.apply_pending_input()
+            self.frame_timer.start()
+
+    def on_frame(self):
+        if self.has_pending_input():
+            self.apply_pending_input()
+            self.frame_timer.start()
+
+    def apply_pending_input(self, animate=True):
+        if self.pending_mouse_move is not None:
+            event = self.pending_mouse_move
+            self.pending_mouse_move = None
+            super().mouseMoveEvent(event)
+
+        if self.pending_zoom != 1:
+            factor = self.pending_zoom
+            if (animate
+                    and self.settings.value('View/animate_zoom', False,
+                                            type=bool)
+                    and abs(math.log(factor)) > 0.005):
+                factor = factor ** constants.ZOOM_ANIMATION_STEP
+            if self.zoom_by_factor(factor, self.pending_zoom_anchor):
+                self.pending_zoom /= factor
+            else:
+                self.pending_zoom = 1
+
+        if not self.pending_pan.isNull():
+            delta = self.pending_pan
+            self.pending_pan = QtCore.QPointF()
+            self.pan(delta)
+
+    def flush_pending_input(self):
+        """Applies all pending input immediately, e.g. before a mouse
+        release ends a drag."""
+
+        self.apply_pending_input(animate=False)
 
     def wheelEvent(self, event):
-        self.zoom(event.angleDelta().y(), event.position())
+        self.request_zoom(event.angleDelta().y(), event.position())
         event.accept()
 
     def mousePressEvent(self, event):
+        self.flush_pending_input()
         if (event.button() == Qt.MouseButton.MiddleButton
                 and event.modifiers() == Qt.KeyboardModifier.ControlModifier):
             self.zoom_active = True
@@ -479,7 +879,7 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
         if self.pan_active:
             self.reset_previous_transform()
             pos = event.position()
-            self.pan(self.event_start - pos)
+            self.request_pan(self.event_start - pos)
             self.event_start = pos
             event.accept()
             return
@@ -489,7 +889,7 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
             pos = event.position()
             delta = (self.event_start - pos).y()
             self.event_start = pos
-            self.zoom(delta * 20, self.event_anchor)
+            self.request_zoom(delta * 20, self.event_anchor)
             event.accept()
             return
 
@@ -502,9 +902,15 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
             event.accept()
             return
 
+        if self.scene.mouseGrabberItem() or self.scene.rubberband_active:
+            # Dragging items, selection handles or the rubberband
+            self.request_mouse_move(event)
+            return
+
         super().mouseMoveEvent(event)
 
     def mouseReleaseEvent(self, event):
+        self.flush_pending_input()
         if self.pan_active:
             self.setCursor(Qt.CursorShape.ArrowCursor)
             self.pan_active = False
@@ -525,3 +931,4 @@ class DreambGraphicsView(MainControlsMixin, QtWidgets.QGraphicsView, ActionsMixi
         super().resizeEvent(event)
         self.recalc_scene_rect()
         self.welcome_overlay.resize(self.size())
+        self.upload_progress.update_position()
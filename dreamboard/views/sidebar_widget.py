@@ -32,6 +32,9 @@ class SidebarWidget(QtWidgets.QWidget):
             metadata["source_link"] = self.source_link.text()
             metadata["source_is_local"] = self.source_is_local.isChecked()
             self.current_item.setData(1, {"meta": metadata})
+            if self.current_item.scene():
+                self.current_item.scene().change_journal.record(
+                    [self.current_item])
 
     def set_current_item(self, item):
         self.current_item = item
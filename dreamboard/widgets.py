@@ -156,6 +156,57 @@ class DreambProgressDialog(QtWidgets.QProgressDialog):
         QtCore.QTimer.singleShot(100, self.deleteLater)
 
 
+class UploadProgress(QtWidgets.QLabel):
+    """Shows the progress of running uploads in the bottom left corner
+    of its parent."""
+
+    MARGIN = 10
+    MAX_FILES = 5
+
+    def __init__(self, parent, pool):
+        super().__init__(parent)
+        #: Label, bytes sent and size of each upload, by storage name
+        self.uploads = {}
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.hide()
+        pool.started.connect(self.on_started)
+        pool.progress.connect(self.on_progress)
+        pool.file_finished.connect(self.on_file_finished)
+
+    def on_started(self, name, label, size):
+        self.uploads[name] = (label, 0, size)
+        self.update_text()
+
+    def on_progress(self, name, sent, size):
+        if name in self.uploads:
+            self.uploads[name] = (self.uploads[name][0], sent, size)
+            self.update_text()
+
+    def on_file_finished(self, name, success):
+        self.uploads.pop(name, None)
+        self.update_text()
+
+    def update_text(self):
+        if not self.uploads:
+            self.hide()
+            return
+        lines = [f'Uploading {len(self.uploads)} image(s)']
+        for label, sent, size in list(self.uploads.values())[
+                :self.MAX_FILES]:
+            percent = int(100 * sent / size) if size else 100
+            lines.append(f'{label}: {percent}%')
+        if len(self.uploads) > self.MAX_FILES:
+            lines.append(f'and {len(self.uploads) - self.MAX_FILES} more')
+        self.setText('\n'.join(lines))
+        self.adjustSize()
+        self.update_position()
+        self.show()
+
+    def update_position(self):
+        self.move(self.MARGIN,
+                  self.parent().height() - self.height() - self.MARGIN)
+
+
 class HelpDialog(QtWidgets.QDialog):
     def __init__(self, parent):
         super().__init__(parent)
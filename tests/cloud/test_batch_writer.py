@@ -0,0 +1,74 @@
+from unittest.mock import MagicMock
+
+from google.api_core.exceptions import NotFound
+
+from dreamboard.cloud.batch_writer import BatchWriter
+
+
+def test_commit_groups_writes_into_batches():
+    db = MagicMock()
+    writer = BatchWriter(db, limit=2)
+    refs = [MagicMock() for i in range(5)]
+    writer.set(refs[0], {'a': 1}, 'k0')
+    writer.update(refs[1], {'b': 2}, 'k1')
+    writer.delete(refs[2], 'k2')
+    writer.update(refs[3], {'c': 3}, 'k3')
+    writer.set(refs[4], {'d': 4}, 'k4')
+    assert len(writer) == 5
+
+    assert writer.commit() == []
+    assert db.batch.call_count == 3
+    assert writer.round_trips == 3
+    assert len(writer) == 0
+    batch = db.batch.return_value
+    assert batch.commit.call_count == 3
+    batch.delete.assert_called_once_with(refs[2])
+    assert [c[0] for c in batch.update.call_args_list] == [
+        (refs[1], {'b': 2}), (refs[3], {'c': 3})]
+
+
+def test_commit_without_writes():
+    db = MagicMock()
+    writer = BatchWriter(db)
+    assert writer.commit() == []
+    db.batch.assert_not_called()
+    assert writer.round_trips == 0
+
+
+def test_commit_reports_failed_batch():
+    db = MagicMock()
+    batches = [MagicMock(), MagicMock()]
+    batches[0].commit.side_effect = RuntimeError('offline')
+    db.batch.side_effect = batches
+    writer = BatchWriter(db, limit=2)
+    for i in range(3):
+        writer.delete(MagicMock(), i)
+    assert writer.commit() == [0, 1]
+    batches[1].commit.assert_called_once_with()
+
+
+def test_commit_retries_batch_with_missing_document_one_by_one():
+    db = MagicMock()
+    missing = MagicMock()
+    batches = []
+
+    def make_batch():
+        batch = MagicMock()
+        refs = []
+        batch.update.side_effect = lambda ref, data: refs.append(ref)
+
+        def commit():
+            if missing in refs:
+                raise NotFound('missing')
+        batch.commit.side_effect = commit
+        batches.append(batch)
+        return batch
+
+    db.batch.side_effect = make_batch
+    writer = BatchWriter(db)
+    writer.update(MagicMock(), {}, 'ok1')
+    writer.update(missing, {}, 'missing')
+    writer.update(MagicMock(), {}, 'ok2')
+    assert writer.commit() == ['missing']
+    assert len(batches) == 4
+    assert writer.round_trips == 4
@@ -0,0 +1,96 @@
+import base64
+import hashlib
+import os
+
+from dreamboard.cloud.blob_cache import BlobCache, blob_md5
+
+
+def test_blob_md5():
+    assert blob_md5(b'foo') == base64.b64encode(
+        hashlib.md5(b'foo').digest()).decode('ascii')
+
+
+def test_put_get(tmp_path):
+    cache = BlobCache(str(tmp_path / 'cache'))
+    assert cache.get('a.png', 'md5a') is None
+    cache.put('a.png', 'md5a', b'aaa')
+    assert cache.get('a.png', 'md5a') == b'aaa'
+    assert ('a.png', 'md5a') in cache
+    assert cache.size == 3
+
+
+def test_get_other_md5(tmp_path):
+    cache = BlobCache(str(tmp_path))
+    cache.put('a.png', 'md5a', b'aaa')
+    assert cache.get('a.png', 'md5b') is None
+    assert cache.get('b.png', 'md5a') is None
+
+
+def test_put_replaces(tmp_path):
+    cache = BlobCache(str(tmp_path))
+    cache.put('a.png', 'md5a', b'aaa')
+    cache.put('a.png', 'md5a', b'aaaaa')
+    assert cache.get('a.png', 'md5a') == b'aaaaa'
+    assert cache.size == 5
+
+
+def test_persists(tmp_path):
+    BlobCache(str(tmp_path)).put('a.png', 'md5a', b'aaa')
+    cache = BlobCache(str(tmp_path))
+    assert cache.get('a.png', 'md5a') == b'aaa'
+    assert cache.size == 3
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = BlobCache(str(tmp_path), max_bytes=6)
+    cache.put('a.png', 'md5a', b'aa')
+    cache.put('b.png', 'md5b', b'bb')
+    cache.get('a.png', 'md5a')
+    cache.put('c.png', 'md5c', b'ccc')
+    assert ('a.png', 'md5a') in cache
+    assert ('b.png', 'md5b') not in cache
+    assert ('c.png', 'md5c') in cache
+    assert cache.size == 5
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_evicts_by_access_time_after_restart(tmp_path):
+    cache = BlobCache(str(tmp_path))
+    cache.put('a.png', 'md5a', b'aa')
+    cache.put('b.png', 'md5b', b'bb')
+    os.utime(cache.path(cache.key('a.png', 'md5a')), (1000, 1000))
+    os.utime(cache.path(cache.key('b.png', 'md5b')), (2000, 2000))
+    cache = BlobCache(str(tmp_path), max_bytes=3)
+    assert ('a.png', 'md5a') not in cache
+    assert ('b.png', 'md5b') in cache
+
+
+def test_doesnt_cache_blobs_larger_than_limit(tmp_path):
+    cache = BlobCache(str(tmp_path), max_bytes=2)
+    cache.put('a.png', 'md5a', b'aaa')
+    assert cache.get('a.png', 'md5a') is None
+    assert cache.size == 0
+
+
+def test_discard(tmp_path):
+    cache = BlobCache(str(tmp_path))
+    cache.put('a.png', 'md5a', b'aaa')
+    cache.discard('a.png', 'md5a')
+    assert cache.get('a.png', 'md5a') is None
+    assert os.listdir(tmp_path) == []
+    assert cache.size == 0
+
+
+def test_file_removed_externally(tmp_path):
+    cache = BlobCache(str(tmp_path))
+    cache.put('a.png', 'md5a', b'aaa')
+    os.remove(cache.path(cache.key('a.png', 'md5a')))
+    assert cache.get('a.png', 'md5a') is None
+    assert cache.size == 0
+
+
+def test_removes_leftover_temporary_files(tmp_path):
+    (tmp_path / 'abc.tmp').write_bytes(b'xx')
+    cache = BlobCache(str(tmp_path))
+    assert cache.size == 0
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+
+from dreamboard.cloud.board_cache import BoardCache
+
+
+def test_get_when_empty():
+    assert BoardCache().get() is None
+
+
+def test_set_get_sorted_by_updated_at():
+    cache = BoardCache()
+    cache.set([{'id': 'a', 'updated_at': 1}, {'id': 'b', 'updated_at': 2}])
+    assert [b['id'] for b in cache.get()] == ['b', 'a']
+    assert 'a' in cache
+    assert 'c' not in cache
+
+
+def test_get_returns_copies():
+    cache = BoardCache()
+    cache.set([{'id': 'a', 'updated_at': 1}])
+    cache.get()[0]['name'] = 'foo'
+    assert 'name' not in cache.get()[0]
+
+
+def test_get_when_expired():
+    cache = BoardCache(ttl=10)
+    with patch('time.monotonic', return_value=100):
+        cache.set([{'id': 'a', 'updated_at': 1}])
+    with patch('time.monotonic', return_value=109):
+        assert cache.get() is not None
+    with patch('time.monotonic', return_value=110):
+        assert cache.get() is None
+        assert 'a' not in cache
+
+
+def test_update_existing_board():
+    cache = BoardCache()
+    cache.set([{'id': 'a', 'updated_at': 1}, {'id': 'b', 'updated_at': 2}])
+    cache.update('a', updated_at=3)
+    assert [b['id'] for b in cache.get()] == ['a', 'b']
+
+
+def test_update_adds_new_board():
+    cache = BoardCache()
+    cache.set([])
+    cache.update('a', name='foo', updated_at=3)
+    assert cache.get() == [{'id': 'a', 'name': 'foo', 'updated_at': 3}]
+
+
+def test_update_when_empty():
+    cache = BoardCache()
+    cache.update('a', updated_at=3)
+    assert cache.get() is None
+
+
+def test_invalidate():
+    cache = BoardCache()
+    cache.set([{'id': 'a', 'updated_at': 1}])
+    cache.invalidate()
+    assert cache.get() is None
+
+
+def test_update_with_aware_datetimes():
+    cache = BoardCache()
+    cache.set([
+        {'id': 'a', 'updated_at': DatetimeWithNanoseconds(
+            2024, 1, 1, tzinfo=timezone.utc)},
+        {'id': 'b', 'updated_at': DatetimeWithNanoseconds(
+            2024, 1, 2, tzinfo=timezone.utc)},
+    ])
+    cache.update('a', updated_at=datetime.now(timezone.utc))
+    cache.update('c', updated_at=datetime.now(timezone.utc) - timedelta(
+        days=1))
+    assert [b['id'] for b in cache.get()] == ['a', 'c', 'b']
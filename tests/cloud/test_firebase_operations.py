@@ -0,0 +1,498 @@
+from datetime import timezone
+import hashlib
+from unittest.mock import MagicMock, call, patch
+
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+from google.api_core.exceptions import NotFound
+import pytest
+
+from PyQt6 import QtCore, QtGui
+
+from dreamboard import commands
+from dreamboard.cloud import firebase_operations
+from dreamboard.cloud.blob_cache import BlobCache, blob_md5
+from dreamboard.cloud.board_cache import BoardCache
+from dreamboard.cloud.journal import image_fields
+from dreamboard.cloud.snapshot import image_to_png, take_snapshot
+from dreamboard.cloud.uploads import LocalStorage, UploadError, UploadPool
+from dreamboard.items import DreambPixmapItem
+
+
+FORMAT = QtGui.QImage.Format.Format_ARGB32
+
+
+def make_doc(doc_id, data, exists=True):
+    doc = MagicMock(id=doc_id, exists=exists)
+    doc.to_dict.return_value = dict(data)
+    return doc
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = MagicMock()
+    user_doc = make_doc('user1', {'boards': ['b1', 'b2', 'b3']})
+    db.collection.return_value.document.return_value.get.return_value = \
+        user_doc
+    db.get_all.return_value = [
+        make_doc('b1', {'name': 'one', 'updated_at': 1}),
+        make_doc('b2', {'name': 'two', 'updated_at': 2}),
+        make_doc('b3', {}, exists=False),
+    ]
+    with patch('dreamboard.firebase.get_firestore', return_value=db), \
+            patch('dreamboard.user_instance.user', MagicMock(id='user1')), \
+            patch.object(firebase_operations, 'board_cache', BoardCache()), \
+            patch.object(firebase_operations, 'upload_pool',
+                         UploadPool(LocalStorage(str(tmp_path)))), \
+            patch.object(firebase_operations, 'blob_cache',
+                         BlobCache(str(tmp_path / 'cache'))):
+        yield db
+
+
+def test_fetch_boards_batched(db):
+    boards = firebase_operations.fetch_boards()
+    assert boards == [{'id': 'b2', 'name': 'two', 'updated_at': 2},
+                      {'id': 'b1', 'name': 'one', 'updated_at': 1}]
+    db.get_all.assert_called_once()
+    assert len(db.get_all.call_args[0][0]) == 3
+    db.collection.return_value.document.return_value.get \
+        .assert_called_once_with()
+
+
+def test_fetch_boards_uses_cache(db):
+    firebase_operations.fetch_boards()
+    boards = firebase_operations.fetch_boards()
+    assert [b['id'] for b in boards] == ['b2', 'b1']
+    db.get_all.assert_called_once()
+
+
+def test_fetch_boards_force(db):
+    firebase_operations.fetch_boards()
+    firebase_operations.fetch_boards(force=True)
+    assert db.get_all.call_count == 2
+
+
+def test_fetch_boards_when_error_doesnt_cache(db):
+    db.get_all.side_effect = RuntimeError('offline')
+    assert firebase_operations.fetch_boards() == []
+    assert firebase_operations.board_cache.get() is None
+
+
+def test_save_doesnt_list_boards(db, view):
+    # Creating the view has loaded the boards already
+    db.reset_mock()
+    view.scene.change_journal.record_board()
+    with patch.object(firebase_operations, 'fetch_boards') as fetch_mock:
+        firebase_operations.save_dreamb_cloud(view.scene, {}, [], 'b1')
+        fetch_mock.assert_not_called()
+    db.get_all.assert_not_called()
+    board_ref = db.collection.return_value.document.return_value
+    board_ref.update.assert_called_once()
+
+
+def test_save_creates_missing_board(db, view):
+    board_ref = db.collection.return_value.document.return_value
+    board_ref.update.side_effect = NotFound('missing')
+    new_ref = MagicMock(id='new')
+    db.collection.return_value.add.return_value = (None, new_ref)
+    firebase_operations.board_cache.set([])
+    view.scene.change_journal.record_board()
+
+    boards = [{'id': 'NEW', 'name': 'My board'}]
+    firebase_operations.save_dreamb_cloud(view.scene, {}, boards, 'NEW')
+    board_data = db.collection.return_value.add.call_args[0][0]
+    assert board_data['name'] == 'My board'
+    assert 'new' in firebase_operations.board_cache
+    assert view.scene.change_journal.board_id == 'new'
+    assert view.scene.change_journal.is_empty()
+    assert boards == [{'id': 'new', 'name': 'My board'}]
+
+
+def test_save_keeps_cached_boards_sortable(db, view):
+    db.get_all.return_value = [
+        make_doc('b1', {'name': 'one', 'updated_at': DatetimeWithNanoseconds(
+            2024, 1, 1, tzinfo=timezone.utc)}),
+        make_doc('b2', {'name': 'two', 'updated_at': DatetimeWithNanoseconds(
+            2024, 1, 2, tzinfo=timezone.utc)}),
+    ]
+    firebase_operations.fetch_boards(force=True)
+    view.scene.change_journal.record_board()
+    firebase_operations.save_dreamb_cloud(view.scene, {}, [], 'b1')
+    boards = firebase_operations.fetch_boards()
+    assert [b['id'] for b in boards] == ['b1', 'b2']
+
+
+def test_save_when_cached_board_deleted_invalidates_cache(db, view):
+    firebase_operations.fetch_boards()
+    board_ref = db.collection.return_value.document.return_value
+    board_ref.update.side_effect = NotFound('missing')
+    db.collection.return_value.add.side_effect = RuntimeError('offline')
+    view.scene.change_journal.record_board()
+    firebase_operations.save_dreamb_cloud(view.scene, {}, [], 'b1')
+    assert firebase_operations.board_cache.get() is None
+
+
+def test_create_board_when_error_invalidates_cache(db):
+    firebase_operations.fetch_boards()
+    db.collection.return_value.add.side_effect = RuntimeError('offline')
+    assert firebase_operations.create_board_in_cloud(
+        db, None, 'Board') is None
+    assert firebase_operations.board_cache.get() is None
+
+
+def make_image_item(uuid=None):
+    img = QtGui.QImage(10, 10, FORMAT)
+    img.fill(QtGui.QColor(255, 0, 0))
+    item = DreambPixmapItem(img, 'foo.png')
+    item.setData(0, uuid)
+    return item
+
+
+def test_save_when_journal_empty_skips_network(db, view):
+    db.reset_mock()
+    with patch('dreamboard.cloud.firebase_operations.firebase.get_firestore') \
+            as get_mock:
+        firebase_operations.save_dreamb_cloud(view.scene, {}, [], 'b1')
+        get_mock.assert_not_called()
+    assert db.mock_calls == []
+
+
+def images_col(db):
+    return db.collection.return_value.document.return_value \
+        .collection.return_value
+
+
+def test_save_sends_only_deltas(db, view):
+    journal = view.scene.change_journal
+    item = make_image_item('img1')
+    view.scene.addItem(item)
+    journal.reset('b1', {'img1': image_fields(item)})
+    view.undo_stack.push(commands.MoveItemsBy([item], QtCore.QPointF(5, 0)))
+    assert not journal.is_empty()
+
+    with patch.object(firebase_operations, 'update_presets_in_cloud') \
+            as presets_mock:
+        firebase_operations.save_dreamb_cloud(view.scene, {}, [], 'b1')
+        presets_mock.assert_not_called()
+    images_col(db).document.assert_called_once_with('img1')
+    batch = db.batch.return_value
+    batch.commit.assert_called_once_with()
+    ref, data = batch.update.call_args[0]
+    assert ref is images_col(db).document.return_value
+    assert data['x'] == 5
+    assert 'y' not in data
+    assert 'info_text' not in data
+    assert journal.synced['img1']['x'] == 5
+    assert journal.is_empty()
+
+
+def test_save_new_and_deleted_images(db, view, tmp_path):
+    journal = view.scene.change_journal
+    old = make_image_item('img1')
+    journal.reset('b1', {'img1': image_fields(old)})
+    new = make_image_item()
+    view.scene.addItem(new)
+    journal.record([old, new])
+
+    firebase_operations.save_dreamb_cloud(view.scene, {}, [], 'b1')
+    data = new.pixmap_to_bytes()
+    content_hash = hashlib.sha256(data).hexdigest()
+    blob_path = tmp_path / 'images' / f'{content_hash}.png'
+    assert blob_path.read_bytes() == data
+    new_id = new.data(0)
+    assert set(journal.synced) == {new_id}
+    assert images_col(db).document.call_args_list == [
+        call('img1'), call(new_id)]
+    batch = db.batch.return_value
+    batch.delete.assert_called_once_with(images_col(db).document.return_value)
+    data = batch.set.call_args[0][1]
+    assert data['filename'] == 'foo.png'
+    assert data['storage_url'] == f'images/{content_hash}.png'
+    assert data['hash'] == content_hash
+    assert data['uuid'] == new_id
+    md5 = blob_md5(blob_path.read_bytes())
+    assert data['md5'] == md5
+    # Uploaded images are cached right away
+    assert (data['storage_url'], md5) in firebase_operations.blob_cache
+    # One batch for all writes
+    db.batch.assert_called_once_with()
+    batch.commit.assert_called_once_with()
+    assert journal.is_empty()
+
+
+def test_save_uploads_new_images_in_parallel(db, view):
+    journal = view.scene.change_journal
+    items = [make_image_item() for i in range(8)]
+    for item in items:
+        view.scene.addItem(item)
+    journal.reset('b1', {})
+    journal.record(items)
+    pool = firebase_operations.upload_pool
+    with patch.object(pool, 'submit', wraps=pool.submit) as submit_mock:
+        firebase_operations.save_dreamb_cloud(view.scene, {}, [], 'b1')
+    assert submit_mock.call_count == 8
+    assert len(journal.synced) == 8
+    assert journal.is_empty()
+
+
+def test_save_uploads_same_image_once(db, view):
+    journal = view.scene.change_journal
+    items = [make_image_item() for i in range(3)]
+    for item in items:
+        view.scene.addItem(item)
+    journal.reset('b1', {})
+    journal.record(items)
+    storage = firebase_operations.upload_pool.storage
+    with patch.object(storage, 'upload', wraps=storage.upload) as upload:
+        result = firebase_operations.sync_snapshot(
+            take_snapshot(view.scene, {}, [], 'b1')[0])
+    upload.assert_called_once()
+    assert result.uploads == 1
+    assert len(result.uploaded) == 3
+    urls = {c[0][1]['storage_url']
+            for c in db.batch.return_value.set.call_args_list}
+    assert len(urls) == 1
+
+
+def test_save_skips_upload_of_stored_image(db, view):
+    item = make_image_item()
+    view.scene.addItem(item)
+    journal = view.scene.change_journal
+    journal.reset('b1', {})
+    journal.record([item])
+    storage = firebase_operations.upload_pool.storage
+    storage.upload(firebase_operations.blob_fields(item.pixmap_to_bytes())
+                   ['storage_url'], b'', None)
+    with patch.object(storage, 'upload') as upload:
+        firebase_operations.save_dreamb_cloud(view.scene, {}, [], 'b1')
+    upload.assert_not_called()
+    assert item.data(0) is not None
+    assert journal.is_empty()
+
+
+def test_save_uploads_preview(db, view, tmp_path):
+    img = QtGui.QImage(1000, 500, QtGui.QImage.Format.Format_RGB32)
+    img.fill(QtGui.QColor(0, 255, 0))
+    item = DreambPixmapItem(img, 'big.png')
+    view.scene.addItem(item)
+    journal = view.scene.change_journal
+    journal.reset('b1', {})
+    journal.record([item])
+    firebase_operations.save_dreamb_cloud(view.scene, {}, [], 'b1')
+    data = db.batch.return_value.set.call_args[0][1]
+    assert data['width'] == 1000
+    assert data['height'] == 500
+    assert data['preview_url'].startswith('previews/')
+    assert data['preview_url'].endswith('.jpg')
+    preview = QtGui.QImage(str(tmp_path / data['preview_url']))
+    assert (preview.width(), preview.height()) == (256, 128)
+    assert (data['preview_url'], data['preview_md5']) in \
+        firebase_operations.blob_cache
+
+
+def test_save_small_image_without_preview(db, view):
+    item = make_image_item()
+    view.scene.addItem(item)
+    journal = view.scene.change_journal
+    journal.reset('b1', {})
+    journal.record([item])
+    firebase_operations.save_dreamb_cloud(view.scene, {}, [], 'b1')
+    data = db.batch.return_value.set.call_args[0][1]
+    assert (data['width'], data['height']) == (10, 10)
+    assert 'preview_url' not in data
+
+
+def test_image_upload_when_preview_fails(db):
+    img = QtGui.QImage(1000, 500, QtGui.QImage.Format.Format_RGB32)
+    storage = firebase_operations.upload_pool.storage
+    upload = storage.upload
+
+    def fail_previews(name, data, content_type):
+        if name.startswith('previews/'):
+            raise UploadError('denied')
+        upload(name, data, content_type)
+
+    with patch.object(storage, 'upload', side_effect=fail_previews):
+        fields = firebase_operations.ImageUpload(img, 'big.png').wait()
+    assert fields['storage_url'].startswith('images/')
+    assert 'preview_url' not in fields
+
+
+def test_image_upload_only_preview(db, tmp_path):
+    img = QtGui.QImage(1000, 500, QtGui.QImage.Format.Format_RGB32)
+    upload = firebase_operations.ImageUpload(img, 'big.png', full=False)
+    fields = upload.wait()
+    assert 'storage_url' not in fields
+    assert fields['preview_url'].startswith('previews/')
+    assert not (tmp_path / 'images').exists()
+    assert len(upload.uploaded()) == 1
+
+
+def test_blob_fields():
+    content_hash = hashlib.sha256(b'abc').hexdigest()
+    assert firebase_operations.blob_fields(b'abc') == {
+        'storage_url': f'images/{content_hash}.png',
+        'hash': content_hash,
+        'md5': blob_md5(b'abc'),
+    }
+
+
+def test_migrate_images(db, tmp_path):
+    img = QtGui.QImage(10, 10, FORMAT)
+    img.fill(QtGui.QColor(255, 0, 0))
+    images = [({'uuid': 'img1', 'filename': 'a.png'}, img),
+              ({'uuid': 'img2', 'filename': 'b.png'}, img)]
+    firebase_operations.migrate_images('b1', images)
+    blob = firebase_operations.blob_fields(image_to_png(img))
+    assert (tmp_path / blob['storage_url']).exists()
+    assert images_col(db).document.call_args_list == [
+        call('img1'), call('img2')]
+    batch = db.batch.return_value
+    blob.update(width=10, height=10)
+    assert batch.update.call_args_list == [
+        call(images_col(db).document.return_value, blob)] * 2
+    batch.commit.assert_called_once_with()
+    assert (blob['storage_url'], blob['md5']) in \
+        firebase_operations.blob_cache
+
+
+def test_migrate_images_adds_previews(db, tmp_path):
+    img = QtGui.QImage(1000, 500, QtGui.QImage.Format.Format_RGB32)
+    images = [({'uuid': 'img1', 'filename': 'a.png', 'hash': 'abc'}, img)]
+    storage = firebase_operations.upload_pool.storage
+    with patch.object(storage, 'upload', wraps=storage.upload) as upload:
+        firebase_operations.migrate_images('b1', images)
+    upload.assert_called_once()
+    fields = db.batch.return_value.update.call_args[0][1]
+    assert set(fields) == {'width', 'height', 'preview_url', 'preview_md5'}
+
+
+def test_needs_migration():
+    assert firebase_operations.needs_migration({})
+    assert firebase_operations.needs_migration({'hash': 'abc'})
+    assert not firebase_operations.needs_migration(
+        {'hash': 'abc', 'width': 10, 'height': 10})
+    assert not firebase_operations.needs_migration(
+        {'hash': 'abc', 'width': 1000, 'height': 500,
+         'preview_url': 'previews/def.jpg'})
+
+
+def test_needs_migration_when_preview_missing():
+    # E.g. the preview upload failed during an earlier migration
+    assert firebase_operations.needs_migration(
+        {'hash': 'abc', 'width': 1000, 'height': 500})
+    assert firebase_operations.needs_migration(
+        {'hash': 'abc', 'width': 100, 'height': 500})
+
+
+def test_migrate_images_retries_missing_preview(db, tmp_path):
+    img = QtGui.QImage(1000, 500, QtGui.QImage.Format.Format_RGB32)
+    img.fill(QtGui.QColor(255, 0, 0))
+    image_data = {'uuid': 'img1', 'filename': 'a.png', 'hash': 'abc'}
+    storage = firebase_operations.upload_pool.storage
+    with patch.object(storage, 'upload', side_effect=UploadError('denied')):
+        firebase_operations.migrate_images('b1', [(image_data, img)])
+    image_data.update(db.batch.return_value.update.call_args[0][1])
+    assert 'width' in image_data
+    assert firebase_operations.needs_migration(image_data)
+
+    firebase_operations.migrate_images('b1', [(image_data, img)])
+    image_data.update(db.batch.return_value.update.call_args[0][1])
+    assert 'preview_url' in image_data
+    assert not firebase_operations.needs_migration(image_data)
+
+
+def test_migrate_images_when_canceled(db):
+    images = [({'uuid': 'img1', 'filename': 'a.png'},
+               QtGui.QImage(10, 10, FORMAT))]
+    firebase_operations.migrate_images('b1', images, lambda: True)
+    db.batch.assert_not_called()
+
+
+def test_migrate_images_when_upload_fails(db):
+    images = [({'uuid': 'img1', 'filename': 'a.png'},
+               QtGui.QImage(10, 10, FORMAT))]
+    storage = firebase_operations.upload_pool.storage
+    with patch.object(storage, 'upload', side_effect=UploadError('denied')):
+        firebase_operations.migrate_images('b1', images)
+    db.batch.return_value.update.assert_not_called()
+
+
+def test_save_doesnt_create_document_when_upload_fails(db, view):
+    journal = view.scene.change_journal
+    item = make_image_item()
+    view.scene.addItem(item)
+    journal.reset('b1', {})
+    journal.record([item])
+    storage = firebase_operations.upload_pool.storage
+    with patch.object(storage, 'upload', side_effect=UploadError('denied')):
+        firebase_operations.save_dreamb_cloud(view.scene, {}, [], 'b1')
+    assert item.data(0) is None
+    images_col(db).document.assert_not_called()
+    assert firebase_operations.blob_cache.size == 0
+    assert journal.synced == {}
+    assert journal.take().items == [item]
+
+
+def test_save_keeps_failed_changes(db, view):
+    journal = view.scene.change_journal
+    item = make_image_item()
+    view.scene.addItem(item)
+    journal.reset('b1', {})
+    journal.record([item])
+    with patch.object(firebase_operations, 'save_new_image_to_cloud',
+                      return_value=None):
+        firebase_operations.save_dreamb_cloud(view.scene, {}, [], 'b1')
+    assert not journal.is_empty()
+    assert journal.take().items == [item]
+
+
+def test_save_keeps_changes_when_board_cant_be_updated(db, view):
+    journal = view.scene.change_journal
+    board_ref = db.collection.return_value.document.return_value
+    board_ref.update.side_effect = RuntimeError('offline')
+    journal.reset('b1', {})
+    journal.record_board()
+    firebase_operations.save_dreamb_cloud(view.scene, {}, [], 'b1')
+    assert journal.take().board is True
+
+
+def test_save_applies_new_preset_ids(db, view):
+    board_presets_col = images_col(db)
+    board_presets_col.stream.return_value = []
+    board_presets_col.document.return_value = MagicMock(id='p-cloud')
+    presets = {'p-local': {'name': 'Preset'}}
+    view.scene.change_journal.record_presets()
+    firebase_operations.save_dreamb_cloud(view.scene, presets, [], 'b1')
+    assert presets == {'p-cloud': {'name': 'Preset'}}
+
+
+def test_save_keeps_changes_of_failed_batch(db, view):
+    journal = view.scene.change_journal
+    item = make_image_item('img1')
+    view.scene.addItem(item)
+    journal.reset('b1', {'img1': image_fields(item)})
+    view.undo_stack.push(commands.MoveItemsBy([item], QtCore.QPointF(5, 0)))
+    db.batch.return_value.commit.side_effect = RuntimeError('offline')
+
+    firebase_operations.save_dreamb_cloud(view.scene, {}, [], 'b1')
+    assert journal.synced['img1']['x'] == 0
+    assert journal.take().items == [item]
+
+
+def test_save_counts_round_trips(db, view):
+    journal = view.scene.change_journal
+    items = [make_image_item(f'img{i}') for i in range(3)]
+    for item in items:
+        view.scene.addItem(item)
+    journal.reset('b1', {item.data(0): image_fields(item) for item in items})
+    for item in items:
+        item.setPos(10, 10)
+    journal.record(items)
+    journal.record_presets()
+
+    snapshot, changes = take_snapshot(view.scene, {}, [], 'b1')
+    result = firebase_operations.sync_snapshot(snapshot)
+    # Touching the board, listing the presets and one batch
+    assert result.round_trips == 3
+    assert result.uploads == 0
+    assert len(result.updated) == 3
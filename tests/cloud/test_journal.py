@@ -0,0 +1,137 @@
+import json
+import os.path
+
+from PyQt6 import QtCore, QtGui
+
+from dreamboard import commands
+from dreamboard.cloud.journal import (
+    ChangeJournal,
+    command_items,
+    image_fields,
+)
+from dreamboard.items import DreambPixmapItem
+
+
+FORMAT = QtGui.QImage.Format.Format_ARGB32
+
+
+def make_item():
+    return DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+
+
+def test_image_fields(qapp):
+    item = make_item()
+    item.setPos(3, 4)
+    item.setData(1, {'meta': {'info_text': 'foo', 'source_link': 'bar',
+                              'source_is_local': True}})
+    fields = image_fields(item)
+    assert fields['x'] == 3
+    assert fields['y'] == 4
+    assert fields['scale'] == 1
+    assert fields['info_text'] == 'foo'
+    assert fields['source_is_local'] is True
+
+
+def test_image_fields_without_meta(qapp):
+    fields = image_fields(make_item())
+    assert fields['info_text'] == ''
+    assert fields['source_is_local'] is False
+
+
+def test_command_items_of_macro(view):
+    stack = view.undo_stack
+    item1 = make_item()
+    item2 = make_item()
+    stack.beginMacro('Test')
+    stack.push(commands.InsertItems(view.scene, [item1]))
+    stack.push(commands.CropItem(item2, QtCore.QRectF(0, 0, 5, 5)))
+    stack.endMacro()
+    assert command_items(stack.command(0)) == [item1, item2]
+
+
+def test_journal_records_undo_stack(view):
+    journal = view.scene.change_journal
+    item = make_item()
+    view.scene.addItem(item)
+    assert journal.is_empty()
+
+    view.undo_stack.push(commands.MoveItemsBy([item], QtCore.QPointF(5, 0)))
+    assert journal.take().items == [item]
+    assert journal.is_empty()
+
+    view.undo_stack.undo()
+    assert journal.take().items == [item]
+    view.undo_stack.redo()
+    assert journal.take().items == [item]
+
+
+def test_journal_records_merged_commands(view):
+    journal = view.scene.change_journal
+    item1 = make_item()
+    view.scene.addItem(item1)
+    view.undo_stack.push(commands.MoveItemsBy([item1], QtCore.QPointF(5, 0)))
+    journal.take()
+    view.undo_stack.push(commands.MoveItemsBy([item1], QtCore.QPointF(5, 0)))
+    assert view.undo_stack.count() == 1
+    assert journal.take().items == [item1]
+
+
+def test_journal_records_presets_and_board():
+    journal = ChangeJournal()
+    journal.record_presets()
+    changes = journal.take()
+    assert changes.presets is True
+    assert changes.board is False
+    journal.record_board()
+    assert not journal.is_empty()
+    assert journal.take().board is True
+
+
+def test_journal_restore(qapp):
+    journal = ChangeJournal()
+    item = make_item()
+    journal.record([item])
+    journal.record_presets()
+    changes = journal.take()
+    assert journal.is_empty()
+    journal.restore(changes)
+    changes = journal.take()
+    assert changes.items == [item]
+    assert changes.presets is True
+
+
+def test_delta_and_mark_synced():
+    journal = ChangeJournal()
+    journal.reset('b1', {'img1': {'x': 1, 'y': 2, 'extra': 'ignored'}})
+    assert journal.synced['img1']['x'] == 1
+    assert 'extra' not in journal.synced['img1']
+    assert journal.delta('img1', {'x': 1, 'y': 3}) == {'y': 3}
+    journal.mark_synced('img1', {'y': 3})
+    assert journal.delta('img1', {'x': 1, 'y': 3}) == {}
+    journal.forget('img1')
+    assert journal.delta('img1', {'x': 1}) == {'x': 1}
+
+
+def test_synced_state_is_persisted(tmpdir):
+    journal = ChangeJournal(state_dir=str(tmpdir))
+    journal.reset('b1', {'img1': {'x': 1}})
+    journal.mark_synced('img1', {'x': 2})
+    journal.save_state()
+    with open(os.path.join(tmpdir, 'b1.json')) as f:
+        assert json.load(f)['img1']['x'] == 2
+
+    journal = ChangeJournal(state_dir=str(tmpdir))
+    journal.reset('b1')
+    assert journal.synced['img1']['x'] == 2
+    journal.reset('b2')
+    assert journal.synced == {}
+
+
+def test_clear(qapp):
+    journal = ChangeJournal()
+    journal.reset('b1', {'img1': {'x': 1}})
+    journal.record([make_item()])
+    journal.clear()
+    assert journal.is_empty()
+    assert journal.board_id is None
+    assert journal.synced == {}
@@ -0,0 +1,348 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from PyQt6 import QtGui
+
+from dreamboard.cloud import firebase_operations
+from dreamboard.cloud.blob_cache import BlobCache, blob_md5
+from dreamboard.cloud.board_cache import BoardCache
+from dreamboard.cloud.snapshot import image_to_png
+from dreamboard.cloud.uploads import LocalStorage, UploadPool
+from dreamboard.items import DreambPixmapItem
+
+
+FORMAT = QtGui.QImage.Format.Format_ARGB32
+
+
+def make_doc(doc_id, data, exists=True):
+    doc = MagicMock(id=doc_id, exists=exists)
+    doc.to_dict.return_value = dict(data)
+    return doc
+
+
+PNG = image_to_png(QtGui.QImage(10, 20, FORMAT))
+
+
+def image_doc(uuid, x, y, storage_url=None, md5=None, content_hash=None,
+              **fields):
+    return make_doc(uuid, {
+        'uuid': uuid,
+        **({'md5': md5} if md5 else {}),
+        **({'hash': content_hash} if content_hash else {}),
+        **fields,
+        'filename': f'{uuid}.png',
+        'storage_url': storage_url or f'{uuid}.png',
+        'x': x, 'y': y, 'z': 0, 'scale': 2, 'rotation': 0, 'flip': 1,
+        'info_text': 'info', 'source_link': '', 'source_is_local': False,
+    })
+
+
+@pytest.fixture
+def cloud(qapp, tmp_path):
+    db = MagicMock()
+    db.collection.return_value.document.return_value.get.return_value = \
+        make_doc('user1', {'boards': ['b1']})
+    db.get_all.return_value = [make_doc('b1', {'name': 'one',
+                                               'updated_at': 1})]
+    board_ref = db.collection.return_value.document.return_value
+    presets_col = MagicMock()
+    presets_col.stream.return_value = [make_doc('p1', {'name': 'Preset'})]
+    images_col = MagicMock()
+    images_col.stream.return_value = [
+        image_doc('img1', 500, 500, md5=blob_md5(PNG), content_hash='abc',
+                  width=10, height=20),
+        # Saved before image hashes were stored
+        image_doc('img2', 0, 0),
+        image_doc('img3', 100, 100, storage_url='missing.png'),
+    ]
+    board_ref.collection.side_effect = lambda name: {
+        'presets': presets_col, 'images': images_col}[name]
+
+    bucket = MagicMock()
+    blobs = {}
+    for name in ('img1.png', 'img2.png'):
+        blobs[name] = MagicMock(md5_hash=blob_md5(PNG))
+        blobs[name].download_as_bytes.return_value = PNG
+    blobs['missing.png'] = MagicMock()
+    blobs['missing.png'].download_as_bytes.side_effect = \
+        RuntimeError('not found')
+    bucket.blob.side_effect = blobs.get
+    bucket.get_blob.side_effect = lambda name: (
+        None if name == 'missing.png' else blobs[name])
+    db.bucket = bucket
+    db.blobs = blobs
+
+    with patch('dreamboard.firebase.get_firestore', return_value=db), \
+            patch('dreamboard.firebase.get_storage', return_value=bucket), \
+            patch.object(firebase_operations, 'blob_cache',
+                         BlobCache(str(tmp_path / 'cache'))), \
+            patch.object(firebase_operations, 'upload_pool',
+                         UploadPool(LocalStorage(str(tmp_path / 'storage')))), \
+            patch('dreamboard.user_instance.user', MagicMock(id='user1')), \
+            patch.object(firebase_operations, 'board_cache', BoardCache()):
+        yield db
+
+
+def test_order_by_distance():
+    images_data = [{'x': 10, 'y': 0}, {'x': 1, 'y': 1}, {'x': -5, 'y': 0}]
+    result = firebase_operations.order_by_distance(images_data, (0, 0))
+    assert result == [images_data[1], images_data[2], images_data[0]]
+
+
+def test_order_by_distance_defaults_to_center_of_images():
+    images_data = [{'x': 0, 'y': 0}, {'x': 48, 'y': 50}, {'x': 100, 'y': 100}]
+    result = firebase_operations.order_by_distance(images_data)
+    assert result[0] is images_data[1]
+
+
+def test_order_by_distance_when_empty():
+    assert firebase_operations.order_by_distance([]) == []
+
+
+def test_load_dreamb_cloud(cloud, view):
+    worker = MagicMock(canceled=False)
+    view.scene.discard_queued_items()
+    board_id, errors, legacy = firebase_operations.load_dreamb_cloud(
+        view.scene, view.parent, worker, center=(0, 0))
+    assert board_id == 'b1'
+    assert errors == ['missing.png']
+    # Saved before blobs were named after their content
+    assert [image_data['uuid'] for image_data, img in legacy] == ['img2']
+
+    board_id, boards, presets, synced = worker.board_opened.emit.call_args[0]
+    assert board_id == 'b1'
+    assert [b['id'] for b in boards] == ['b1']
+    assert presets == {'p1': {'name': 'Preset'}}
+    assert set(synced) == {'img1', 'img2', 'img3'}
+    worker.begin_processing.emit.assert_called_once_with(3)
+    assert worker.progress.emit.call_count == 3
+
+    view.scene.add_queued_items()
+    items = {item.data(0): item for item in view.scene.items()
+             if isinstance(item, DreambPixmapItem)}
+    assert set(items) == {'img1', 'img2'}
+    assert items['img1'].pos().x() == 500
+    assert items['img1'].scale() == 2
+    assert items['img1'].data(1)['meta']['info_text'] == 'info'
+
+
+def test_load_dreamb_cloud_refetches_unknown_board(cloud, view):
+    worker = MagicMock(canceled=False)
+    firebase_operations.fetch_boards()
+    cloud.get_all.return_value = [
+        make_doc('b1', {'name': 'one', 'updated_at': 1}),
+        make_doc('b2', {'name': 'two', 'updated_at': 2})]
+    firebase_operations.load_dreamb_cloud(
+        view.scene, view.parent, worker, board_id='b2')
+    boards = worker.board_opened.emit.call_args[0][1]
+    assert [b['id'] for b in boards] == ['b2', 'b1']
+
+
+def test_load_dreamb_cloud_caches_images(cloud, view):
+    worker = MagicMock(canceled=False)
+    firebase_operations.load_dreamb_cloud(view.scene, view.parent, worker)
+    view.scene.discard_queued_items()
+    cache = firebase_operations.blob_cache
+    assert ('img1.png', blob_md5(PNG)) in cache
+    assert ('img2.png', blob_md5(PNG)) in cache
+
+    cloud.blobs['img1.png'].reset_mock()
+    cloud.blobs['img2.png'].reset_mock()
+    cloud.bucket.get_blob.reset_mock()
+    board_id, errors, legacy = firebase_operations.load_dreamb_cloud(
+        view.scene, view.parent, worker)
+    assert errors == ['missing.png']
+    cloud.blobs['img1.png'].download_as_bytes.assert_not_called()
+    cloud.blobs['img2.png'].download_as_bytes.assert_not_called()
+    # Only the image without hash needs its metadata
+    assert sorted(c[0][0] for c in cloud.bucket.get_blob.call_args_list) \
+        == ['img2.png', 'missing.png']
+    view.scene.add_queued_items()
+    ids = {item.data(0) for item in view.scene.items()
+           if isinstance(item, DreambPixmapItem)}
+    assert ids == {'img1', 'img2'}
+
+
+def test_download_image_with_hash_needs_no_metadata(cloud):
+    image_data = {'storage_url': 'img1.png', 'md5': blob_md5(PNG)}
+    cache = firebase_operations.blob_cache
+    img = firebase_operations.download_image(cloud.bucket, image_data, cache)
+    assert img.width() == 10
+    img = firebase_operations.download_image(cloud.bucket, image_data, cache)
+    assert img.width() == 10
+    cloud.bucket.get_blob.assert_not_called()
+    cloud.blobs['img1.png'].download_as_bytes.assert_called_once()
+
+
+def test_download_image_when_blob_changed(cloud):
+    cache = firebase_operations.blob_cache
+    cache.put('img2.png', 'oldmd5', b'old')
+    img = firebase_operations.download_image(
+        cloud.bucket, {'storage_url': 'img2.png'}, cache)
+    assert img.width() == 10
+    cloud.blobs['img2.png'].download_as_bytes.assert_called_once()
+    assert ('img2.png', blob_md5(PNG)) in cache
+
+
+def test_download_image_when_cached_blob_corrupt(cloud):
+    cache = firebase_operations.blob_cache
+    md5 = blob_md5(PNG)
+    cache.put('img1.png', md5, b'garbage')
+    img = firebase_operations.download_image(
+        cloud.bucket, {'storage_url': 'img1.png', 'md5': md5}, cache)
+    assert img.width() == 10
+    assert cache.get('img1.png', md5) == PNG
+
+
+def test_download_image_without_cache(cloud):
+    img = firebase_operations.download_image(
+        cloud.bucket, {'storage_url': 'img2.png'})
+    assert img.width() == 10
+    cloud.bucket.get_blob.assert_not_called()
+
+
+def test_download_image_when_blob_missing(cloud):
+    img = firebase_operations.download_image(
+        cloud.bucket, {'storage_url': 'missing.png'},
+        firebase_operations.blob_cache)
+    assert img.isNull()
+
+
+def test_load_image_prefers_preview(cloud):
+    cloud.blobs['preview.jpg'] = MagicMock()
+    cloud.blobs['preview.jpg'].download_as_bytes.return_value = \
+        image_to_png(QtGui.QImage(5, 10, FORMAT))
+    image_data = {'storage_url': 'img1.png', 'md5': blob_md5(PNG),
+                  'preview_url': 'preview.jpg'}
+    img, is_preview = firebase_operations.load_image(
+        cloud.bucket, image_data, previews=True)
+    assert is_preview
+    assert img.width() == 5
+    cloud.blobs['img1.png'].download_as_bytes.assert_not_called()
+
+    img, is_preview = firebase_operations.load_image(
+        cloud.bucket, image_data, previews=False)
+    assert not is_preview
+    assert img.width() == 10
+
+
+def test_load_image_when_preview_missing(cloud):
+    image_data = {'storage_url': 'img1.png', 'md5': blob_md5(PNG),
+                  'preview_url': 'missing.png'}
+    img, is_preview = firebase_operations.load_image(
+        cloud.bucket, image_data, firebase_operations.blob_cache, True)
+    assert not is_preview
+    assert img.width() == 10
+
+
+def test_load_dreamb_cloud_with_previews(cloud, view):
+    cloud.blobs['preview.jpg'] = MagicMock()
+    cloud.blobs['preview.jpg'].download_as_bytes.return_value = \
+        image_to_png(QtGui.QImage(5, 10, FORMAT))
+    images_col = cloud.collection.return_value.document.return_value \
+        .collection('images')
+    images_col.stream.return_value = [image_doc(
+        'img1', 0, 0, md5=blob_md5(PNG), content_hash='abc',
+        width=10, height=20, preview_url='preview.jpg')]
+    cloud.blobs['img1.png'].reset_mock()
+    loader = MagicMock()
+    worker = MagicMock(canceled=False)
+    firebase_operations.load_dreamb_cloud(
+        view.scene, view.parent, worker, preview_loader=loader)
+    view.scene.add_queued_items()
+    previews = [item for item in view.scene.items()
+                if isinstance(item, DreambPixmapItem) and item.is_preview()]
+    assert len(previews) == 1
+    item = previews[0]
+    assert item.preview_loader is loader
+    assert item.preview_source['uuid'] == 'img1'
+    assert (item.width, item.height) == (10, 20)
+    assert item.pixmap().width() == 5
+    cloud.blobs['img1.png'].download_as_bytes.assert_not_called()
+
+
+def test_load_dreamb_cloud_downloads_nearest_first(cloud, view):
+    worker = MagicMock(canceled=False)
+    downloaded = []
+
+    def download(bucket, image_data, cache=None, previews=False):
+        downloaded.append(image_data['uuid'])
+        return QtGui.QImage(10, 10, FORMAT), False
+
+    with patch.object(firebase_operations, 'load_image',
+                      side_effect=download), \
+            patch('dreamboard.constants.DOWNLOAD_CONCURRENCY', 1):
+        firebase_operations.load_dreamb_cloud(
+            view.scene, view.parent, worker, center=(450, 450))
+    assert downloaded == ['img1', 'img3', 'img2']
+    view.scene.discard_queued_items()
+
+
+def test_load_dreamb_cloud_when_canceled(cloud, view):
+    worker = MagicMock(canceled=True)
+    with patch('dreamboard.constants.DOWNLOAD_CONCURRENCY', 1):
+        firebase_operations.load_dreamb_cloud(
+            view.scene, view.parent, worker)
+    assert worker.progress.emit.call_count == 1
+    view.scene.discard_queued_items()
+
+
+def test_load_dreamb_cloud_without_boards(view):
+    worker = MagicMock(canceled=False)
+    with patch.object(firebase_operations, 'fetch_boards', return_value=[]):
+        assert firebase_operations.load_dreamb_cloud(
+            view.scene, view.parent, worker) == (None, [], [])
+    worker.board_opened.emit.assert_not_called()
+
+
+def test_view_loads_board_in_background(cloud, main_window, view, qtbot):
+    view.load_from_cloud()
+    qtbot.waitUntil(lambda: view.cloud_loader is None)
+    assert main_window.current_board == 'b1'
+    assert main_window.presets == {'p1': {'name': 'Preset'}}
+    assert view.scene.change_journal.board_id == 'b1'
+    assert set(view.scene.change_journal.synced) == {'img1', 'img2', 'img3'}
+    assert view.scene.change_journal.is_empty()
+    ids = {item.data(0) for item in view.scene.items()
+           if isinstance(item, DreambPixmapItem)}
+    assert ids == {'img1', 'img2'}
+
+
+def test_view_migrates_old_images(cloud, view, qtbot):
+    images_col = cloud.collection.return_value.document.return_value \
+        .collection('images')
+    # Creating the view has migrated the image already
+    images_col.document.assert_called_once_with('img2')
+    images_col.reset_mock()
+    cloud.reset_mock()
+    view.load_from_cloud()
+    qtbot.waitUntil(lambda: view.cloud_loader is None)
+    qtbot.waitUntil(lambda: cloud.batch.return_value.commit.called)
+    images_col.document.assert_called_once_with('img2')
+    blob = cloud.batch.return_value.update.call_args[0][1]
+    assert blob['storage_url'].startswith('images/')
+
+
+def test_clear_scene_cancels_loading(cloud, main_window, view, qapp):
+    view.load_from_cloud()
+    view.clear_scene()
+    assert view.cloud_loader is None
+    qapp.processEvents()
+    assert view.scene.items() == []
+    assert view.scene.items_to_add.empty()
+    assert view.scene.change_journal.board_id is None
+
+
+def test_signals_of_canceled_load_are_ignored(cloud, main_window, view,
+                                              qtbot):
+    view.load_from_cloud()
+    number = view.cloud_load_count
+    view.cancel_loading_from_cloud()
+    view.load_from_cloud(board_id='b1')
+    # Signals of the canceled loader arrive late
+    view.on_cloud_board_opened(number, 'stale', [], {}, {})
+    assert main_window.current_board != 'stale'
+    qtbot.waitUntil(lambda: view.cloud_loader is None)
+    view.on_cloud_loading_finished(number, 'stale', [])
+    assert main_window.current_board == 'b1'
@@ -0,0 +1,133 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from PyQt6 import QtGui
+
+from dreamboard.cloud.previews import FullResolutionLoader
+from dreamboard.items import DreambPixmapItem
+
+
+FORMAT = QtGui.QImage.Format.Format_ARGB32
+
+
+@pytest.fixture
+def loader(qapp):
+    loader = FullResolutionLoader()
+    yield loader
+    loader.clear()
+
+
+def make_preview_item(loader):
+    item = DreambPixmapItem(QtGui.QImage())
+    item.set_preview(QtGui.QImage(10, 5, FORMAT), 40, 20, loader,
+                     {'storage_url': 'img.png'})
+    return item
+
+
+def test_load_now(loader):
+    item = make_preview_item(loader)
+    with patch.object(loader, 'download',
+                      return_value=QtGui.QImage(40, 20, FORMAT)) as download:
+        item.ensure_full_resolution()
+    download.assert_called_once_with({'storage_url': 'img.png'})
+    assert not item.is_preview()
+    assert item.pixmap().width() == 40
+
+
+def test_request_loads_in_background(loader, qtbot):
+    item = make_preview_item(loader)
+    threads = []
+
+    def download(image_data):
+        threads.append(threading.current_thread())
+        return QtGui.QImage(40, 20, FORMAT)
+
+    with patch.object(loader, 'download', side_effect=download):
+        loader.request(item)
+        loader.request(item)
+        qtbot.waitUntil(lambda: not item.is_preview())
+    assert len(threads) == 1
+    assert threads[0] is not threading.current_thread()
+    assert item.pixmap().width() == 40
+    assert loader.pending == {}
+
+
+def test_request_when_download_fails_keeps_preview(loader, qtbot):
+    item = make_preview_item(loader)
+    with patch.object(loader, 'download', return_value=QtGui.QImage()) \
+            as download:
+        loader.request(item)
+        qtbot.waitUntil(lambda: not loader.pending)
+        loader.request(item)
+    download.assert_called_once()
+    assert item.is_preview()
+    assert item in loader.failed
+
+
+def test_clear_ignores_pending_loads(loader, qtbot):
+    item = make_preview_item(loader)
+    release = threading.Event()
+
+    def download(image_data):
+        release.wait(5)
+        return QtGui.QImage(40, 20, FORMAT)
+
+    with patch.object(loader, 'download', side_effect=download):
+        loader.request(item)
+        loader.clear()
+        with qtbot.waitSignal(loader.loaded):
+            release.set()
+    qtbot.wait(10)
+    assert item.is_preview()
+
+
+def test_clear_shuts_down_executor(loader, qtbot):
+    item = make_preview_item(loader)
+    with patch.object(loader, 'download',
+                      return_value=QtGui.QImage(40, 20, FORMAT)):
+        loader.request(item)
+        executor = loader._executor
+        loader.clear()
+        assert loader._executor is None
+        assert executor._shutdown
+        # The loader can still be used afterwards
+        loader.request(item)
+        qtbot.waitUntil(lambda: not item.is_preview())
+
+
+def test_close_waits_for_running_downloads(loader):
+    item = make_preview_item(loader)
+    started = threading.Event()
+    finished = []
+
+    def download(image_data):
+        started.set()
+        time.sleep(0.05)
+        finished.append(image_data)
+        return QtGui.QImage(40, 20, FORMAT)
+
+    with patch.object(loader, 'download', side_effect=download):
+        loader.request(item)
+        started.wait(5)
+        loader.close()
+    assert finished == [{'storage_url': 'img.png'}]
+    assert loader._executor is None
+    assert loader.pending == {}
+
+
+def test_ignores_items_no_longer_previews(loader):
+    item = make_preview_item(loader)
+    item.setPixmap(QtGui.QPixmap(30, 30))
+    loader.apply(item, QtGui.QImage(40, 20, FORMAT))
+    assert item.pixmap().width() == 30
+
+
+def test_view_clears_loader_with_scene(view):
+    loader = view.full_resolution_loader
+    item = make_preview_item(loader)
+    loader.failed.add(item)
+    view.clear_scene()
+    assert loader.failed == set()
@@ -0,0 +1,231 @@
+from unittest.mock import MagicMock
+
+from PyQt6 import QtGui
+
+from dreamboard.cloud.journal import image_fields
+from dreamboard.cloud.snapshot import (
+    SyncResult,
+    apply_result,
+    image_to_png,
+    image_to_preview,
+    take_snapshot,
+)
+from dreamboard.items import DreambPixmapItem, DreambTextItem
+
+
+FORMAT = QtGui.QImage.Format.Format_ARGB32
+
+
+def make_image_item(uuid=None, filename='Foo Bar.png'):
+    item = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT), filename)
+    item.setData(0, uuid)
+    return item
+
+
+def test_take_snapshot_when_no_changes(view):
+    assert take_snapshot(view.scene, {}, [], 'b1') is None
+
+
+def test_take_snapshot_without_board_keeps_changes(view):
+    view.scene.change_journal.record_board()
+    assert take_snapshot(view.scene, {}, [], None) is None
+    assert not view.scene.change_journal.is_empty()
+
+
+def test_take_snapshot(view):
+    journal = view.scene.change_journal
+    changed = make_image_item('img1')
+    deleted = make_image_item('img2')
+    new = make_image_item()
+    text = DreambTextItem('hello')
+    for item in (changed, new, text):
+        view.scene.addItem(item)
+    journal.reset('b1', {'img1': image_fields(changed),
+                         'img2': image_fields(deleted)})
+    journal.record([changed, deleted, new, text])
+    presets = {'p1': {'images': {}}}
+
+    snapshot, changes = take_snapshot(
+        view.scene, presets, [{'id': 'b1', 'name': 'Board'}], 'b1')
+    assert journal.is_empty()
+    assert snapshot.board_id == 'b1'
+    assert snapshot.board_name == 'Board'
+    assert snapshot.presets is None
+    assert set(snapshot.synced) == {'img1', 'img2'}
+    assert text not in changes.items
+    images = {changes.items[image.key]: image for image in snapshot.images}
+    assert len(images) == 3
+
+    assert images[changed].image_id == 'img1'
+    assert images[changed].in_scene is True
+    assert images[changed].fields == image_fields(changed)
+    assert images[changed].image is None
+    assert images[deleted].in_scene is False
+    assert images[deleted].fields is None
+    assert images[new].filename == 'foo-bar.png'
+    assert images[new].image.size() == new.pixmap().size()
+
+    # The snapshot doesn't change with the scene
+    changed.setPos(100, 100)
+    journal.mark_synced('img1', image_fields(changed))
+    assert images[changed].fields['x'] == 0
+    assert snapshot.synced['img1']['x'] == 0
+
+
+def test_take_snapshot_copies_changed_presets(view):
+    presets = {'p1': {'images': {}}}
+    view.scene.change_journal.record_presets()
+    snapshot, changes = take_snapshot(view.scene, presets, [], 'b1')
+    presets['p1']['images']['img1'] = {}
+    assert snapshot.presets == {'p1': {'images': {}}}
+
+
+def test_take_snapshot_includes_raised_and_lowered_items(view):
+    journal = view.scene.change_journal
+    item1 = make_image_item('img1')
+    item2 = make_image_item('img2')
+    for item in (item1, item2):
+        view.scene.addItem(item)
+    journal.reset('b1', {'img1': image_fields(item1),
+                         'img2': image_fields(item2)})
+
+    item1.setSelected(True)
+    view.scene.raise_to_top()
+    snapshot, changes = take_snapshot(view.scene, {}, [], 'b1')
+    assert changes.items == [item1]
+    assert snapshot.images[0].fields['z'] == item1.zValue()
+
+    item1.setSelected(False)
+    item2.setSelected(True)
+    view.scene.lower_to_bottom()
+    snapshot, changes = take_snapshot(view.scene, {}, [], 'b1')
+    assert changes.items == [item2]
+    assert snapshot.images[0].fields['z'] == item2.zValue()
+
+
+def test_take_snapshot_includes_items_of_applied_preset(main_window, view):
+    journal = view.scene.change_journal
+    item1 = make_image_item('img-1')
+    item2 = make_image_item('img-2')
+    for item in (item1, item2):
+        view.scene.addItem(item)
+    journal.reset('b1', {'img-1': image_fields(item1),
+                         'img-2': image_fields(item2)})
+    main_window.presets = {'p1': {'images': {
+        'img_1': {'x': 20, 'y': 30, 'rotation': 90, 'scale': 2}}}}
+
+    view.on_apply_preset('p1')
+    snapshot, changes = take_snapshot(view.scene, {}, [], 'b1')
+    assert changes.items == [item1]
+    fields = snapshot.images[0].fields
+    assert (fields['x'], fields['y']) == (20, 30)
+    assert fields['rotation'] == 90
+    assert fields['scale'] == 2
+
+
+def test_image_to_png(qapp):
+    image = QtGui.QImage(10, 20, FORMAT)
+    result = QtGui.QImage.fromData(image_to_png(image))
+    assert result.size() == image.size()
+
+
+def test_image_to_preview(qapp):
+    image = QtGui.QImage(1000, 500, QtGui.QImage.Format.Format_RGB32)
+    data, ext = image_to_preview(image)
+    assert ext == 'jpg'
+    preview = QtGui.QImage.fromData(data, 'JPG')
+    assert preview.size() == QtGui.QImage(256, 128, FORMAT).size()
+
+
+def test_image_to_preview_with_alpha_channel(qapp):
+    image = QtGui.QImage(500, 1000, FORMAT)
+    data, ext = image_to_preview(image)
+    assert ext == 'png'
+    preview = QtGui.QImage.fromData(data, 'PNG')
+    assert (preview.width(), preview.height()) == (128, 256)
+    assert preview.hasAlphaChannel()
+
+
+def test_image_to_preview_when_small(qapp):
+    assert image_to_preview(QtGui.QImage(256, 100, FORMAT)) is None
+
+
+def test_take_snapshot_loads_full_resolution_of_new_previews(view):
+    item = DreambPixmapItem(QtGui.QImage(), 'foo.png')
+    loader = MagicMock()
+    loader.load_now.side_effect = lambda item: item.set_full_resolution(
+        QtGui.QImage(40, 40, FORMAT))
+    item.set_preview(QtGui.QImage(10, 10, FORMAT), 40, 40, loader)
+    view.scene.addItem(item)
+    view.scene.change_journal.reset('b1', {})
+    view.scene.change_journal.record([item])
+    snapshot, changes = take_snapshot(view.scene, {}, [], 'b1')
+    assert snapshot.images[0].image.width() == 40
+
+
+def test_apply_result(view):
+    journal = view.scene.change_journal
+    new = make_image_item()
+    view.scene.addItem(new)
+    journal.reset('b1', {'img1': {'x': 0}, 'img2': {'x': 0}})
+    journal.record([new])
+    snapshot, changes = take_snapshot(view.scene, {}, [], 'b1')
+    changes.items.append(make_image_item('img3'))
+
+    result = SyncResult(snapshot)
+    result.complete = True
+    result.uploaded[0] = ('img4', image_fields(new))
+    result.updated[2] = ('img1', {'x': 5})
+    result.deleted[3] = 'img2'
+    result.failed.append(1)
+    apply_result(view.scene, changes, result)
+
+    assert new.data(0) == 'img4'
+    assert journal.synced['img1']['x'] == 5
+    assert 'img2' not in journal.synced
+    assert journal.synced['img4'] == image_fields(new)
+    assert journal.take().items == [changes.items[1]]
+
+
+def test_apply_result_when_incomplete_restores_changes(view):
+    journal = view.scene.change_journal
+    journal.record_board()
+    snapshot, changes = take_snapshot(view.scene, {}, [], 'b1')
+    apply_result(view.scene, changes, SyncResult(snapshot))
+    assert journal.take().board is True
+
+
+def test_apply_result_with_new_board_and_presets(view):
+    journal = view.scene.change_journal
+    journal.record_board()
+    journal.record_presets()
+    presets = {'p1': {}}
+    boards = [{'id': 'NEW', 'name': 'Board'}]
+    snapshot, changes = take_snapshot(view.scene, presets, boards, 'NEW')
+    presets['p2'] = {}
+
+    result = SyncResult(snapshot)
+    result.complete = True
+    result.new_board_id = 'b1'
+    result.preset_ids = {'p1': 'cloud1'}
+    journal.save_state = MagicMock()
+    apply_result(view.scene, changes, result, presets, boards)
+    assert journal.board_id == 'b1'
+    assert boards == [{'id': 'b1', 'name': 'Board'}]
+    assert presets == {'cloud1': {}, 'p2': {}}
+    journal.save_state.assert_called()
+
+
+def test_sync_result_fail():
+    result = SyncResult(None)
+    result.uploaded[0] = ('img1', {})
+    result.updated[1] = ('img2', {})
+    result.deleted[2] = 'img3'
+    result.preset_ids = {'p1': 'cloud1', 'p2': 'cloud2'}
+    result.fail([('image', 0), ('image', 2), ('preset', 'p1')])
+    assert result.uploaded == {}
+    assert result.updated == {1: ('img2', {})}
+    assert result.deleted == {}
+    assert result.failed == [0, 2]
+    assert result.preset_ids == {'p2': 'cloud2'}
+    assert result.presets_failed is True
@@ -0,0 +1,252 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from PyQt6 import QtGui, QtWidgets
+
+from dreamboard.cloud.journal import image_fields
+from dreamboard.cloud.snapshot import SyncResult
+from dreamboard.items import DreambPixmapItem
+
+
+FORMAT = QtGui.QImage.Format.Format_ARGB32
+
+
+def upload_result(snapshot, worker=None):
+    """Pretends that all new images have been uploaded."""
+
+    result = SyncResult(snapshot)
+    result.complete = True
+    for image in snapshot.images:
+        result.uploaded[image.key] = (f'id{image.key}', image.fields)
+    return result
+
+
+def add_new_item(view):
+    item = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT), 'foo.png')
+    view.scene.addItem(item)
+    view.scene.change_journal.reset('b1', {})
+    view.scene.change_journal.record([item])
+    return item
+
+
+def test_start_syncs_in_background(main_window, view, qtbot):
+    main_window.current_board = 'b1'
+    item = add_new_item(view)
+    gui_thread = threading.current_thread()
+    threads = []
+
+    def sync(snapshot, worker=None):
+        threads.append(threading.current_thread())
+        return upload_result(snapshot)
+
+    with patch('dreamboard.cloud.sync.sync_snapshot', side_effect=sync):
+        assert view.cloud_sync.start() is True
+        # The result is applied on the GUI thread, via the event loop
+        view.cloud_sync.worker.wait()
+        assert item.data(0) is None
+        qtbot.waitUntil(lambda: not view.cloud_sync.is_running())
+
+    assert threads and threads[0] is not gui_thread
+    assert item.data(0) == 'id0'
+    assert view.scene.change_journal.synced['id0'] == image_fields(item)
+    assert view.scene.change_journal.is_empty()
+
+
+def test_start_when_nothing_to_sync(main_window, view):
+    main_window.current_board = 'b1'
+    with patch('dreamboard.cloud.sync.sync_snapshot') as sync_mock:
+        assert view.cloud_sync.start() is False
+    sync_mock.assert_not_called()
+    assert not view.cloud_sync.is_running()
+
+
+def test_start_skips_while_previous_run_in_flight(main_window, view):
+    main_window.current_board = 'b1'
+    add_new_item(view)
+    release = threading.Event()
+
+    def sync(snapshot, worker=None):
+        release.wait(5)
+        return upload_result(snapshot)
+
+    with patch('dreamboard.cloud.sync.sync_snapshot',
+               side_effect=sync) as sync_mock:
+        assert view.cloud_sync.start() is True
+        second = add_new_item(view)
+        assert view.cloud_sync.start() is False
+        release.set()
+        view.cloud_sync.wait()
+        assert sync_mock.call_count == 1
+
+    # The skipped changes are synced next time
+    assert not view.cloud_sync.is_running()
+    assert view.scene.change_journal.take().items == [second]
+
+
+def test_wait_applies_result_once(main_window, view, qapp):
+    main_window.current_board = 'b1'
+    item = add_new_item(view)
+    with patch('dreamboard.cloud.sync.sync_snapshot',
+               side_effect=upload_result):
+        view.cloud_sync.start()
+        view.cloud_sync.wait()
+        assert item.data(0) == 'id0'
+        item.setData(0, 'changed')
+        qapp.processEvents()
+    assert item.data(0) == 'changed'
+
+
+def test_failed_sync_restores_changes(main_window, view):
+    main_window.current_board = 'b1'
+    item = add_new_item(view)
+    with patch('dreamboard.cloud.sync.sync_snapshot',
+               side_effect=RuntimeError('offline')):
+        view.cloud_sync.start()
+        view.cloud_sync.wait()
+    assert item.data(0) is None
+    assert view.scene.change_journal.take().items == [item]
+
+
+def test_sync_then_applies_new_board_id(main_window, view, qtbot):
+    main_window.current_board = 'NEW'
+    main_window.boards = [{'id': 'NEW', 'name': 'Board'}]
+    view.scene.change_journal.record_board()
+    callback = MagicMock()
+
+    def sync(snapshot, worker=None):
+        result = SyncResult(snapshot)
+        result.complete = True
+        result.new_board_id = 'b1'
+        return result
+
+    with patch('dreamboard.cloud.sync.sync_snapshot', side_effect=sync):
+        view.cloud_sync.sync_then(callback)
+        qtbot.waitUntil(lambda: callback.called)
+    callback.assert_called_once_with()
+    assert main_window.current_board == 'b1'
+    assert main_window.boards == [{'id': 'b1', 'name': 'Board'}]
+    assert view.scene.change_journal.board_id == 'b1'
+
+
+def test_sync_then_syncs_in_background(main_window, view, qtbot):
+    main_window.current_board = 'b1'
+    item = add_new_item(view)
+    gui_thread = threading.current_thread()
+    release = threading.Event()
+    threads = []
+    callback = MagicMock()
+
+    def sync(snapshot, worker=None):
+        threads.append(threading.current_thread())
+        release.wait(5)
+        return upload_result(snapshot)
+
+    with patch('dreamboard.cloud.sync.sync_snapshot', side_effect=sync):
+        view.cloud_sync.sync_then(callback)
+        assert view.cloud_sync.is_running()
+        callback.assert_not_called()
+        release.set()
+        qtbot.waitUntil(lambda: callback.called)
+
+    assert threads[0] is not gui_thread
+    assert item.data(0) == 'id0'
+    assert not view.cloud_sync.is_running()
+
+
+def test_sync_then_when_nothing_to_sync(main_window, view):
+    main_window.current_board = 'b1'
+    callback = MagicMock()
+    with patch('dreamboard.cloud.sync.sync_snapshot') as sync_mock:
+        view.cloud_sync.sync_then(callback)
+    sync_mock.assert_not_called()
+    callback.assert_called_once_with()
+
+
+def test_sync_then_includes_changes_made_during_running_sync(
+        main_window, view, qtbot):
+    main_window.current_board = 'b1'
+    add_new_item(view)
+    release = threading.Event()
+    synced_images = []
+    callback = MagicMock()
+
+    def sync(snapshot, worker=None):
+        release.wait(5)
+        synced_images.append(len(snapshot.images))
+        return upload_result(snapshot)
+
+    with patch('dreamboard.cloud.sync.sync_snapshot', side_effect=sync):
+        view.cloud_sync.start()
+        item = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT), 'bar.png')
+        view.scene.addItem(item)
+        view.scene.change_journal.record([item])
+        view.cloud_sync.sync_then(callback)
+        release.set()
+        qtbot.waitUntil(lambda: callback.called)
+
+    assert synced_images == [1, 1]
+    assert item.data(0) == 'id0'
+    callback.assert_called_once_with()
+
+
+def test_sync_then_continues_when_sync_fails(main_window, view, qtbot):
+    main_window.current_board = 'b1'
+    item = add_new_item(view)
+    callback = MagicMock()
+    with patch('dreamboard.cloud.sync.sync_snapshot',
+               side_effect=RuntimeError('offline')) as sync_mock:
+        view.cloud_sync.sync_then(callback)
+        qtbot.waitUntil(lambda: callback.called)
+    assert sync_mock.call_count == 1
+    assert view.scene.change_journal.take().items == [item]
+
+
+def test_worker_outlives_applied_result(main_window, view, qtbot):
+    main_window.current_board = 'b1'
+    add_new_item(view)
+    release = threading.Event()
+
+    def sync(snapshot, worker=None):
+        result = worker.result = upload_result(snapshot)
+        worker.synced.emit(worker)
+        # Still running after the result has been applied
+        release.wait(5)
+        return result
+
+    with patch('dreamboard.cloud.sync.sync_snapshot', side_effect=sync):
+        view.cloud_sync.start()
+        worker = view.cloud_sync.worker
+        qtbot.waitUntil(lambda: not view.cloud_sync.is_running())
+        assert worker.parent() is view.cloud_sync
+        assert worker.isRunning()
+        release.set()
+        with qtbot.waitSignal(worker.destroyed):
+            pass
+
+
+@patch('PyQt6.QtWidgets.QMessageBox.warning',
+       return_value=QtWidgets.QMessageBox.StandardButton.Yes)
+def test_open_board_loads_after_background_sync(
+        warning_mock, main_window, view, qtbot):
+    main_window.current_board = 'b1'
+    item = add_new_item(view)
+    release = threading.Event()
+
+    def sync(snapshot, worker=None):
+        release.wait(5)
+        return upload_result(snapshot)
+
+    with patch('dreamboard.cloud.sync.sync_snapshot',
+               side_effect=sync) as sync_mock, \
+            patch.object(view, 'load_from_cloud') as load_mock:
+        view.on_open_board({'id': 'b2', 'name': 'Other'})
+        # The GUI isn't blocked while syncing the current board
+        assert view.cloud_sync.is_running()
+        assert item.scene() is view.scene
+        load_mock.assert_not_called()
+        release.set()
+        qtbot.waitUntil(lambda: load_mock.called)
+
+    load_mock.assert_called_once_with('b2')
+    sync_mock.assert_called_once()
+    assert view.scene.items() == []
@@ -0,0 +1,325 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from dreamboard.cloud import uploads
+from dreamboard.cloud.uploads import (
+    BucketStorage,
+    LocalStorage,
+    TransientUploadError,
+    UploadCanceled,
+    UploadError,
+    UploadPool,
+    upload_blob,
+    with_retries,
+)
+
+
+@pytest.fixture(autouse=True)
+def sleep():
+    with patch('dreamboard.cloud.uploads.time.sleep') as sleep_mock:
+        yield sleep_mock
+
+
+class FlakyStorage(LocalStorage):
+    """Fails the given chunk requests after the data has arrived, like a
+    connection that breaks before the response."""
+
+    def __init__(self, directory, fail_chunks=()):
+        super().__init__(directory)
+        self.fail_chunks = set(fail_chunks)
+        self.chunk_requests = 0
+
+    def upload_chunk(self, session, data, offset, size):
+        received = super().upload_chunk(session, data, offset, size)
+        self.chunk_requests += 1
+        if self.chunk_requests in self.fail_chunks:
+            raise ConnectionError('connection reset')
+        return received
+
+
+def test_backoff_delay_doubles():
+    with patch('dreamboard.cloud.uploads.random.uniform', return_value=1):
+        assert [uploads.backoff_delay(i, 0.5) for i in (1, 2, 3)] \
+            == [0.5, 1, 2]
+
+
+def test_with_retries_retries_transient_errors(sleep):
+    func = MagicMock(side_effect=[TransientUploadError(), OSError(), 'ok'])
+    assert with_retries(func) == 'ok'
+    assert func.call_count == 3
+    assert sleep.call_count == 2
+    assert sleep.call_args_list[1][0][0] > sleep.call_args_list[0][0][0]
+
+
+def test_with_retries_gives_up(sleep):
+    func = MagicMock(side_effect=TransientUploadError('down'))
+    with pytest.raises(TransientUploadError):
+        with_retries(func, retries=2)
+    assert func.call_count == 3
+
+
+def test_with_retries_doesnt_retry_other_errors(sleep):
+    func = MagicMock(side_effect=UploadError('denied'))
+    with pytest.raises(UploadError):
+        with_retries(func)
+    func.assert_called_once_with()
+    sleep.assert_not_called()
+
+
+def test_upload_blob_small_file(tmp_path):
+    progress = MagicMock()
+    storage = LocalStorage(str(tmp_path))
+    upload_blob(storage, 'foo.png', b'abc', progress=progress)
+    assert (tmp_path / 'foo.png').read_bytes() == b'abc'
+    progress.assert_called_once_with(3, 3)
+
+
+def test_upload_blob_in_chunks(tmp_path):
+    progress = MagicMock()
+    storage = LocalStorage(str(tmp_path))
+    data = bytes(range(250))
+    upload_blob(storage, 'foo.png', data, progress=progress, chunk_size=100)
+    assert (tmp_path / 'foo.png').read_bytes() == data
+    assert [c[0] for c in progress.call_args_list] == [
+        (100, 250), (200, 250), (250, 250)]
+    assert storage.sessions == {}
+
+
+def test_upload_blob_resumes_after_failed_chunk(tmp_path, sleep):
+    storage = FlakyStorage(str(tmp_path), fail_chunks={2})
+    data = bytes(range(250))
+    with patch.object(storage, 'start_upload',
+                      wraps=storage.start_upload) as start_mock:
+        upload_blob(storage, 'foo.png', data, chunk_size=100)
+        start_mock.assert_called_once()
+    assert (tmp_path / 'foo.png').read_bytes() == data
+    # The failed chunk has arrived and isn't sent again
+    assert storage.chunk_requests == 3
+    sleep.assert_called_once()
+
+
+def test_upload_blob_resumes_after_failed_last_chunk(tmp_path):
+    storage = FlakyStorage(str(tmp_path), fail_chunks={3})
+    data = bytes(range(250))
+    upload_blob(storage, 'foo.png', data, chunk_size=100)
+    assert (tmp_path / 'foo.png').read_bytes() == data
+    assert storage.chunk_requests == 3
+
+
+def test_upload_blob_gives_up_after_retries(tmp_path):
+    storage = FlakyStorage(str(tmp_path), fail_chunks={1, 2, 3})
+    storage.query_offset = MagicMock(side_effect=ConnectionError())
+    with pytest.raises(ConnectionError):
+        upload_blob(storage, 'foo.png', bytes(250), chunk_size=100,
+                    retries=2)
+
+
+def test_upload_blob_canceled(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    with pytest.raises(UploadCanceled):
+        upload_blob(storage, 'foo.png', bytes(250), chunk_size=100,
+                    canceled=lambda: True)
+    assert not (tmp_path / 'foo.png').exists()
+
+
+@pytest.mark.parametrize('status,headers,expected', [
+    (200, {}, 250),
+    (201, {}, 250),
+    (308, {}, 0),
+    (308, {'Range': 'bytes=0-99'}, 100),
+])
+def test_bucket_storage_persisted_size(status, headers, expected):
+    response = MagicMock(status_code=status, headers=headers)
+    assert BucketStorage.persisted_size(response, 250) == expected
+
+
+@pytest.mark.parametrize('status,error', [
+    (503, TransientUploadError),
+    (429, TransientUploadError),
+    (404, UploadError),
+])
+def test_bucket_storage_persisted_size_errors(status, error):
+    response = MagicMock(status_code=status, headers={})
+    with pytest.raises(error):
+        BucketStorage.persisted_size(response, 250)
+
+
+def test_bucket_storage_upload_chunk():
+    storage = BucketStorage(MagicMock())
+    storage.session = MagicMock()
+    storage.session.put.return_value = MagicMock(
+        status_code=308, headers={'Range': 'bytes=0-199'})
+    assert storage.upload_chunk('https://upload', b'x' * 100, 100, 250) \
+        == 200
+    kwargs = storage.session.put.call_args[1]
+    assert kwargs['headers'] == {'Content-Range': 'bytes 100-199/250'}
+
+
+def test_upload_pool_uploads_in_parallel(tmp_path):
+    running = []
+    peak = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(3, timeout=5)
+
+    class SlowStorage(LocalStorage):
+        def upload(self, name, data, content_type):
+            with lock:
+                running.append(name)
+                peak.append(len(running))
+            try:
+                barrier.wait()
+            except threading.BrokenBarrierError:
+                pass
+            super().upload(name, data, content_type)
+            with lock:
+                running.remove(name)
+
+    pool = UploadPool(SlowStorage(str(tmp_path)), max_workers=3)
+    futures = [pool.submit(f'{i}.png', b'abc') for i in range(6)]
+    for future in futures:
+        future.result(timeout=10)
+    assert max(peak) == 3
+    assert len(list(tmp_path.iterdir())) == 6
+    pool.close()
+
+
+def test_upload_pool_reports_progress(tmp_path, qapp):
+    pool = UploadPool(LocalStorage(str(tmp_path)))
+    started = MagicMock()
+    progress = MagicMock()
+    finished = MagicMock()
+    pool.started.connect(started)
+    pool.progress.connect(progress)
+    pool.file_finished.connect(finished)
+    pool.submit('foo.png', bytes(50)).result(timeout=5)
+    pool.close()
+    qapp.processEvents()
+    started.assert_called_once_with('foo.png', 'foo.png', 50)
+    progress.assert_called_once_with('foo.png', 50, 50)
+    finished.assert_called_once_with('foo.png', True)
+
+
+def test_upload_pool_reports_failure(tmp_path, qapp):
+    storage = LocalStorage(str(tmp_path))
+    storage.upload = MagicMock(side_effect=UploadError('denied'))
+    pool = UploadPool(storage)
+    finished = MagicMock()
+    pool.file_finished.connect(finished)
+    future = pool.submit('foo.png', b'abc')
+    with pytest.raises(UploadError):
+        future.result(timeout=5)
+    pool.close()
+    qapp.processEvents()
+    finished.assert_called_once_with('foo.png', False)
+
+
+def test_upload_pool_close_cancels_uploads(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    pool = UploadPool(storage, max_workers=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def upload(name, data, content_type):
+        started.set()
+        release.wait(5)
+        raise TransientUploadError()
+
+    storage.upload = upload
+    first = pool.submit('foo.png', b'abc')
+    second = pool.submit('bar.png', b'abc')
+    started.wait(5)
+    closer = threading.Thread(target=pool.close)
+    closer.start()
+    assert pool._canceled.wait(5)
+    release.set()
+    closer.join(5)
+    assert second.cancelled()
+    with pytest.raises(TransientUploadError):
+        first.result()
+
+    # The pool can be used again
+    del storage.upload
+    pool.submit('baz.png', b'abc').result(timeout=5)
+    assert (tmp_path / 'baz.png').read_bytes() == b'abc'
+    pool.close()
+
+
+def test_local_storage_exists(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    assert storage.exists('images/foo.png') is False
+    storage.upload('images/foo.png', b'abc', 'image/png')
+    assert storage.exists('images/foo.png') is True
+    assert (tmp_path / 'images' / 'foo.png').read_bytes() == b'abc'
+
+
+def test_bucket_storage_exists():
+    bucket = MagicMock()
+    bucket.blob.return_value.exists.return_value = True
+    assert BucketStorage(bucket).exists('foo.png') is True
+    bucket.blob.assert_called_once_with('foo.png')
+
+
+def test_upload_pool_label(tmp_path, qapp):
+    pool = UploadPool(LocalStorage(str(tmp_path)))
+    started = MagicMock()
+    finished = MagicMock()
+    pool.started.connect(started)
+    pool.file_finished.connect(finished)
+    pool.submit('abc.png', b'abc', label='foo.png').result(timeout=5)
+    pool.close()
+    qapp.processEvents()
+    started.assert_called_once_with('abc.png', 'foo.png', 3)
+    finished.assert_called_once_with('abc.png', True)
+    assert (tmp_path / 'abc.png').exists()
+
+
+def test_upload_pool_skips_existing(tmp_path, qapp):
+    storage = LocalStorage(str(tmp_path))
+    storage.upload('abc.png', b'abc', None)
+    storage.upload = MagicMock()
+    pool = UploadPool(storage)
+    started = MagicMock()
+    pool.started.connect(started)
+    assert pool.submit('abc.png', b'abc', skip_existing=True) \
+        .result(timeout=5) is False
+    pool.close()
+    qapp.processEvents()
+    storage.upload.assert_not_called()
+    started.assert_not_called()
+
+
+def test_upload_pool_uploads_missing(tmp_path):
+    pool = UploadPool(LocalStorage(str(tmp_path)))
+    assert pool.submit('abc.png', b'abc', skip_existing=True) \
+        .result(timeout=5) is True
+    assert (tmp_path / 'abc.png').read_bytes() == b'abc'
+    pool.close()
+
+
+def test_upload_pool_reuses_upload_of_same_file(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    storage.exists = MagicMock(return_value=False)
+    pool = UploadPool(storage)
+    first = pool.submit('abc.png', b'abc', skip_existing=True)
+    second = pool.submit('abc.png', b'abc', skip_existing=True)
+    assert first is second
+    first.result(timeout=5)
+    assert pool.submit('abc.png', b'abc', skip_existing=True) is first
+    storage.exists.assert_called_once_with('abc.png')
+    pool.close()
+
+
+def test_upload_pool_retries_failed_upload_of_same_file(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    storage.upload = MagicMock(side_effect=UploadError('denied'))
+    pool = UploadPool(storage)
+    first = pool.submit('abc.png', b'abc', skip_existing=True)
+    with pytest.raises(UploadError):
+        first.result(timeout=5)
+    del storage.upload
+    second = pool.submit('abc.png', b'abc', skip_existing=True)
+    assert second is not first
+    assert second.result(timeout=5) is True
+    pool.close()
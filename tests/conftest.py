@@ -66,6 +66,10 @@ def main_window(qtbot):
 
 @pytest.fixture
 def view(main_window):
+    # Let the initial loading from the cloud finish
+    if main_window.view.cloud_loader:
+        main_window.view.cloud_loader.wait()
+    QtWidgets.QApplication.processEvents()
     yield main_window.view
 
 
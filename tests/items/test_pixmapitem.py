@@ -266,13 +266,154 @@ def test_paint(qapp, item):
     item.crop = QtCore.QRectF(10, 20, 30, 40)
     painter = MagicMock()
     item.paint(painter, None, None)
-    item.paint_selectable.assert_called_once()
+    item.paint_selectable.assert_not_called()
     painter.drawPixmap.assert_called_with(
         QtCore.QRectF(10, 20, 30, 40),
         item.pixmap(),
         QtCore.QRectF(10, 20, 30, 40))
 
 
+def test_paint_when_fast_rendering(view):
+    item = DreambPixmapItem(
+        QtGui.QImage(1000, 800, QtGui.QImage.Format.Format_RGB32))
+    view.scene.addItem(item)
+    view.scene.fast_rendering = True
+    item.paint_selectable = MagicMock()
+    item.crop = QtCore.QRectF(100, 200, 400, 400)
+    painter = MagicMock()
+    option = MagicMock()
+    option.levelOfDetailFromTransform.return_value = 0.3
+    item.paint(painter, option, None)
+    args = painter.drawPixmap.call_args[0]
+    assert args[0] == QtCore.QRectF(100, 200, 400, 400)
+    assert args[1].size() == QtCore.QSize(500, 400)
+    assert args[2] == QtCore.QRectF(50, 100, 200, 200)
+
+
+def test_get_proxy(qapp):
+    item = DreambPixmapItem(
+        QtGui.QImage(1024, 512, QtGui.QImage.Format.Format_RGB32))
+    assert item.get_proxy(1) is not None
+    assert item.get_proxy(1).size() == QtCore.QSize(1024, 512)
+    assert item.get_proxy(0.5).size() == QtCore.QSize(512, 256)
+    assert item.get_proxy(0.2).size() == QtCore.QSize(256, 128)
+    # Proxies don't get smaller than PROXY_MIN_SIZE:
+    assert item.get_proxy(0.01).size() == QtCore.QSize(128, 64)
+    assert item.get_proxy(0.2) is item.get_proxy(0.2)
+
+
+def test_get_proxy_when_small(qapp, item):
+    assert item.get_proxy(0.01).cacheKey() == item.pixmap().cacheKey()
+
+
+def test_set_pixmap_resets_proxies(qapp):
+    item = DreambPixmapItem(
+        QtGui.QImage(1024, 512, QtGui.QImage.Format.Format_RGB32))
+    item.get_proxy(0.5)
+    item.setPixmap(QtGui.QPixmap(2048, 2048))
+    assert item.get_proxy(0.5).size() == QtCore.QSize(1024, 1024)
+
+
+def make_preview_item(loader=None):
+    item = DreambPixmapItem(QtGui.QImage())
+    preview = QtGui.QImage(250, 200, QtGui.QImage.Format.Format_RGB32)
+    item.set_preview(preview, 1000, 800, loader or MagicMock(), 'source')
+    return item
+
+
+def test_set_preview(qapp):
+    loader = MagicMock()
+    item = make_preview_item(loader)
+    assert item.is_preview()
+    assert item.preview_loader is loader
+    assert item.preview_source == 'source'
+    assert item.preview_factor == 0.25
+    assert item.width == 1000
+    assert item.height == 800
+    assert item.pixmap().size() == QtCore.QSize(250, 200)
+
+
+def test_set_full_resolution_keeps_crop(qapp):
+    item = make_preview_item()
+    item.crop = QtCore.QRectF(100, 200, 400, 400)
+    item.set_full_resolution(
+        QtGui.QImage(1000, 800, QtGui.QImage.Format.Format_RGB32))
+    assert not item.is_preview()
+    assert item.preview_factor == 1
+    assert item.pixmap().size() == QtCore.QSize(1000, 800)
+    assert item.crop == QtCore.QRectF(100, 200, 400, 400)
+
+
+def test_set_pixmap_ends_preview(qapp):
+    item = make_preview_item()
+    item.setPixmap(QtGui.QPixmap(30, 20))
+    assert not item.is_preview()
+    assert item.width == 30
+
+
+def test_paint_preview(qapp):
+    loader = MagicMock()
+    item = make_preview_item(loader)
+    item.crop = QtCore.QRectF(100, 200, 400, 400)
+    painter = MagicMock()
+    option = MagicMock()
+    option.levelOfDetailFromTransform.return_value = 0.2
+    item.paint(painter, option, None)
+    args = painter.drawPixmap.call_args[0]
+    assert args[0] == QtCore.QRectF(100, 200, 400, 400)
+    assert args[1].size() == QtCore.QSize(250, 200)
+    assert args[2] == QtCore.QRectF(25, 50, 100, 100)
+    loader.request.assert_not_called()
+
+
+def test_paint_preview_when_magnified_requests_full_resolution(qapp):
+    loader = MagicMock()
+    item = make_preview_item(loader)
+    painter = MagicMock()
+    option = MagicMock()
+    option.levelOfDetailFromTransform.return_value = 0.5
+    item.paint(painter, option, None)
+    loader.request.assert_called_once_with(item)
+    # The preview is shown until the full resolution is there
+    assert painter.drawPixmap.call_args[0][1].size() == QtCore.QSize(250, 200)
+
+
+def test_paint_preview_when_fast_rendering(view):
+    item = make_preview_item()
+    view.scene.addItem(item)
+    view.scene.fast_rendering = True
+    item.paint_selectable = MagicMock()
+    painter = MagicMock()
+    option = MagicMock()
+    option.levelOfDetailFromTransform.return_value = 0.1
+    item.paint(painter, option, None)
+    args = painter.drawPixmap.call_args[0]
+    # The preview is too small for a proxy
+    assert args[0] == QtCore.QRectF(0, 0, 1000, 800)
+    assert args[1].size() == QtCore.QSize(250, 200)
+    assert args[2] == QtCore.QRectF(0, 0, 250, 200)
+
+
+def test_full_resolution_needed_for_pixel_data(qapp):
+    loader = MagicMock()
+    item = make_preview_item(loader)
+    loader.load_now.side_effect = lambda item: item.set_full_resolution(
+        QtGui.QImage(1000, 800, QtGui.QImage.Format.Format_RGB32))
+    copy = item.create_copy()
+    loader.load_now.assert_called_once_with(item)
+    assert copy.pixmap().size() == QtCore.QSize(1000, 800)
+    item.pixmap_to_bytes()
+    loader.load_now.assert_called_once_with(item)
+
+
+def test_pixmap_to_bytes_when_preview(qapp):
+    loader = MagicMock()
+    item = make_preview_item(loader)
+    with pytest.raises(ValueError):
+        item.pixmap_to_bytes()
+    loader.load_now.assert_not_called()
+
+
 def test_paint_when_crop_mode(qapp, item):
     item.pixmap = MagicMock()
     item.paint_selectable = MagicMock()
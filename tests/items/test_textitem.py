@@ -80,7 +80,7 @@ def test_paint(paint_mock, qapp):
     painter = MagicMock()
     option = MagicMock()
     item.paint(painter, option, 'widget')
-    item.paint_selectable.assert_called_once()
+    item.paint_selectable.assert_not_called()
     painter.drawRect.assert_called_once()
     assert option.state == QtWidgets.QStyle.StateFlag.State_Enabled
     paint_mock.assert_called_once_with(painter, option, 'widget')
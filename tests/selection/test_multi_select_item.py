@@ -19,10 +19,18 @@ def test_paint():
     item.paint_selectable = MagicMock()
     painter = MagicMock()
     item.paint(painter, None, None)
-    item.paint_selectable.assert_called_once()
+    item.paint_selectable.assert_not_called()
     painter.drawRect.assert_not_called()
 
 
+def test_paint_overlay():
+    item = MultiSelectItem()
+    item.paint_selectable = MagicMock()
+    painter = MagicMock()
+    item.paint_overlay(painter)
+    item.paint_selectable.assert_called_once_with(painter, None, None)
+
+
 def test_has_selection_outline():
     item = MultiSelectItem()
     item.has_selection_outline() is True
@@ -41,11 +41,28 @@ def test_fixed_length_for_viewport_when_default_scale(view, item):
 
 def test_fixed_length_for_viewport_when_viewport_scaled(view, item):
     view.scene.addItem(item)
+    item.setSelected(True)
     view.scale(2, 2)
     assert item.fixed_length_for_viewport(100) == 50
     assert item._view_scale == 2
 
 
+def test_fixed_length_for_viewport_when_added_after_scaling(view, item):
+    view.scale(2, 2)
+    view.scene.addItem(item)
+    assert item.fixed_length_for_viewport(100) == 50
+
+
+def test_fixed_length_for_viewport_doesnt_query_view(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    with patch.object(view, 'get_scale') as get_scale_mock:
+        item.fixed_length_for_viewport(100)
+        item.select_resize_size
+        item.select_rotate_size
+        get_scale_mock.assert_not_called()
+
+
 def test_fixed_length_for_viewport_when_item_scaled(view, item):
     view.scene.addItem(item)
     item.setScale(5)
@@ -60,6 +77,7 @@ def test_fixed_length_for_viewport_when_no_scene(view, item):
 
 def test_resize_size_when_scaled(view, item):
     view.scene.addItem(item)
+    item.setSelected(True)
     view.scale(2, 2)
     item.setScale(2)
     item.SELECT_RESIZE_SIZE = 100
@@ -68,6 +86,7 @@ def test_resize_size_when_scaled(view, item):
 
 def test_rotate_size_when_scaled(view, item):
     view.scene.addItem(item)
+    item.setSelected(True)
     view.scale(2, 2)
     item.setScale(2)
     item.SELECT_ROTATE_SIZE = 100
@@ -76,6 +95,7 @@ def test_rotate_size_when_scaled(view, item):
 
 def test_select_handle_free_center(view, item):
     view.scene.addItem(item)
+    item.setSelected(True)
     view.scale(0.5, 0.5)
     item.SELECT_FREE_CENTER = 10
     with patch.object(item, 'bounding_rect_unselected',
@@ -124,8 +144,8 @@ def test_paint_when_selected_single_selection(view, item):
     view.scene.addItem(item)
     painter = MagicMock()
     item.setSelected(True)
-    item.paint(painter, None, None)
-    painter.drawPixmap.assert_called_once()
+    item.paint_overlay(painter)
+    painter.drawPixmap.assert_not_called()
     painter.drawRect.assert_called_once()
     assert painter.drawPoint.call_count == 4
 
@@ -137,8 +157,8 @@ def test_paint_when_selected_multi_selection(view, item):
     view.scene.addItem(item2)
     painter = MagicMock()
     item.setSelected(True)
-    item.paint(painter, None, None)
-    painter.drawPixmap.assert_called_once()
+    item.paint_overlay(painter)
+    painter.drawPixmap.assert_not_called()
     painter.drawRect.assert_called_once()
     painter.drawPoint.assert_not_called()
 
@@ -150,7 +170,7 @@ def test_paint_when_debug_shapes(view):
             args_mock.debug_boundingrects = False
             args_mock.debug_handles = False
             item = DreambPixmapItem(QtGui.QImage())
-            item.paint(MagicMock(), None, None)
+            item.paint_overlay(MagicMock())
             m.assert_called_once()
 
 
@@ -161,7 +181,7 @@ def test_paint_when_debug_boundingrects(view):
             args_mock.debug_boundingrects = True
             args_mock.debug_handles = False
             item = DreambPixmapItem(QtGui.QImage())
-            item.paint(MagicMock(), None, None)
+            item.paint_overlay(MagicMock())
             m.assert_called_once()
 
 
@@ -174,7 +194,7 @@ def test_paint_when_debug_handles(view):
             item = DreambPixmapItem(QtGui.QImage())
             view.scene.addItem(item)
             item.setSelected(True)
-            item.paint(MagicMock(), None, None)
+            item.paint_overlay(MagicMock())
             m.assert_called()
 
 
@@ -232,6 +252,71 @@ def test_get_scale_bounds_with_margin(view, item):
     assert rect.bottomRight().y() == 86
 
 
+def test_handles_cache_reused(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    with patch.object(item, 'bounding_rect_unselected',
+                      return_value=QtCore.QRectF(0, 0, 100, 80)):
+        shape = item.shape()
+        rects = item.get_handle_rects()
+        edges = item.get_flip_bounds()
+        with patch.object(item, 'fixed_length_for_viewport') as m:
+            assert item.shape() is shape
+            assert item.get_handle_rects() is rects
+            assert item.get_flip_bounds() is edges
+            m.assert_not_called()
+
+
+def test_handles_cache_doesnt_query_view(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    with patch.object(view, 'get_scale') as get_scale_mock:
+        # Neither when the cache is filled nor when it is used
+        for i in range(2):
+            item.get_handle_rects()
+            item.get_flip_bounds()
+            item.shape()
+        get_scale_mock.assert_not_called()
+
+
+def test_handles_cache_invalidated_on_view_scale_change(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    item.SELECT_RESIZE_SIZE = 10
+    with patch.object(item, 'bounding_rect_unselected',
+                      return_value=QtCore.QRectF(0, 0, 100, 80)):
+        scale_rect = item.get_handle_rects()[0][1]
+        assert scale_rect == QtCore.QRectF(-5, -5, 10, 10)
+        view.scale(2, 2)
+        scale_rect = item.get_handle_rects()[0][1]
+        assert scale_rect == QtCore.QRectF(-2.5, -2.5, 5, 5)
+
+
+def test_handles_use_view_scale_changed_before_selection(view, item):
+    view.scene.addItem(item)
+    item.SELECT_RESIZE_SIZE = 10
+    with patch.object(item, 'bounding_rect_unselected',
+                      return_value=QtCore.QRectF(0, 0, 100, 80)):
+        item.get_handle_rects()
+        view.scale(2, 2)
+        item.setSelected(True)
+        scale_rect = item.get_handle_rects()[0][1]
+        assert scale_rect == QtCore.QRectF(-2.5, -2.5, 5, 5)
+
+
+def test_handles_cache_invalidated_on_item_change(view, item):
+    view.scene.addItem(item)
+    item.SELECT_RESIZE_SIZE = 10
+    with patch.object(item, 'bounding_rect_unselected',
+                      return_value=QtCore.QRectF(0, 0, 100, 80)):
+        item.setScale(2)
+        scale_rect = item.get_handle_rects()[0][1]
+        assert scale_rect == QtCore.QRectF(-2.5, -2.5, 5, 5)
+    with patch.object(item, 'bounding_rect_unselected',
+                      return_value=QtCore.QRectF(0, 0, 50, 40)):
+        assert item.get_handle_rects()[2][0] == QtCore.QPointF(50, 40)
+
+
 def test_rotate_bounds_bottomright(view, item):
     item.SELECT_RESIZE_SIZE = 10
     item.SELECT_ROTATE_SIZE = 10
@@ -306,6 +391,7 @@ def test_bounding_rect_when_not_selected(view, item):
 
 
 def test_bounding_rect_when_selected(view, item):
+    view.scene.addItem(item)
     item.SELECT_RESIZE_SIZE = 10
     item.SELECT_ROTATE_SIZE = 10
     item.setSelected(True)
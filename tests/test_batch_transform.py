@@ -0,0 +1,173 @@
+import random
+from unittest.mock import patch
+
+from pytest import approx, mark
+
+from PyQt6 import QtCore, QtGui
+
+from dreamboard import batch_transform
+from dreamboard.items import DreambPixmapItem
+
+
+FORMAT = QtGui.QImage.Format.Format_RGB32
+
+
+def make_items(scene, count=10):
+    """Items in the scene and copies of them outside of the scene, which
+    get transformed by the items' own setters."""
+
+    random.seed(42)
+    items = []
+    copies = []
+    for i in range(count):
+        item = DreambPixmapItem(QtGui.QImage(
+            random.randint(10, 100), random.randint(10, 100), FORMAT))
+        item.setPos(random.uniform(-500, 500), random.uniform(-500, 500))
+        item.setScale(random.uniform(0.2, 3))
+        item.setRotation(random.uniform(0, 360))
+        if i % 2:
+            item.do_flip()
+        copies.append(item.create_copy())
+        scene.addItem(item)
+        items.append(item)
+    return items, copies
+
+
+def assert_same_transforms(items, copies):
+    for item, copy in zip(items, copies):
+        assert item.pos().x() == approx(copy.pos().x())
+        assert item.pos().y() == approx(copy.pos().y())
+        assert item.scale() == approx(copy.scale())
+        assert item.rotation() == approx(copy.rotation())
+        assert item.flip() == copy.flip()
+        for corner, expected in zip(item.corners_scene_coords,
+                                    copy.corners_scene_coords):
+            assert corner.x() == approx(expected.x())
+            assert corner.y() == approx(expected.y())
+
+
+def test_split_items(view):
+    item1 = DreambPixmapItem(QtGui.QImage())
+    view.scene.addItem(item1)
+    item2 = DreambPixmapItem(QtGui.QImage())
+    scene, batch, others = batch_transform.split_items(
+        [item2, item1, view.scene.multi_select_item])
+    assert scene is view.scene
+    assert batch == [1]
+    assert others == [0, 2]
+
+
+def test_split_items_when_not_in_scene(qapp):
+    item = DreambPixmapItem(QtGui.QImage())
+    assert batch_transform.split_items([item]) == (None, [], [0])
+
+
+def test_scale_items_by(view):
+    items, copies = make_items(view.scene)
+    anchor = QtCore.QPointF(30, -40)
+    batch_transform.scale_items_by(items, 1.7, anchor)
+    batch_transform.scale_items_by(copies, 1.7, anchor)
+    assert_same_transforms(items, copies)
+
+
+def test_set_scales_ignores_non_positive(view):
+    items, copies = make_items(view.scene, 2)
+    pos = items[0].pos()
+    batch_transform.set_scales(items, [-1, 2], QtCore.QPointF(0, 0))
+    assert items[0].pos() == pos
+    assert items[0].scale() == copies[0].scale()
+    assert items[1].scale() == 2
+
+
+@mark.parametrize('delta', [-90, 33, 180, 270.5])
+def test_rotate_items_by(view, delta):
+    items, copies = make_items(view.scene)
+    anchor = QtCore.QPointF(-10, 70)
+    batch_transform.rotate_items_by(items, delta, anchor)
+    batch_transform.rotate_items_by(copies, delta, anchor)
+    assert_same_transforms(items, copies)
+
+
+def test_set_rotations(view):
+    items, copies = make_items(view.scene)
+    anchor = QtCore.QPointF(5, 5)
+    rotations = [i * 40 for i in range(len(items))]
+    batch_transform.set_rotations(items, rotations, anchor)
+    batch_transform.set_rotations(copies, rotations, anchor)
+    assert_same_transforms(items, copies)
+
+
+@mark.parametrize('vertical', [True, False])
+def test_flip_items(view, vertical):
+    items, copies = make_items(view.scene)
+    anchor = QtCore.QPointF(100, -3)
+    batch_transform.flip_items(items, anchor, vertical)
+    batch_transform.flip_items(copies, anchor, vertical)
+    assert_same_transforms(items, copies)
+
+
+def test_transform_updates_scene_once(view):
+    items, copies = make_items(view.scene)
+    index = view.scene.spatial_index
+    with patch.object(index, 'mark_stale', wraps=index.mark_stale) as m:
+        batch_transform.scale_items_by(items, 2, QtCore.QPointF(0, 0))
+        assert m.call_count == len(items)
+
+    expected = QtCore.QRectF()
+    for item in items:
+        expected = expected.united(item.sceneBoundingRect())
+    rect = view.scene.itemsBoundingRect()
+    assert rect.left() == approx(expected.left())
+    assert rect.bottom() == approx(expected.bottom())
+    assert items[0] in view.scene.items_in_rect(
+        items[0].sceneBoundingRect())
+
+
+def test_set_positions(view):
+    items, copies = make_items(view.scene)
+    x = [i * 10 for i in range(len(items))]
+    y = [i * -5 for i in range(len(items))]
+    batch_transform.set_positions(items, x, y)
+    batch_transform.set_positions(copies, x, y)
+    assert_same_transforms(items, copies)
+    assert items[3].pos() == QtCore.QPointF(30, -15)
+
+
+def test_set_positions_skips_item_notifications(view):
+    items, copies = make_items(view.scene)
+    with patch.object(DreambPixmapItem, 'on_geometry_change') as m:
+        batch_transform.set_positions(items, [5] * len(items),
+                                      [10] * len(items))
+        m.assert_not_called()
+    assert items[0].hasChanged is True
+    assert items[0].pos() == QtCore.QPointF(5, 10)
+    assert items[0] in view.scene.items_in_rect(
+        items[0].sceneBoundingRect())
+    # Outside of batches the items notify the scene as usual
+    with patch.object(DreambPixmapItem, 'on_geometry_change') as m:
+        items[0].setPos(20, 30)
+        assert m.call_count == 1
+
+
+def test_move_bounds_to(view):
+    items, copies = make_items(view.scene)
+    left = [i * 10 for i in range(len(items))]
+    top = [i * -5 for i in range(len(items))]
+    batch_transform.move_bounds_to(items, left, top)
+    batch_transform.move_bounds_to(copies, left, top)
+    assert_same_transforms(items, copies)
+    rect = items[3].mapRectToScene(items[3].bounding_rect_unselected())
+    assert rect.left() == approx(30)
+    assert rect.top() == approx(-15)
+
+
+def test_set_scales_in_place(view):
+    items, copies = make_items(view.scene)
+    scales = [0.5 + i / 4 for i in range(len(items))]
+    centers = [item.center_scene_coords for item in items]
+    batch_transform.set_scales_in_place(items, scales)
+    batch_transform.set_scales_in_place(copies, scales)
+    assert_same_transforms(items, copies)
+    for item, center in zip(items, centers):
+        assert item.center_scene_coords.x() == approx(center.x())
+        assert item.center_scene_coords.y() == approx(center.y())
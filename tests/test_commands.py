@@ -26,6 +26,18 @@ def test_insert_items(view):
     assert item2.pos() == QtCore.QPointF(50, 40)
 
 
+def test_insert_items_emits_selection_changed_once(view):
+    items = [DreambPixmapItem(QtGui.QImage()) for i in range(3)]
+    scene = view.scene
+    handler = MagicMock()
+    scene.selectionChanged.connect(handler)
+    command = commands.InsertItems(scene, items)
+    command.redo()
+    handler.assert_called_once_with()
+    assert scene.selection_count() == 3
+    scene.selectionChanged.disconnect(handler)
+
+
 def test_insert_items_with_position(view):
     view.scene.update_selection = MagicMock()
 
@@ -465,6 +477,32 @@ def test_arrange_items(view):
                 assert item3.pos() == QtCore.QPointF(0, 0)
 
 
+def test_arrange_items_with_scales(view):
+    item1 = DreambPixmapItem(QtGui.QImage())
+    item1.crop = QtCore.QRectF(0, 0, 100, 80)
+    view.scene.addItem(item1)
+    item2 = DreambPixmapItem(QtGui.QImage())
+    item2.crop = QtCore.QRectF(0, 0, 100, 80)
+    item2.setScale(2)
+    view.scene.addItem(item2)
+
+    command = commands.ArrangeItems(
+        view.scene,
+        [item1, item2],
+        [QtCore.QPointF(0, 0), QtCore.QPointF(300, 0)],
+        [0.5, 1])
+    command.redo()
+    assert item1.scale() == 0.5
+    assert item2.scale() == 1
+    assert item1.pos() == QtCore.QPointF(0, 0)
+    assert item2.pos() == QtCore.QPointF(300, 0)
+    command.undo()
+    assert item1.scale() == 1
+    assert item2.scale() == 2
+    assert item1.pos() == QtCore.QPointF(0, 0)
+    assert item2.pos() == QtCore.QPointF(0, 0)
+
+
 def test_crop_item(item):
     item.crop = QtCore.QRectF(0, 0, 100, 80)
     command = commands.CropItem(item, QtCore.QRectF(10, 20, 30, 40))
@@ -474,3 +512,105 @@ def test_crop_item(item):
     command.undo()
     assert item.crop == QtCore.QRectF(0, 0, 100, 80)
     assert item.pos() == QtCore.QPointF(0, 0)
+
+
+def test_delete_items_memory_cost(view):
+    item = DreambPixmapItem(
+        QtGui.QImage(10, 20, QtGui.QImage.Format.Format_ARGB32))
+    view.scene.addItem(item)
+    text = DreambTextItem('foo')
+    view.scene.addItem(text)
+    command = commands.DeleteItems(view.scene, [item, text])
+    assert command.memory_cost() == 0
+    command.redo()
+    assert command.memory_cost() == 10 * 20 * 4
+
+
+def test_move_items_by_merges(view):
+    item = DreambPixmapItem(QtGui.QImage())
+    view.scene.addItem(item)
+    stack = view.undo_stack
+    stack.push(commands.MoveItemsBy([item], QtCore.QPointF(10, 0)))
+    stack.push(commands.MoveItemsBy([item], QtCore.QPointF(5, 5)))
+    assert stack.count() == 1
+    assert item.pos() == QtCore.QPointF(15, 5)
+    stack.undo()
+    assert item.pos() == QtCore.QPointF(0, 0)
+    stack.redo()
+    assert item.pos() == QtCore.QPointF(15, 5)
+
+
+def test_move_items_by_merge_drops_noop(view):
+    item = DreambPixmapItem(QtGui.QImage())
+    view.scene.addItem(item)
+    stack = view.undo_stack
+    stack.push(commands.MoveItemsBy([item], QtCore.QPointF(10, 0)))
+    stack.push(commands.MoveItemsBy([item], QtCore.QPointF(-10, 0)))
+    assert stack.count() == 0
+    assert item.pos() == QtCore.QPointF(0, 0)
+
+
+def test_move_items_by_no_merge_when_other_items(view):
+    item1 = DreambPixmapItem(QtGui.QImage())
+    item2 = DreambPixmapItem(QtGui.QImage())
+    stack = view.undo_stack
+    stack.push(commands.MoveItemsBy([item1], QtCore.QPointF(10, 0)))
+    stack.push(commands.MoveItemsBy([item1, item2], QtCore.QPointF(5, 5)))
+    assert stack.count() == 2
+
+
+def test_move_items_by_no_merge_after_interval(view):
+    item = DreambPixmapItem(QtGui.QImage())
+    stack = view.undo_stack
+    with patch('dreamboard.commands.time.monotonic', return_value=10):
+        stack.push(commands.MoveItemsBy([item], QtCore.QPointF(10, 0)))
+    with patch('dreamboard.commands.time.monotonic', return_value=20):
+        stack.push(commands.MoveItemsBy([item], QtCore.QPointF(5, 5)))
+    assert stack.count() == 2
+
+
+def test_scale_items_by_merges(view):
+    item = DreambPixmapItem(QtGui.QImage())
+    stack = view.undo_stack
+    anchor = QtCore.QPointF(0, 0)
+    stack.push(commands.ScaleItemsBy([item], 2, anchor))
+    stack.push(commands.ScaleItemsBy([item], 1.5, anchor))
+    assert stack.count() == 1
+    assert item.scale() == 3
+    stack.push(commands.ScaleItemsBy([item], 2, QtCore.QPointF(5, 5)))
+    assert stack.count() == 2
+    stack.undo()
+    stack.undo()
+    assert item.scale() == 1
+
+
+def test_rotate_items_by_merges(view):
+    item = DreambPixmapItem(QtGui.QImage())
+    stack = view.undo_stack
+    anchor = QtCore.QPointF(0, 0)
+    stack.push(commands.RotateItemsBy([item], 10, anchor))
+    stack.push(commands.RotateItemsBy([item], 20, anchor))
+    assert stack.count() == 1
+    assert item.rotation() == 30
+    stack.push(commands.MoveItemsBy([item], QtCore.QPointF(5, 5)))
+    stack.push(commands.RotateItemsBy([item], 20, anchor))
+    assert stack.count() == 3
+
+
+def test_mergeable_transform_command_defaults(view):
+    class TransformCommand(commands.MergeableTransformCommand):
+        ID = 100
+
+        def redo(self):
+            pass
+
+        def undo(self):
+            pass
+
+    item = DreambPixmapItem(QtGui.QImage())
+    stack = view.undo_stack
+    stack.push(TransformCommand('Transform', [item]))
+    stack.push(TransformCommand('Transform', [item]))
+    # Doesn't merge unless the subclass says so
+    assert stack.count() == 2
+    assert stack.command(0).is_noop() is False
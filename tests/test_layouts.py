@@ -0,0 +1,101 @@
+import numpy as np
+from pytest import mark
+
+from dreamboard import layouts
+
+
+def overlaps(sizes, positions):
+    # Scaled items may touch with rounding errors
+    rects = np.concatenate((positions, positions + sizes - 1e-6), axis=1)
+    for i, a in enumerate(rects):
+        for b in rects[i + 1:]:
+            if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                return True
+    return False
+
+
+def random_sizes(count):
+    rng = np.random.default_rng(42)
+    return rng.uniform(10, 300, size=(count, 2)).round()
+
+
+def test_reading_order():
+    bounds = np.array([[50, 0, 60, 10],
+                       [0, 20, 10, 30],
+                       [0, 0, 10, 10]])
+    assert layouts.reading_order(bounds).tolist() == [2, 0, 1]
+
+
+def test_layout_size():
+    sizes = np.array([[10, 20], [30, 5]])
+    positions = np.array([[0, 0], [10, 40]])
+    assert layouts.layout_size(sizes, positions) == (40, 45)
+
+
+def test_grid():
+    sizes = np.array([[100, 80], [50, 40], [100, 80], [100, 60]])
+    positions, factors = layouts.grid(sizes, columns=2)
+    assert positions.tolist() == [[0, 0], [125, 20], [0, 80], [100, 90]]
+    assert factors.tolist() == [1, 1, 1, 1]
+
+
+def test_masonry():
+    sizes = np.array([[100, 80], [100, 40], [100, 20], [50, 60]])
+    positions, factors = layouts.masonry(sizes, columns=2)
+    assert positions.tolist() == [[0, 0], [100, 0], [100, 40], [125, 60]]
+    assert factors.tolist() == [1, 1, 1, 1]
+
+
+def test_justified_rows():
+    sizes = np.array([[60, 20], [30, 10], [50, 10], [70, 10], [20, 50]])
+    positions, factors = layouts.justified_rows(sizes, row_width=120)
+    # At the average height of 20 the items are 60, 60, 100, 140 and 8
+    # wide. The first row fits exactly, the second one is scaled down
+    # to half, the last one stays at height 20.
+    assert positions.tolist() == [[0, 0], [60, 0],
+                                  [0, 20], [50, 20],
+                                  [0, 30]]
+    assert factors.tolist() == [1, 2, 1, 1, 0.4]
+
+
+def test_justified_rows_fill_rows_at_shared_height():
+    sizes = random_sizes(50)
+    positions, factors = layouts.justified_rows(sizes, row_width=1000)
+    scaled = sizes * factors[:, np.newaxis]
+    for top in np.unique(positions[:, 1])[:-1]:
+        row = positions[:, 1] == top
+        assert np.allclose(scaled[row, 1], scaled[row, 1][0])
+        assert np.isclose((positions[row, 0] + scaled[row, 0]).max(), 1000)
+
+
+def test_justified_rows_when_item_wider_than_row():
+    sizes = np.array([[10, 10], [500, 10], [10, 10]])
+    positions, factors = layouts.justified_rows(sizes)
+    assert not overlaps(sizes * factors[:, np.newaxis], positions)
+
+
+@mark.parametrize('name', layouts.LAYOUTS)
+def test_layout_no_overlaps(name):
+    sizes = random_sizes(200)
+    positions, factors = layouts.LAYOUTS[name](sizes)
+    assert positions.shape == (200, 2)
+    assert factors.shape == (200,)
+    sizes = sizes * factors[:, np.newaxis]
+    assert not overlaps(sizes, positions)
+    assert positions.min() >= 0
+    width, height = layouts.layout_size(sizes, positions)
+    assert 0.25 < width / height < 4
+
+
+@mark.parametrize('name', layouts.LAYOUTS)
+def test_layout_when_empty(name):
+    positions, factors = layouts.LAYOUTS[name](np.zeros((0, 2)))
+    assert positions.shape == (0, 2)
+    assert factors.shape == (0,)
+
+
+@mark.parametrize('name', layouts.LAYOUTS)
+def test_layout_single_item(name):
+    positions, factors = layouts.LAYOUTS[name]([[30, 40]])
+    assert positions.tolist() == [[0, 0]]
+    assert factors.tolist() == [1]
@@ -0,0 +1,95 @@
+from unittest.mock import patch
+
+import rpack
+
+from dreamboard import packing
+
+
+def overlaps(sizes, positions):
+    rects = [(x, y, x + w, y + h)
+             for (w, h), (x, y) in zip(sizes, positions)]
+    for i, a in enumerate(rects):
+        for b in rects[i + 1:]:
+            if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                return True
+    return False
+
+
+def test_pack_in_row():
+    assert packing.pack_in_row([(10, 20), (30, 5), (7, 7)]) == [
+        (0, 0), (10, 0), (40, 0)]
+
+
+def test_pack_finds_square():
+    sizes = [(100, 80)] * 4
+    positions = packing.pack(sizes)
+    assert rpack.bbox_size(sizes, positions) == (200, 160)
+    assert not overlaps(sizes, positions)
+
+
+def test_pack_many_items():
+    sizes = [(10 + (i * 7) % 50, 10 + (i * 13) % 40) for i in range(100)]
+    positions = packing.pack(sizes)
+    assert len(positions) == 100
+    assert not overlaps(sizes, positions)
+    width, height = rpack.bbox_size(sizes, positions)
+    assert width < sum(w for w, h in sizes) / 4
+
+
+def test_pack_empty():
+    assert packing.pack([]) == []
+
+
+def test_pack_when_budget_exceeded_returns_row():
+    sizes = [(10, 10)] * 5
+    with patch('dreamboard.packing.rpack.pack') as pack_mock:
+        positions = packing.pack(sizes, time_budget=-1)
+        pack_mock.assert_not_called()
+    assert positions == packing.pack_in_row(sizes)
+
+
+def test_pack_when_canceled_returns_row():
+    sizes = [(10, 10)] * 5
+    positions = packing.pack(sizes, canceled=lambda: True)
+    assert positions == packing.pack_in_row(sizes)
+
+
+def test_cache_get_in_other_order():
+    cache = packing.PackingCache()
+    cache.put([(10, 20), (30, 40)], [(0, 0), (10, 0)])
+    assert cache.get([(30, 40), (10, 20)]) == [(10, 0), (0, 0)]
+    assert cache.get([(10, 20), (30, 40)]) == [(0, 0), (10, 0)]
+
+
+def test_cache_get_when_not_cached():
+    cache = packing.PackingCache()
+    cache.put([(10, 20), (30, 40)], [(0, 0), (10, 0)])
+    assert cache.get([(10, 20), (30, 41)]) is None
+    assert cache.get([(10, 20)]) is None
+
+
+def test_cache_discards_oldest():
+    cache = packing.PackingCache()
+    for i in range(cache.MAX_ENTRIES + 1):
+        cache.put([(i + 1, 1)], [(0, 0)])
+    assert len(cache) == cache.MAX_ENTRIES
+    assert cache.get([(1, 1)]) is None
+    assert cache.get([(2, 1)]) == [(0, 0)]
+
+
+def test_worker_packs(qapp):
+    worker = packing.PackingWorker([(100, 80)] * 4)
+    results = []
+    worker.packed.connect(lambda w, p: results.append((w, p)))
+    worker.run()
+    assert results[0][0] is worker
+    assert len(results[0][1]) == 4
+
+
+def test_worker_when_canceled(qapp):
+    worker = packing.PackingWorker([(100, 80)] * 4)
+    results = []
+    worker.packed.connect(lambda w, p: results.append((w, p)))
+    worker.on_canceled()
+    worker.run()
+    assert results == []
@@ -1,13 +1,18 @@
 import math
+import time
 from unittest.mock import patch, MagicMock
 
-from pytest import approx
+from pytest import approx, mark
 
 from PyQt6 import QtCore, QtGui, QtWidgets
 from PyQt6.QtCore import Qt
 
 from dreamboard import commands
 from dreamboard.items import DreambPixmapItem, DreambTextItem
+from dreamboard.scene import get_item_bounds
+
+
+FORMAT = QtGui.QImage.Format.Format_RGB32
 
 
 def test_add_remove_item(view, item):
@@ -102,20 +107,16 @@ def test_lower_to_bottom(view):
 
 
 def test_normalize_height(view):
-    item1 = DreambPixmapItem(QtGui.QImage())
+    item1 = DreambPixmapItem(QtGui.QImage(100, 80, FORMAT))
     view.scene.addItem(item1)
     item1.setSelected(True)
-    item2 = DreambPixmapItem(QtGui.QImage())
+    item2 = DreambPixmapItem(QtGui.QImage(100, 80, FORMAT))
     view.scene.addItem(item2)
     item2.setSelected(True)
     item2.setScale(3)
     view.scene.cancel_crop_mode = MagicMock()
 
-    with patch.object(item1, 'bounding_rect_unselected',
-                      return_value=QtCore.QRectF(0, 0, 100, 80)):
-        with patch.object(item2, 'bounding_rect_unselected',
-                          return_value=QtCore.QRectF(0, 0, 100, 80)):
-            view.scene.normalize_height()
+    view.scene.normalize_height()
 
     assert item1.scale() == 2
     assert item1.pos() == QtCore.QPointF(-50, -40)
@@ -125,20 +126,16 @@ def test_normalize_height(view):
 
 
 def test_normalize_height_with_rotation(view):
-    item1 = DreambPixmapItem(QtGui.QImage())
+    item1 = DreambPixmapItem(QtGui.QImage(100, 200, FORMAT))
     view.scene.addItem(item1)
     item1.setSelected(True)
-    item2 = DreambPixmapItem(QtGui.QImage())
+    item2 = DreambPixmapItem(QtGui.QImage(100, 200, FORMAT))
     view.scene.addItem(item2)
     item2.setSelected(True)
     item2.setRotation(90)
     view.scene.cancel_crop_mode = MagicMock()
 
-    with patch.object(item1, 'bounding_rect_unselected',
-                      return_value=QtCore.QRectF(0, 0, 100, 200)):
-        with patch.object(item2, 'bounding_rect_unselected',
-                          return_value=QtCore.QRectF(0, 0, 100, 200)):
-            view.scene.normalize_height()
+    view.scene.normalize_height()
 
     assert item1.scale() == 0.75
     assert item2.scale() == 1.5
@@ -152,20 +149,16 @@ def test_normalize_height_when_no_items(view):
 
 
 def test_normalize_width(view):
-    item1 = DreambPixmapItem(QtGui.QImage())
+    item1 = DreambPixmapItem(QtGui.QImage(80, 100, FORMAT))
     view.scene.addItem(item1)
     item1.setSelected(True)
-    item2 = DreambPixmapItem(QtGui.QImage())
+    item2 = DreambPixmapItem(QtGui.QImage(80, 100, FORMAT))
     view.scene.addItem(item2)
     item2.setSelected(True)
     item2.setScale(3)
     view.scene.cancel_crop_mode = MagicMock()
 
-    with patch.object(item1, 'bounding_rect_unselected',
-                      return_value=QtCore.QRectF(0, 0, 80, 100)):
-        with patch.object(item2, 'bounding_rect_unselected',
-                          return_value=QtCore.QRectF(0, 0, 80, 100)):
-            view.scene.normalize_width()
+    view.scene.normalize_width()
 
     assert item1.scale() == 2
     assert item1.pos() == QtCore.QPointF(-40, -50)
@@ -175,20 +168,16 @@ def test_normalize_width(view):
 
 
 def test_normalize_width_with_rotation(view):
-    item1 = DreambPixmapItem(QtGui.QImage())
+    item1 = DreambPixmapItem(QtGui.QImage(200, 100, FORMAT))
     view.scene.addItem(item1)
     item1.setSelected(True)
-    item2 = DreambPixmapItem(QtGui.QImage())
+    item2 = DreambPixmapItem(QtGui.QImage(200, 100, FORMAT))
     view.scene.addItem(item2)
     item2.setSelected(True)
     item2.setRotation(90)
     view.scene.cancel_crop_mode = MagicMock()
 
-    with patch.object(item1, 'bounding_rect_unselected',
-                      return_value=QtCore.QRectF(0, 0, 200, 100)):
-        with patch.object(item2, 'bounding_rect_unselected',
-                          return_value=QtCore.QRectF(0, 0, 200, 100)):
-            view.scene.normalize_height()
+    view.scene.normalize_height()
 
     assert item1.scale() == 1.5
     assert item2.scale() == 0.75
@@ -202,20 +191,16 @@ def test_normalize_width_when_no_items(view):
 
 
 def test_normalize_size(view):
-    item1 = DreambPixmapItem(QtGui.QImage())
+    item1 = DreambPixmapItem(QtGui.QImage(100, 100, FORMAT))
     view.scene.addItem(item1)
     item1.setSelected(True)
-    item2 = DreambPixmapItem(QtGui.QImage())
+    item2 = DreambPixmapItem(QtGui.QImage(100, 100, FORMAT))
     view.scene.addItem(item2)
     item2.setSelected(True)
     item2.setScale(2)
     view.scene.cancel_crop_mode = MagicMock()
 
-    with patch.object(item1, 'bounding_rect_unselected',
-                      return_value=QtCore.QRectF(0, 0, 100, 100)):
-        with patch.object(item2, 'bounding_rect_unselected',
-                          return_value=QtCore.QRectF(0, 0, 100, 100)):
-            view.scene.normalize_size()
+    view.scene.normalize_size()
 
     assert item1.scale() == approx(math.sqrt(2.5))
     assert item2.scale() == approx(math.sqrt(2.5))
@@ -223,20 +208,16 @@ def test_normalize_size(view):
 
 
 def test_normalize_size_with_rotation(view):
-    item1 = DreambPixmapItem(QtGui.QImage())
+    item1 = DreambPixmapItem(QtGui.QImage(100, 200, FORMAT))
     view.scene.addItem(item1)
     item1.setSelected(True)
-    item2 = DreambPixmapItem(QtGui.QImage())
+    item2 = DreambPixmapItem(QtGui.QImage(100, 200, FORMAT))
     view.scene.addItem(item2)
     item2.setSelected(True)
     item2.setRotation(90)
     view.scene.cancel_crop_mode = MagicMock()
 
-    with patch.object(item1, 'bounding_rect_unselected',
-                      return_value=QtCore.QRectF(0, 0, 100, 200)):
-        with patch.object(item2, 'bounding_rect_unselected',
-                          return_value=QtCore.QRectF(0, 0, 100, 200)):
-            view.scene.normalize_size()
+    view.scene.normalize_size()
 
     assert item1.scale() == 1
     assert item2.scale() == 1
@@ -249,22 +230,61 @@ def test_normalize_size_when_no_items(view):
     view.scene.cancel_crop_mode.assert_called_once_with()
 
 
+def test_normalize_ignores_empty_items(view):
+    items = []
+    for size in (0, 100, 200):
+        item = DreambPixmapItem(QtGui.QImage(200, 200, FORMAT))
+        view.scene.addItem(item)
+        item.setSelected(True)
+        item.crop = QtCore.QRectF(0, 0, size, size)
+        items.append(item)
+
+    view.scene.normalize_size()
+    assert items[0].scale() == 1
+    assert items[1].scale() == approx(math.sqrt(2.5))
+    assert items[2].scale() == approx(math.sqrt(0.625))
+
+
+def test_normalize_many_items_benchmark(view):
+    image = QtGui.QImage(10, 10, FORMAT)
+    items = []
+    for i in range(3003):
+        item = DreambPixmapItem(image)
+        item.setScale(1 + i % 7)
+        view.scene.addItem(item)
+        item.setSelected(True)
+        items.append(item)
+
+    with patch.object(view.scene, 'itemsBoundingRect',
+                      wraps=view.scene.itemsBoundingRect) as bounds_mock:
+        start = time.perf_counter()
+        view.scene.normalize_height()
+        duration = time.perf_counter() - start
+        # Only the selection center, no per item bounding rects
+        for call in bounds_mock.call_args_list:
+            assert 'items' not in call.kwargs
+    assert all(item.scale() == approx(4) for item in items)
+    assert duration < 1
+
+    start = time.perf_counter()
+    view.undo_stack.undo()
+    duration = time.perf_counter() - start
+    assert items[6].scale() == 7
+    assert duration < 1
+
+
 def test_arrange_horizontal(view):
-    item1 = DreambPixmapItem(QtGui.QImage())
+    item1 = DreambPixmapItem(QtGui.QImage(100, 80, FORMAT))
     view.scene.addItem(item1)
     item1.setSelected(True)
     item1.setPos(10, -100)
-    item2 = DreambPixmapItem(QtGui.QImage())
+    item2 = DreambPixmapItem(QtGui.QImage(100, 80, FORMAT))
     view.scene.addItem(item2)
     item2.setSelected(True)
     item2.setPos(-10, 40)
     view.scene.cancel_crop_mode = MagicMock()
 
-    with patch.object(item1, 'bounding_rect_unselected',
-                      return_value=QtCore.QRectF(0, 0, 100, 80)):
-        with patch.object(item2, 'bounding_rect_unselected',
-                          return_value=QtCore.QRectF(0, 0, 100, 80)):
-            view.scene.arrange()
+    view.scene.arrange()
 
     assert item2.pos() == QtCore.QPointF(-50, -30)
     assert item1.pos() == QtCore.QPointF(50, -30)
@@ -272,21 +292,17 @@ def test_arrange_horizontal(view):
 
 
 def test_arrange_vertical(view):
-    item1 = DreambPixmapItem(QtGui.QImage())
+    item1 = DreambPixmapItem(QtGui.QImage(100, 80, FORMAT))
     view.scene.addItem(item1)
     item1.setSelected(True)
     item1.setPos(10, -100)
-    item2 = DreambPixmapItem(QtGui.QImage())
+    item2 = DreambPixmapItem(QtGui.QImage(100, 80, FORMAT))
     view.scene.addItem(item2)
     item2.setSelected(True)
     item2.setPos(-10, 40)
     view.scene.cancel_crop_mode = MagicMock()
 
-    with patch.object(item1, 'bounding_rect_unselected',
-                      return_value=QtCore.QRectF(0, 0, 100, 80)):
-        with patch.object(item2, 'bounding_rect_unselected',
-                          return_value=QtCore.QRectF(0, 0, 100, 80)):
-            view.scene.arrange(vertical=True)
+    view.scene.arrange(vertical=True)
 
     assert item1.pos() == QtCore.QPointF(0, -70)
     assert item2.pos() == QtCore.QPointF(0, 10)
@@ -294,23 +310,19 @@ def test_arrange_vertical(view):
 
 
 def test_arrange_when_rotated(view):
-    item1 = DreambPixmapItem(QtGui.QImage())
+    item1 = DreambPixmapItem(QtGui.QImage(100, 80, FORMAT))
     view.scene.addItem(item1)
     item1.setSelected(True)
     item1.setPos(10, -100)
     item1.setRotation(90)
-    item2 = DreambPixmapItem(QtGui.QImage())
+    item2 = DreambPixmapItem(QtGui.QImage(100, 80, FORMAT))
     view.scene.addItem(item2)
     item2.setSelected(True)
     item2.setPos(-10, 40)
     item2.setRotation(90)
     view.scene.cancel_crop_mode = MagicMock()
 
-    with patch.object(item1, 'bounding_rect_unselected',
-                      return_value=QtCore.QRectF(0, 0, 100, 80)):
-        with patch.object(item2, 'bounding_rect_unselected',
-                          return_value=QtCore.QRectF(0, 0, 100, 80)):
-            view.scene.arrange()
+    view.scene.arrange()
 
     assert item2.pos() == QtCore.QPointF(-40, -30)
     assert item1.pos() == QtCore.QPointF(40, -30)
@@ -365,6 +377,176 @@ def test_arrange_optimal_when_no_items(view):
     view.scene.cancel_crop_mode.assert_called_once_with()
 
 
+def test_arrange_optimal_uses_cache(view):
+    for i in range(4):
+        item = DreambPixmapItem(QtGui.QImage())
+        view.scene.addItem(item)
+        item.setSelected(True)
+        item.crop = QtCore.QRectF(0, 0, 100, 80)
+
+    view.scene.arrange_optimal()
+    with patch('dreamboard.packing.pack') as pack_mock:
+        view.scene.arrange_optimal()
+        pack_mock.assert_not_called()
+    expected_positions = {(-50, -40), (50, -40), (-50, 40), (50, 40)}
+    actual_positions = {
+        (i.pos().x(), i.pos().y())
+        for i in view.scene.selectedItems(user_only=True)}
+    assert expected_positions == actual_positions
+
+
+def add_packing_items(scene, count):
+    items = []
+    for i in range(count):
+        item = DreambPixmapItem(QtGui.QImage())
+        scene.addItem(item)
+        item.setSelected(True)
+        item.crop = QtCore.QRectF(0, 0, 100, 80)
+        items.append(item)
+    return items
+
+
+def wait_for_packing(qapp, worker):
+    worker.wait()
+    qapp.processEvents()
+
+
+@patch('dreamboard.constants.PACK_SYNC_MAX_ITEMS', 3)
+def test_arrange_optimal_in_background(qapp, view):
+    add_packing_items(view.scene, 4)
+    view.scene.arrange_optimal()
+    worker = view.scene.packing_worker
+    assert worker is not None
+    wait_for_packing(qapp, worker)
+
+    assert view.scene.packing_worker is None
+    assert view.undo_stack.count() == 1
+    assert view.scene.packing_cache.get([(100, 80)] * 4) is not None
+    expected_positions = {(-50, -40), (50, -40), (-50, 40), (50, 40)}
+    actual_positions = {
+        (i.pos().x(), i.pos().y())
+        for i in view.scene.selectedItems(user_only=True)}
+    assert expected_positions == actual_positions
+
+
+@patch('dreamboard.constants.PACK_SYNC_MAX_ITEMS', 3)
+def test_arrange_optimal_in_background_when_selection_changed(qapp, view):
+    items = add_packing_items(view.scene, 4)
+    view.scene.arrange_optimal()
+    worker = view.scene.packing_worker
+    items[0].setSelected(False)
+    wait_for_packing(qapp, worker)
+    assert view.undo_stack.count() == 0
+    # The result can still be used next time
+    assert view.scene.packing_cache.get([(100, 80)] * 4) is not None
+
+
+@patch('dreamboard.constants.PACK_SYNC_MAX_ITEMS', 3)
+def test_arrange_optimal_cancels_running_packing(qapp, view):
+    add_packing_items(view.scene, 4)
+    view.scene.arrange_optimal()
+    first = view.scene.packing_worker
+    view.scene.arrange_optimal()
+    second = view.scene.packing_worker
+    assert first.canceled is True
+    assert second is not first
+    first.wait()
+    wait_for_packing(qapp, second)
+    assert view.undo_stack.count() == 1
+
+
+@patch('dreamboard.constants.PACK_SYNC_MAX_ITEMS', 3)
+def test_clear_waits_for_packing(qapp, view):
+    add_packing_items(view.scene, 4)
+    view.scene.arrange_optimal()
+    first = view.scene.packing_worker
+    view.scene.arrange_optimal()
+    second = view.scene.packing_worker
+    view.scene.clearSelection()
+    view.clear_scene()
+    assert view.scene.packing_worker is None
+    assert second.canceled is True
+    assert first.isFinished()
+    assert second.isFinished()
+    qapp.processEvents()
+    assert view.undo_stack.count() == 0
+
+
+def test_packing_sizes(view):
+    item = DreambPixmapItem(QtGui.QImage())
+    view.scene.addItem(item)
+    item.crop = QtCore.QRectF(0, 0, 100, 80.4)
+    item.setScale(2)
+    item.setRotation(90)
+    assert view.scene._packing_sizes([item]) == [(161, 200)]
+
+
+@mark.parametrize('name', ['grid', 'masonry', 'rows'])
+def test_arrange_layout(view, name):
+    for i in range(4):
+        item = DreambPixmapItem(QtGui.QImage())
+        view.scene.addItem(item)
+        item.setSelected(True)
+        item.crop = QtCore.QRectF(0, 0, 100, 80)
+        item.setPos(i * 10, 0)
+
+    view.scene.cancel_crop_mode = MagicMock()
+    view.scene.arrange_layout(name)
+    expected_positions = {(-35, -40), (65, -40), (-35, 40), (65, 40)}
+    actual_positions = {
+        (i.pos().x(), i.pos().y())
+        for i in view.scene.selectedItems(user_only=True)}
+    assert expected_positions == actual_positions
+    view.scene.cancel_crop_mode.assert_called_once_with()
+    assert view.undo_stack.count() == 1
+
+
+def test_arrange_layout_rows_scales_items(view):
+    items = []
+    for i, height in enumerate((40, 80, 40, 80, 40, 80)):
+        item = DreambPixmapItem(QtGui.QImage())
+        view.scene.addItem(item)
+        item.setSelected(True)
+        item.crop = QtCore.QRectF(0, 0, 100, height)
+        item.setPos(i * 200, 0)
+        items.append(item)
+
+    view.scene.arrange_layout('rows')
+    rows = {}
+    for item in items:
+        rect = view.scene.itemsBoundingRect(items=[item])
+        rows.setdefault(rect.top(), set()).add(round(rect.height(), 6))
+    assert len(rows) < len(items)
+    assert all(len(heights) == 1 for heights in rows.values())
+    assert items[0].scale() != items[1].scale()
+    view.undo_stack.undo()
+    assert [item.scale() for item in items] == [1] * 6
+    assert [item.pos().x() for item in items] == [0, 200, 400, 600, 800, 1000]
+
+
+def test_arrange_layout_keeps_reading_order(view):
+    items = []
+    for i in range(3):
+        item = DreambPixmapItem(QtGui.QImage())
+        view.scene.addItem(item)
+        item.setSelected(True)
+        item.crop = QtCore.QRectF(0, 0, 100, 80)
+        item.setPos(0, 1000 - i * 100)
+        items.append(item)
+
+    view.scene.arrange_layout('grid')
+    assert items[2].pos().y() == items[1].pos().y()
+    assert items[2].pos().x() < items[1].pos().x()
+    assert items[0].pos().y() > items[1].pos().y()
+
+
+def test_arrange_layout_when_no_items(view):
+    view.scene.cancel_crop_mode = MagicMock()
+    view.scene.arrange_layout('grid')
+    view.scene.cancel_crop_mode.assert_called_once_with()
+    assert view.undo_stack.count() == 0
+
+
 def test_flip_items(view, item):
     view.scene.addItem(item)
     item.setSelected(True)
@@ -461,6 +643,133 @@ def test_set_selected_all_items_when_false(view):
     view.scene.cancel_crop_mode.assert_called_once_with()
 
 
+def test_set_selected_all_items_emits_selection_changed_once(view):
+    for i in range(5):
+        view.scene.addItem(DreambPixmapItem(QtGui.QImage()))
+    scene = view.scene
+    handler = MagicMock()
+    scene.selectionChanged.connect(handler)
+
+    scene.set_selected_all_items(True)
+    assert handler.call_count == 1
+    assert scene.selection_count() == 5
+    scene.set_selected_all_items(False)
+    assert handler.call_count == 2
+    assert scene.selection_count() == 0
+    scene.selectionChanged.disconnect(handler)
+
+
+def test_batch_selection_nested(view):
+    item1 = DreambPixmapItem(QtGui.QImage())
+    view.scene.addItem(item1)
+    item2 = DreambPixmapItem(QtGui.QImage())
+    view.scene.addItem(item2)
+    scene = view.scene
+    handler = MagicMock()
+    scene.selectionChanged.connect(handler)
+
+    with scene.batch_selection():
+        item1.setSelected(True)
+        with scene.batch_selection():
+            item2.setSelected(True)
+        handler.assert_not_called()
+        assert scene.signalsBlocked() is True
+    assert scene.signalsBlocked() is False
+    handler.assert_called_once_with()
+    assert scene.has_multi_selection() is True
+    assert scene.multi_select_item.scene() == scene
+    scene.selectionChanged.disconnect(handler)
+
+
+def test_batch_selection_when_unchanged(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    scene = view.scene
+    handler = MagicMock()
+    scene.selectionChanged.connect(handler)
+
+    with scene.batch_selection():
+        item.setSelected(False)
+        item.setSelected(True)
+    handler.assert_not_called()
+    scene.selectionChanged.disconnect(handler)
+
+
+def test_select_all_does_not_change_geometry(view):
+    items = []
+    for i in range(3):
+        item = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+        view.scene.addItem(item)
+        item.prepareGeometryChange = MagicMock()
+        items.append(item)
+
+    view.scene.set_selected_all_items(True)
+    for item in items:
+        item.prepareGeometryChange.assert_not_called()
+        assert item.boundingRect() == QtCore.QRectF(0, 0, 10, 10)
+
+
+def test_handles_margin_follows_single_selection(view):
+    item1 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item1)
+    item2 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item2)
+
+    item1.setSelected(True)
+    assert item1.boundingRect() != QtCore.QRectF(0, 0, 10, 10)
+    item2.setSelected(True)
+    assert item1.boundingRect() == QtCore.QRectF(0, 0, 10, 10)
+    assert item2.boundingRect() == QtCore.QRectF(0, 0, 10, 10)
+    item1.setSelected(False)
+    assert item2.boundingRect() != QtCore.QRectF(0, 0, 10, 10)
+
+
+def test_overlay_items(view):
+    item1 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item1)
+    item2 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item2)
+    item3 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item3)
+    rect = QtCore.QRectF(0, 0, 100, 100)
+    assert view.scene.overlay_items(rect) == []
+
+    item1.setSelected(True)
+    view.scene.on_item_hover_change(item2, True)
+    view.scene.on_item_hover_change(item1, True)
+    assert view.scene.overlay_items(rect) == [item1, item2]
+
+    item3.setSelected(True)
+    assert view.scene.overlay_items(rect) == [
+        item1, item3, item2, view.scene.multi_select_item]
+    view.scene.removeItem(item2)
+    assert item2 not in view.scene.overlay_items(rect)
+
+
+def test_overlay_items_when_many_selected(view):
+    items = []
+    for i in range(view.scene.OVERLAY_QUERY_THRESHOLD + 1):
+        item = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+        view.scene.addItem(item)
+        item.setPos(i * 100, 0)
+        items.append(item)
+    view.scene.set_selected_all_items(True)
+
+    overlay = view.scene.overlay_items(QtCore.QRectF(0, 0, 150, 10))
+    assert set(overlay) == {items[0], items[1],
+                            view.scene.multi_select_item}
+
+
+def test_selection_change_updates_overlay_only(view, item):
+    view.scene.addItem(item)
+    item.update = MagicMock()
+    view.update_overlay = MagicMock()
+    item.setSelected(True)
+    view.scene.on_selection_change()
+    item.update.assert_not_called()
+    view.update_overlay.assert_called()
+
+
 def test_has_selection_when_no_selection(view, item):
     view.scene.addItem(item)
     assert view.scene.has_selection() is False
@@ -548,6 +857,87 @@ def test_has_croppable_selection_when_multi_selection(view, item):
     assert view.scene.has_croppable_selection() is False
 
 
+def test_selection_cache_when_selected_item_removed(view):
+    item1 = DreambPixmapItem(QtGui.QImage())
+    view.scene.addItem(item1)
+    item1.setSelected(True)
+    item2 = DreambPixmapItem(QtGui.QImage())
+    view.scene.addItem(item2)
+    item2.setSelected(True)
+    assert view.scene.selection_count() == 2
+
+    view.scene.removeItem(item1)
+    assert view.scene.selection_count() == 1
+    assert view.scene.selectedItems(user_only=True) == [item2]
+    assert view.scene.has_single_selection() is True
+
+
+def test_selection_cache_when_selected_item_added(view, item):
+    item.setSelected(True)
+    view.scene.addItem(item)
+    assert view.scene.selection_count() == 1
+    assert view.scene.selectedItems(user_only=True) == [item]
+
+
+def test_selection_cache_after_clear(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    view.scene.clear()
+    assert view.scene.has_selection() is False
+
+
+def test_selection_cache_when_clear_selection(view):
+    for i in range(3):
+        item = DreambPixmapItem(QtGui.QImage())
+        view.scene.addItem(item)
+        item.setSelected(True)
+    view.scene.clearSelection()
+    assert view.scene.selection_count() == 0
+
+
+def test_selection_cache_updated_before_selection_changed(view, item):
+    scene = view.scene
+    scene.addItem(item)
+    counts = []
+
+    def on_selection_changed():
+        counts.append(scene.selection_count())
+
+    scene.selectionChanged.connect(on_selection_changed)
+    item.setSelected(True)
+    item.setSelected(False)
+    scene.selectionChanged.disconnect(on_selection_changed)
+    assert counts == [1, 0]
+
+
+@patch('PyQt6.QtWidgets.QGraphicsScene.selectedItems')
+def test_has_selection_doesnt_query_qt(selected_mock, view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    selected_mock.reset_mock()
+    assert view.scene.has_selection() is True
+    assert view.scene.has_croppable_selection() is True
+    selected_mock.assert_not_called()
+
+
+def test_selection_bounding_rect_updates_on_move(view):
+    item1 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item1)
+    item1.setSelected(True)
+    item2 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item2)
+    item2.setSelected(True)
+    rect = view.scene.itemsBoundingRect(selection_only=True)
+    assert rect == QtCore.QRectF(0, 0, 10, 10)
+
+    item2.setPos(20, 30)
+    rect = view.scene.itemsBoundingRect(selection_only=True)
+    assert rect == QtCore.QRectF(0, 0, 30, 40)
+    item2.setSelected(False)
+    rect = view.scene.itemsBoundingRect(selection_only=True)
+    assert rect == QtCore.QRectF(0, 0, 10, 10)
+
+
 @patch('PyQt6.QtWidgets.QGraphicsScene.mousePressEvent')
 def test_mouse_press_event_when_right_click(mouse_mock, view):
     event = MagicMock(
@@ -720,14 +1110,14 @@ def test_mouse_press_event_when_no_items(mouse_mock, view):
 def test_mouse_doubleclick_event_when_over_item(mouse_mock, view, item):
     event = MagicMock()
     view.scene.move_active = True
-    view.scene.addItem(item)
-    item.setPos(30, 40)
-    item.setSelected(True)
     view.scene.itemAt = MagicMock(return_value=item)
     view.fit_rect = MagicMock()
 
     with patch.object(item, 'bounding_rect_unselected',
                       return_value=QtCore.QRectF(0, 0, 100, 100)):
+        view.scene.addItem(item)
+        item.setPos(30, 40)
+        item.setSelected(True)
         view.scene.mouseDoubleClickEvent(event)
 
     assert view.scene.move_active is False
@@ -744,14 +1134,14 @@ def test_mouse_doubleclick_event_when_over_editable_item(
     item.enter_edit_mode = MagicMock()
     event = MagicMock()
     view.scene.move_active = True
-    view.scene.addItem(item)
-    item.setPos(30, 40)
-    item.setSelected(True)
     view.scene.itemAt = MagicMock(return_value=item)
     view.fit_rect = MagicMock()
 
     with patch.object(item, 'bounding_rect_unselected',
                       return_value=QtCore.QRectF(0, 0, 100, 100)):
+        view.scene.addItem(item)
+        item.setPos(30, 40)
+        item.setSelected(True)
         view.scene.mouseDoubleClickEvent(event)
 
     assert view.scene.move_active is False
@@ -862,6 +1252,76 @@ def test_mouse_move_event_when_no_rubberband(mouse_mock, view, imgfilename3x3):
     assert mouse_mock.called_once_with(event)
 
 
+def test_set_selection_rect(view):
+    item1 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item1)
+    item2 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item2)
+    item2.setPos(100, 0)
+    item3 = DreambPixmapItem(QtGui.QImage(100, 100, FORMAT))
+    view.scene.addItem(item3)
+    item3.setPos(0, 200)
+    item3.setRotation(45)
+    item2.setSelected(True)
+
+    view.scene.set_selection_rect(QtCore.QRectF(-5, -5, 10, 10))
+    assert view.scene.selectedItems(user_only=True) == [item1]
+    # Inside the bounding box of the rotated item, but not the item itself:
+    view.scene.set_selection_rect(QtCore.QRectF(40, 200, 20, 10))
+    assert view.scene.has_selection() is False
+    view.scene.set_selection_rect(QtCore.QRectF(-200, -5, 400, 300))
+    assert set(view.scene.selectedItems(user_only=True)) == {
+        item1, item2, item3}
+
+
+def test_item_at_topmost(view):
+    item1 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item1)
+    item2 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item2)
+    item2.setPos(5, 5)
+    item1.setZValue(2)
+    item2.setZValue(1)
+    transform = QtGui.QTransform()
+
+    assert view.scene.itemAt(QtCore.QPointF(7, 7), transform) == item1
+    assert view.scene.itemAt(QtCore.QPointF(12, 12), transform) == item2
+    assert view.scene.itemAt(QtCore.QPointF(50, 50), transform) is None
+
+
+def test_item_at_selection_handles(view):
+    item = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item)
+    transform = QtGui.QTransform()
+    point = QtCore.QPointF(-2, -2)
+    assert view.scene.itemAt(point, transform) is None
+    item.setSelected(True)
+    assert view.scene.itemAt(point, transform) == item
+
+
+def test_item_at_multi_selection(view):
+    item1 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item1)
+    item2 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item2)
+    item2.setPos(20, 0)
+    view.scene.set_selected_all_items(True)
+    assert view.scene.itemAt(
+        QtCore.QPointF(15, 5),
+        QtGui.QTransform()) == view.scene.multi_select_item
+
+
+def test_nearest_items(view):
+    item1 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item1)
+    item2 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item2)
+    item2.setPos(100, 0)
+    assert view.scene.nearest_items(QtCore.QPointF(80, 0)) == [item2]
+    assert view.scene.nearest_items(
+        QtCore.QPointF(80, 0), exclude=[item2]) == [item1]
+
+
 @patch('PyQt6.QtWidgets.QGraphicsScene.mouseReleaseEvent')
 def test_mouse_release_event_when_rubberband_active(mouse_mock, view):
     event = MagicMock()
@@ -1019,12 +1479,20 @@ def test_on_view_scale_change(view, item):
     item.on_view_scale_change.assert_called_once()
 
 
+def test_on_view_scale_change_when_crop_item_not_selected(view, item):
+    view.scene.addItem(item)
+    view.scene.crop_item = item
+    item.on_view_scale_change = MagicMock()
+    view.scene.on_view_scale_change()
+    item.on_view_scale_change.assert_called_once()
+
+
 def test_items_bounding_rect_given_items(view):
-    item1 = DreambPixmapItem(QtGui.QImage())
+    item1 = DreambPixmapItem(QtGui.QImage(100, 100, FORMAT))
     view.scene.addItem(item1)
     item1.setSelected(True)
     item1.setPos(4, -6)
-    item2 = DreambPixmapItem(QtGui.QImage())
+    item2 = DreambPixmapItem(QtGui.QImage(100, 100, FORMAT))
     view.scene.addItem(item2)
     item2.setSelected(True)
     item2.setPos(-33, 22)
@@ -1033,11 +1501,7 @@ def test_items_bounding_rect_given_items(view):
     item3.setSelected(True)
     item3.setPos(1000, 1000)
 
-    with patch.object(item1, 'bounding_rect_unselected',
-                      return_value=QtCore.QRectF(0, 0, 100, 100)):
-        with patch.object(item2, 'bounding_rect_unselected',
-                          return_value=QtCore.QRectF(0, 0, 100, 100)):
-            rect = view.scene.itemsBoundingRect(items=[item1, item2])
+    rect = view.scene.itemsBoundingRect(items=[item1, item2])
 
     assert rect.topLeft().x() == -33
     assert rect.topLeft().y() == -6
@@ -1046,11 +1510,11 @@ def test_items_bounding_rect_given_items(view):
 
 
 def test_items_bounding_rect_two_items_selection_only(view):
-    item1 = DreambPixmapItem(QtGui.QImage())
+    item1 = DreambPixmapItem(QtGui.QImage(100, 100, FORMAT))
     view.scene.addItem(item1)
     item1.setSelected(True)
     item1.setPos(4, -6)
-    item2 = DreambPixmapItem(QtGui.QImage())
+    item2 = DreambPixmapItem(QtGui.QImage(100, 100, FORMAT))
     view.scene.addItem(item2)
     item2.setSelected(True)
     item2.setPos(-33, 22)
@@ -1059,11 +1523,7 @@ def test_items_bounding_rect_two_items_selection_only(view):
     item3.setSelected(False)
     item3.setPos(1000, 1000)
 
-    with patch.object(item1, 'bounding_rect_unselected',
-                      return_value=QtCore.QRectF(0, 0, 100, 100)):
-        with patch.object(item2, 'bounding_rect_unselected',
-                          return_value=QtCore.QRectF(0, 0, 100, 100)):
-            rect = view.scene.itemsBoundingRect(selection_only=True)
+    rect = view.scene.itemsBoundingRect(selection_only=True)
 
     assert rect.topLeft().x() == -33
     assert rect.topLeft().y() == -6
@@ -1104,6 +1564,79 @@ def test_items_bounding_rect_when_no_items(view):
     assert rect == QtCore.QRectF(0, 0, 0, 0)
 
 
+def test_items_bounding_rect_cached_updates_on_move(view, imgfilename3x3):
+    item1 = DreambPixmapItem(QtGui.QImage(imgfilename3x3))
+    view.scene.addItem(item1)
+    item2 = DreambPixmapItem(QtGui.QImage(imgfilename3x3))
+    view.scene.addItem(item2)
+    item2.setPos(10, 20)
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(0, 0, 13, 23)
+
+    item2.setPos(-10, -20)
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(-10, -20, 13, 23)
+    item2.setScale(2)
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(-10, -20, 13, 23)
+
+
+def test_items_bounding_rect_cached_updates_on_remove(view, imgfilename3x3):
+    item1 = DreambPixmapItem(QtGui.QImage(imgfilename3x3))
+    view.scene.addItem(item1)
+    item2 = DreambPixmapItem(QtGui.QImage(imgfilename3x3))
+    view.scene.addItem(item2)
+    item2.setPos(10, 20)
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(0, 0, 13, 23)
+
+    view.scene.removeItem(item2)
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(0, 0, 3, 3)
+    view.scene.removeItem(item1)
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(0, 0, 0, 0)
+
+
+def test_items_bounding_rect_cached_updates_on_crop(view, imgfilename3x3):
+    item = DreambPixmapItem(QtGui.QImage(imgfilename3x3))
+    view.scene.addItem(item)
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(0, 0, 3, 3)
+    item.crop = QtCore.QRectF(1, 1, 2, 1)
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(1, 1, 2, 1)
+
+
+def test_items_bounding_rect_cached_no_full_recalc_inside_hull(
+        view, imgfilename3x3):
+    item1 = DreambPixmapItem(QtGui.QImage(imgfilename3x3))
+    view.scene.addItem(item1)
+    item2 = DreambPixmapItem(QtGui.QImage(imgfilename3x3))
+    view.scene.addItem(item2)
+    item2.setPos(100, 100)
+    item3 = DreambPixmapItem(QtGui.QImage(imgfilename3x3))
+    view.scene.addItem(item3)
+    item3.setPos(50, 50)
+    view.scene.itemsBoundingRect()
+
+    item3.setPos(60, 60)
+    with patch('dreamboard.scene.get_item_bounds',
+               wraps=get_item_bounds) as bounds_mock:
+        rect = view.scene.itemsBoundingRect()
+        bounds_mock.assert_called_once_with(item3)
+    assert rect == QtCore.QRectF(0, 0, 103, 103)
+
+
+def test_items_bounding_rect_cached_after_clear(view, item):
+    view.scene.addItem(item)
+    item.setPos(10, 10)
+    view.scene.itemsBoundingRect()
+    view.scene.clear()
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(0, 0, 0, 0)
+    assert view.scene.has_items() is False
+
+
+def test_has_items(view, item):
+    assert view.scene.has_items() is False
+    view.scene.addItem(QtWidgets.QGraphicsRectItem())
+    assert view.scene.has_items() is False
+    view.scene.addItem(item)
+    assert view.scene.has_items() is True
+
+
 def test_get_selection_center(view):
     with patch('dreamboard.scene.DreambGraphicsScene.itemsBoundingRect',
                return_value=QtCore.QRectF(10, 20, 100, 60)):
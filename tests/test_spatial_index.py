@@ -0,0 +1,132 @@
+import random
+
+import numpy as np
+from PyQt6 import QtCore, QtGui
+
+from dreamboard.items import DreambPixmapItem
+from dreamboard.spatial_index import SpatialIndex, quads_intersect_bounds
+
+
+FORMAT = QtGui.QImage.Format.Format_RGB32
+
+
+def add_item(scene, x, y, width=10, height=10):
+    item = DreambPixmapItem(QtGui.QImage(width, height, FORMAT))
+    scene.addItem(item)
+    item.setPos(x, y)
+    return item
+
+
+def test_query(view):
+    item1 = add_item(view.scene, 0, 0)
+    item2 = add_item(view.scene, 100, 100)
+    index = view.scene.spatial_index
+
+    assert index.query(QtCore.QRectF(5, 5, 2, 2)) == [item1]
+    assert index.query(QtCore.QRectF(105, 105, 2, 2)) == [item2]
+    assert set(index.query(QtCore.QRectF(0, 0, 200, 200))) == {item1, item2}
+    assert index.query(QtCore.QRectF(50, 50, 10, 10)) == []
+
+
+def test_query_after_move(view):
+    item = add_item(view.scene, 0, 0)
+    index = view.scene.spatial_index
+    assert index.query(QtCore.QRectF(5, 5, 2, 2)) == [item]
+
+    item.setPos(500, 500)
+    assert index.query(QtCore.QRectF(5, 5, 2, 2)) == []
+    assert index.query(QtCore.QRectF(505, 505, 2, 2)) == [item]
+
+
+def test_remove(view):
+    item1 = add_item(view.scene, 0, 0)
+    item2 = add_item(view.scene, 0, 0)
+    index = view.scene.spatial_index
+
+    view.scene.removeItem(item1)
+    assert item1 not in index
+    assert len(index) == 1
+    assert index.query(QtCore.QRectF(0, 0, 10, 10)) == [item2]
+
+
+def test_clear(view, item):
+    view.scene.addItem(item)
+    view.scene.clear()
+    assert len(view.scene.spatial_index) == 0
+
+
+def test_query_point(view):
+    item1 = add_item(view.scene, 0, 0)
+    add_item(view.scene, 100, 0)
+    index = view.scene.spatial_index
+    assert index.query_point(QtCore.QPointF(3, 4)) == [item1]
+    assert index.query_point(QtCore.QPointF(50, 4)) == []
+
+
+def test_query_exact_with_rotation(view):
+    item = add_item(view.scene, 0, 0, 100, 100)
+    item.setRotation(45)
+    index = view.scene.spatial_index
+
+    # Inside the bounding box, but outside the rotated square
+    rect = QtCore.QRectF(40, 0, 20, 10)
+    assert index.query(rect) == [item]
+    assert index.query(rect, exact=True) == []
+    assert index.query(QtCore.QRectF(-5, 60, 10, 10), exact=True) == [item]
+
+
+def test_matches_brute_force_after_packing(view):
+    random.seed(42)
+    items = []
+    for i in range(SpatialIndex.NODE_CAPACITY * 10):
+        items.append(add_item(view.scene,
+                              random.uniform(-2000, 2000),
+                              random.uniform(-2000, 2000),
+                              random.randint(1, 100),
+                              random.randint(1, 100)))
+    index = view.scene.spatial_index
+    index.pack()
+    assert len(index._node_bounds) == 10
+
+    for item in random.sample(items, 50):
+        item.setPos(random.uniform(-2000, 2000), random.uniform(-2000, 2000))
+    for item in random.sample(items, 50):
+        view.scene.removeItem(item)
+        items.remove(item)
+
+    for i in range(20):
+        rect = QtCore.QRectF(random.uniform(-2000, 2000),
+                             random.uniform(-2000, 2000),
+                             random.uniform(0, 800),
+                             random.uniform(0, 800))
+        expected = {item for item in items
+                    if item.sceneBoundingRect().intersects(rect)}
+        assert set(index.query(rect)) == expected
+
+
+def test_nearest(view):
+    item1 = add_item(view.scene, 0, 0)
+    item2 = add_item(view.scene, 100, 0)
+    item3 = add_item(view.scene, 300, 0)
+    index = view.scene.spatial_index
+
+    assert index.nearest(QtCore.QPointF(120, 5)) == [item2]
+    assert index.nearest(QtCore.QPointF(120, 5), count=2) == [item2, item1]
+    assert index.nearest(QtCore.QPointF(120, 5), count=2,
+                         exclude=[item2]) == [item1, item3]
+    assert index.nearest(QtCore.QPointF(120, 5), count=5) == [
+        item2, item1, item3]
+
+
+def test_nearest_when_empty(view):
+    assert view.scene.spatial_index.nearest(QtCore.QPointF(0, 0)) == []
+
+
+def test_quads_intersect_bounds():
+    corners = np.array([
+        [[0, 0], [10, 0], [10, 10], [0, 10]],
+        [[5, 0], [10, 5], [5, 10], [0, 5]],
+        [[50, 50], [60, 50], [60, 60], [50, 60]],
+    ], dtype=float)
+    result = quads_intersect_bounds(corners, (8, 0, 12, 1))
+    assert result.tolist() == [True, False, False]
@@ -0,0 +1,50 @@
+from PyQt6 import QtCore
+
+from dreamboard.tile_cache import TileCache
+
+
+def test_keys_for_rect():
+    cache = TileCache()
+    assert cache.keys_for_rect(QtCore.QRectF(10, 10, 20, 20)) == [(0, 0)]
+    assert cache.keys_for_rect(QtCore.QRectF(-10, 250, 300, 10)) == [
+        (-1, 0), (0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+
+def test_set_scale_clears_tiles():
+    cache = TileCache()
+    cache.set_scale(2)
+    cache.put((0, 0), 'tile')
+    cache.set_scale(2)
+    assert len(cache) == 1
+    cache.set_scale(3)
+    assert len(cache) == 0
+
+
+def test_scene_rect():
+    cache = TileCache()
+    cache.set_scale(2)
+    assert cache.scene_rect((1, -1)) == QtCore.QRectF(128, -128, 128, 128)
+
+
+def test_put_discards_least_recently_used():
+    cache = TileCache()
+    cache.MAX_TILES = 2
+    cache.put((0, 0), 'a')
+    cache.put((1, 0), 'b')
+    cache.get((0, 0))
+    cache.put((2, 0), 'c')
+    assert (0, 0) in cache
+    assert (1, 0) not in cache
+    assert (2, 0) in cache
+
+
+def test_invalidate():
+    cache = TileCache()
+    cache.set_scale(0.5)
+    cache.put((0, 0), 'a')
+    cache.put((1, 0), 'b')
+    cache.put((2, 0), 'c')
+    cache.invalidate(QtCore.QRectF(520, 10, 10, 10))
+    assert (0, 0) in cache
+    assert (1, 0) not in cache
+    assert (2, 0) in cache
@@ -0,0 +1,116 @@
+from pytest import approx
+
+from PyQt6 import QtCore, QtGui
+
+from dreamboard.items import DreambPixmapItem, DreambTextItem
+from dreamboard.transform_store import TransformStore
+
+
+FORMAT = QtGui.QImage.Format.Format_RGB32
+
+
+def test_add_reads_item_lazily(view):
+    item = DreambPixmapItem(QtGui.QImage(30, 20, FORMAT))
+    view.scene.addItem(item)
+    item.setPos(5, 6)
+    item.setZValue(0.3)
+    item.setScale(2)
+    item.setRotation(45)
+    item.do_flip()
+    store = view.scene.transform_store
+
+    assert item in store
+    assert len(store) == 1
+    assert store.get([item]).tolist()[0] == approx(
+        [item.pos().x(), item.pos().y(), 0.3, 2, 45, -1, 0, 0, 30, 20])
+
+
+def test_remove_moves_last_row(view):
+    items = []
+    for i in range(3):
+        item = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+        view.scene.addItem(item)
+        item.setPos(i, i)
+        items.append(item)
+    store = view.scene.transform_store
+
+    view.scene.removeItem(items[0])
+    assert items[0] not in store
+    assert store.items == [items[2], items[1]]
+    assert store.column('x').tolist() == [2, 1]
+    assert store.column('x', [items[1]]).tolist() == [1]
+
+
+def test_grows_beyond_capacity(view):
+    items = []
+    for i in range(TransformStore.MIN_CAPACITY + 1):
+        item = DreambTextItem('foo')
+        view.scene.addItem(item)
+        item.setPos(i, 0)
+        items.append(item)
+    assert view.scene.transform_store.column('x').tolist() == list(
+        range(TransformStore.MIN_CAPACITY + 1))
+
+
+def test_clear(view, item):
+    view.scene.addItem(item)
+    view.scene.clear()
+    assert len(view.scene.transform_store) == 0
+
+
+def test_corners_match_qt(view):
+    item = DreambPixmapItem(QtGui.QImage(40, 30, FORMAT))
+    view.scene.addItem(item)
+    item.setPos(-7, 11)
+    item.setScale(1.7)
+    item.setRotation(33)
+    item.do_flip()
+    item.crop = QtCore.QRectF(2, 3, 20, 10)
+
+    corners = view.scene.transform_store.corners([item])[0]
+    for corner, expected in zip(corners, item.corners_scene_coords):
+        assert corner.tolist() == approx([expected.x(), expected.y()])
+
+
+def test_bounding_rect(view):
+    item1 = DreambPixmapItem(QtGui.QImage(100, 100, FORMAT))
+    view.scene.addItem(item1)
+    item1.setPos(4, -6)
+    item2 = DreambPixmapItem(QtGui.QImage(100, 100, FORMAT))
+    view.scene.addItem(item2)
+    item2.setPos(-33, 22)
+
+    rect = view.scene.transform_store.bounding_rect([item1, item2])
+    assert rect == QtCore.QRectF(-33, -6, 137, 128)
+
+
+def test_bounding_rect_when_no_items(view):
+    rect = view.scene.transform_store.bounding_rect([])
+    assert rect == QtCore.QRectF(0, 0, 0, 0)
+
+
+def test_sizes_with_rotation(view):
+    item = DreambPixmapItem(QtGui.QImage(100, 50, FORMAT))
+    view.scene.addItem(item)
+    item.setRotation(90)
+    item.setScale(2)
+    assert view.scene.transform_store.sizes([item]).tolist() == [[100, 200]]
+
+
+def test_apply(view):
+    item1 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item1)
+    item2 = DreambPixmapItem(QtGui.QImage(10, 10, FORMAT))
+    view.scene.addItem(item2)
+    store = view.scene.transform_store
+
+    store.apply([item1, item2], x=[1, 2], y=[3, 4], scale=[0.5, 2],
+                rotation=[360, -90])
+    assert item1.pos() == QtCore.QPointF(1, 3)
+    assert item1.scale() == 0.5
+    assert item1.rotation() == 0
+    assert item2.pos() == QtCore.QPointF(2, 4)
+    assert item2.scale() == 2
+    assert item2.rotation() == 270
+    assert store.column('rotation', [item1, item2]).tolist() == [0, 270]
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(1, -16, 21, 24)
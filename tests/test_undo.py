@@ -0,0 +1,127 @@
+import gc
+
+from PyQt6 import QtCore, QtGui
+
+from dreamboard import commands
+from dreamboard.items import DreambPixmapItem
+from dreamboard.undo import DreambUndoStack, PixelSpillStore
+
+
+FORMAT = QtGui.QImage.Format.Format_ARGB32
+
+
+def make_item(width=100, height=100, color=(255, 0, 0)):
+    image = QtGui.QImage(width, height, FORMAT)
+    image.fill(QtGui.QColor(*color))
+    return DreambPixmapItem(image)
+
+
+def test_spill_store_put_take(qapp):
+    store = PixelSpillStore()
+    image = QtGui.QImage(30, 20, FORMAT)
+    image.fill(QtGui.QColor(10, 20, 30))
+    owner = make_item()
+    key = store.put(image, owner)
+    assert key in store
+    assert len(store) == 1
+
+    result = store.take(key)
+    assert key not in store
+    assert result.size() == QtCore.QSize(30, 20)
+    assert result.format() == FORMAT
+    assert result.pixelColor(5, 5) == QtGui.QColor(10, 20, 30)
+    store.close()
+
+
+def test_spill_store_discards_when_owner_collected(qapp):
+    store = PixelSpillStore()
+    owner = make_item()
+    store.put(QtGui.QImage(10, 10, FORMAT), owner)
+    assert len(store) == 1
+    del owner
+    gc.collect()
+    assert len(store) == 0
+    count = store.connection.execute(
+        'SELECT COUNT(*) FROM pixels').fetchone()[0]
+    assert count == 0
+    store.close()
+
+
+def test_spill_pixmap_keeps_crop(view):
+    store = PixelSpillStore()
+    item = make_item(color=(0, 255, 0))
+    item.crop = QtCore.QRectF(10, 20, 30, 40)
+    item.spill_pixmap(store)
+    assert item.pixmap().isNull()
+    assert item.memory_cost() == 0
+    assert item.crop == QtCore.QRectF(10, 20, 30, 40)
+
+    view.scene.addItem(item)
+    assert item.pixmap().size() == QtCore.QSize(100, 100)
+    assert item.pixmap().toImage().pixelColor(50, 50) == QtGui.QColor(
+        0, 255, 0)
+    assert item.crop == QtCore.QRectF(10, 20, 30, 40)
+    assert len(store) == 0
+    store.close()
+
+
+def test_create_copy_restores_spilled_pixmap(qapp):
+    store = PixelSpillStore()
+    item = make_item()
+    item.spill_pixmap(store)
+    copy = item.create_copy()
+    assert copy.pixmap().size() == QtCore.QSize(100, 100)
+    store.close()
+
+
+def test_undo_stack_memory_cost(view):
+    stack = view.undo_stack
+    item = make_item()
+    view.scene.addItem(item)
+    assert stack.memory_cost() == 0
+    stack.push(commands.DeleteItems(view.scene, [item]))
+    assert stack.memory_cost() == item.memory_cost() > 0
+    stack.undo()
+    assert stack.memory_cost() == 0
+
+
+def test_undo_stack_spills_oldest_commands(view):
+    items = [make_item() for i in range(3)]
+    cost = items[0].memory_cost()
+    stack = DreambUndoStack(memory_limit=cost * 2)
+    view.scene.undo_stack = stack
+    for item in items:
+        view.scene.addItem(item)
+    for item in items:
+        stack.push(commands.DeleteItems(view.scene, [item]))
+
+    assert items[0].spill_key is not None
+    assert items[1].spill_key is None
+    assert items[2].spill_key is None
+    assert stack.memory_cost() == cost * 2
+
+    for i in range(3):
+        stack.undo()
+    assert view.scene.items_for_save()
+    for item in items:
+        assert item.spill_key is None
+        assert item.pixmap().size() == QtCore.QSize(100, 100)
+    stack.spill_store.close()
+
+
+def test_undo_stack_spills_macro_commands(view):
+    items = [make_item() for i in range(2)]
+    stack = DreambUndoStack(memory_limit=0)
+    view.scene.undo_stack = stack
+    stack.beginMacro('Insert')
+    for item in items:
+        stack.push(commands.InsertItems(view.scene, [item]))
+    stack.endMacro()
+    assert stack.count() == 1
+
+    stack.undo()
+    assert all(item.spill_key is not None for item in items)
+    stack.redo()
+    assert all(item.spill_key is None for item in items)
+    assert all(not item.pixmap().isNull() for item in items)
+    stack.spill_store.close()
@@ -3,6 +3,8 @@ import shutil
 import sqlite3
 from unittest.mock import MagicMock, patch, mock_open
 
+from pytest import approx
+
 from PyQt6 import QtCore, QtGui, QtWidgets
 from PyQt6.QtCore import Qt
 
@@ -67,6 +69,16 @@ def test_get_supported_image_formats_for_reading(view):
     assert '*.jpg' in formats
 
 
+def test_visible_items(view):
+    item1 = DreambPixmapItem(QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32))
+    view.scene.addItem(item1)
+    item2 = DreambPixmapItem(QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32))
+    view.scene.addItem(item2)
+    item2.setPos(100000, 100000)
+    view.fit_rect(QtCore.QRectF(0, 0, 10, 10))
+    assert view.visible_items() == [item1]
+
+
 def test_clear_scene(view, item):
     view.scene.addItem(item)
     view.scale(2, 2)
@@ -204,6 +216,18 @@ def test_on_action_open_when_no_filename(open_mock, dialog_mock, view):
     view.scene.cancel_crop_mode.assert_called_once_with()
 
 
+@patch('dreamboard.actions.event_handling_file.upload_pool')
+def test_on_action_quit(pool_mock, view):
+    view.app = MagicMock()
+    view.scene.cancel_packing = MagicMock()
+    view.full_resolution_loader.close = MagicMock()
+    view.on_action_quit()
+    view.scene.cancel_packing.assert_called_once_with(wait=True)
+    pool_mock.close.assert_called_once_with()
+    view.full_resolution_loader.close.assert_called_once_with()
+    view.app.quit.assert_called_once_with()
+
+
 @patch('PyQt6.QtWidgets.QFileDialog.getSaveFileName')
 def test_on_action_save_as(dialog_mock, view, imgfilename3x3, tmpdir):
     item = DreambPixmapItem(QtGui.QImage(imgfilename3x3))
@@ -218,6 +242,40 @@ def test_on_action_save_as(dialog_mock, view, imgfilename3x3, tmpdir):
     view.scene.cancel_crop_mode.assert_called_once_with()
 
 
+def make_preview_item(full_image):
+    loader = MagicMock()
+    loader.load_now.side_effect = lambda item: (
+        item.set_full_resolution(full_image) if not full_image.isNull()
+        else None)
+    item = DreambPixmapItem(QtGui.QImage())
+    item.set_preview(QtGui.QImage(5, 5, QtGui.QImage.Format.Format_RGB32),
+                     10, 10, loader)
+    return item
+
+
+def test_do_save_loads_full_resolution_first(view, tmpdir):
+    item = make_preview_item(
+        QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32))
+    view.scene.addItem(item)
+    filename = os.path.join(tmpdir, 'test.dreamb')
+    view.do_save(filename, create_new=True)
+    assert not item.is_preview()
+    view.worker.wait()
+    assert os.path.exists(filename) is True
+
+
+@patch('PyQt6.QtWidgets.QMessageBox.warning')
+def test_do_save_when_full_resolution_missing(warn_mock, view, tmpdir):
+    item = make_preview_item(QtGui.QImage())
+    view.scene.addItem(item)
+    view.worker = None
+    filename = os.path.join(tmpdir, 'test.dreamb')
+    view.do_save(filename, create_new=True)
+    warn_mock.assert_called_once()
+    assert view.worker is None
+    assert os.path.exists(filename) is False
+
+
 @patch('PyQt6.QtWidgets.QFileDialog.getSaveFileName')
 @patch('dreamboard.views.DreambGraphicsView.do_save')
 def test_on_action_save_as_when_no_filename(
@@ -680,6 +738,182 @@ def test_wheel_event(zoom_mock, view):
     event.accept.assert_called_once_with()
 
 
+@patch('dreamboard.views.board_view.DreambGraphicsView.request_zoom')
+def test_wheel_event_requests_zoom(request_mock, view):
+    event = MagicMock()
+    event.angleDelta.return_value = QtCore.QPointF(0, 40)
+    event.position.return_value = QtCore.QPointF(10, 20)
+    view.wheelEvent(event)
+    request_mock.assert_called_once_with(40, QtCore.QPointF(10, 20))
+    event.accept.assert_called_once_with()
+
+
+@patch('dreamboard.views.board_view.DreambGraphicsView.pan')
+def test_request_pan_coalesces_within_frame(pan_mock, view):
+    view.request_pan(QtCore.QPointF(1, 2))
+    pan_mock.assert_called_once_with(QtCore.QPointF(1, 2))
+    assert view.frame_timer.isActive() is True
+
+    view.request_pan(QtCore.QPointF(3, 4))
+    view.request_pan(QtCore.QPointF(5, 6))
+    assert pan_mock.call_count == 1
+    view.on_frame()
+    assert pan_mock.call_count == 2
+    pan_mock.assert_called_with(QtCore.QPointF(8, 10))
+
+    view.frame_timer.stop()
+    view.on_frame()
+    assert pan_mock.call_count == 2
+    assert view.frame_timer.isActive() is False
+
+
+@patch('dreamboard.views.board_view.DreambGraphicsView.zoom_by_factor',
+       return_value=True)
+def test_request_zoom_coalesces_within_frame(zoom_mock, view):
+    anchor = QtCore.QPointF(10, 20)
+    view.request_zoom(40, anchor)
+    zoom_mock.assert_called_once_with(1.04, anchor)
+
+    view.request_zoom(40, anchor)
+    view.request_zoom(-40, anchor)
+    view.request_zoom(40, anchor)
+    assert zoom_mock.call_count == 1
+    view.on_frame()
+    assert zoom_mock.call_count == 2
+    assert zoom_mock.call_args[0][0] == approx(1.04)
+    assert view.pending_zoom == approx(1)
+
+
+@patch('dreamboard.views.board_view.DreambGraphicsView.zoom_by_factor',
+       return_value=False)
+def test_request_zoom_when_limit_reached(zoom_mock, view):
+    view.request_zoom(40, QtCore.QPointF(10, 20))
+    view.request_zoom(40, QtCore.QPointF(10, 20))
+    view.on_frame()
+    assert view.pending_zoom == 1
+    assert view.has_pending_input() is False
+
+
+@patch('dreamboard.views.board_view.DreambGraphicsView.zoom_by_factor',
+       return_value=True)
+def test_request_zoom_animated(zoom_mock, view):
+    with patch.object(view.settings, 'value', return_value=True):
+        view.request_zoom(210, QtCore.QPointF(10, 20))
+        zoom_mock.assert_called_once_with(approx(1.1), QtCore.QPointF(10, 20))
+        assert view.pending_zoom == approx(1.1)
+        view.on_frame()
+        assert zoom_mock.call_args[0][0] == approx(1.1 ** 0.5)
+
+
+@patch('PyQt6.QtWidgets.QGraphicsView.mouseMoveEvent')
+def test_mouse_move_coalesced_when_dragging(mouse_event_mock, view):
+    view.scene.rubberband_active = True
+    event1 = MagicMock()
+    event2 = MagicMock()
+    event3 = MagicMock()
+
+    view.mouseMoveEvent(event1)
+    mouse_event_mock.assert_called_once_with(event1)
+    view.mouseMoveEvent(event2)
+    view.mouseMoveEvent(event3)
+    assert mouse_event_mock.call_count == 1
+    view.on_frame()
+    assert mouse_event_mock.call_count == 2
+    mouse_event_mock.assert_called_with(event3.clone.return_value)
+
+
+@patch('PyQt6.QtWidgets.QGraphicsView.mouseReleaseEvent')
+@patch('PyQt6.QtWidgets.QGraphicsView.mouseMoveEvent')
+def test_mouse_release_applies_pending_move(
+        mouse_event_mock, release_mock, view):
+    view.scene.rubberband_active = True
+    view.mouseMoveEvent(MagicMock())
+    event = MagicMock()
+    view.mouseMoveEvent(event)
+    view.mouseReleaseEvent(MagicMock())
+    mouse_event_mock.assert_called_with(event.clone.return_value)
+    release_mock.assert_called_once()
+
+
+@patch('dreamboard.views.board_view.DreambGraphicsView.pan')
+def test_fast_rendering_while_panning(pan_mock, view):
+    smooth = QtGui.QPainter.RenderHint.SmoothPixmapTransform
+    assert view.renderHints() & smooth
+    view.request_pan(QtCore.QPointF(1, 2))
+    assert view.scene.fast_rendering is True
+    assert not view.renderHints() & smooth
+    assert view.render_idle_timer.isActive() is True
+
+    view.viewport().update = MagicMock()
+    view.on_render_idle()
+    assert view.scene.fast_rendering is False
+    assert view.renderHints() & smooth
+    view.viewport().update.assert_called_once_with()
+
+
+def test_paint_from_tile_cache(view):
+    image = QtGui.QImage(100, 100, QtGui.QImage.Format.Format_RGB32)
+    image.fill(QtGui.QColor(255, 0, 0))
+    item = DreambPixmapItem(image)
+    view.scene.addItem(item)
+    view.resize(300, 300)
+    view.fit_rect(QtCore.QRectF(0, 0, 100, 100))
+    view.tile_cache_enabled = MagicMock(return_value=True)
+    center = view.mapFromScene(QtCore.QPointF(50, 50))
+    outside = view.mapFromScene(QtCore.QPointF(200, 200))
+
+    direct = view.viewport().grab().toImage()
+    assert len(view.tile_cache) == 0
+    assert view.tile_build_queue
+    view.build_tiles()
+    assert len(view.tile_cache) > 0
+    assert view.tile_build_queue == []
+
+    view.render_tile = MagicMock()
+    cached = view.viewport().grab().toImage()
+    view.render_tile.assert_not_called()
+    for point in (center, outside):
+        assert cached.pixelColor(point) == direct.pixelColor(point)
+
+
+def test_tile_cache_invalidated_on_scene_change(view, item):
+    view.scene.addItem(item)
+    view.tile_cache.set_scale(1)
+    view.tile_cache.put((0, 0), 'tile')
+    view.tile_cache.put((5, 5), 'tile')
+    view.on_scene_changed([QtCore.QRectF(10, 10, 5, 5)])
+    assert (0, 0) not in view.tile_cache
+    assert (5, 5) in view.tile_cache
+
+
+@patch('PyQt6.QtWidgets.QGraphicsView.drawForeground')
+def test_draw_foreground_paints_overlay(draw_mock, view):
+    item1 = DreambPixmapItem(
+        QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32))
+    view.scene.addItem(item1)
+    item1.setPos(30, 40)
+    item1.setSelected(True)
+    item2 = DreambPixmapItem(
+        QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32))
+    view.scene.addItem(item2)
+    item1.paint_overlay = MagicMock()
+    item2.paint_overlay = MagicMock()
+    painter = MagicMock()
+
+    view.drawForeground(painter, QtCore.QRectF(0, 0, 100, 100))
+    item1.paint_overlay.assert_called_once_with(painter)
+    item2.paint_overlay.assert_not_called()
+    painter.setTransform.assert_called_once_with(
+        item1.sceneTransform(), True)
+
+
+def test_update_overlay(view):
+    view.viewport().update = MagicMock()
+    view.update_overlay(QtCore.QRectF(0, 0, 10, 10))
+    rect = view.viewport().update.call_args[0][0]
+    assert rect.contains(view.mapFromScene(QtCore.QPointF(5, 5)))
+
+
 @patch('PyQt6.QtWidgets.QGraphicsView.mousePressEvent')
 def test_mouse_press_zoom(mouse_event_mock, view):
     event = MagicMock()
@@ -4,7 +4,12 @@ from PyQt6 import QtCore, QtWidgets
 from PyQt6.QtCore import Qt
 
 from dreamboard.config import logfile_name
-from dreamboard.widgets import DebugLogDialog, RecentFilesModel
+from dreamboard.cloud.uploads import UploadPool
+from dreamboard.widgets import (
+    DebugLogDialog,
+    RecentFilesModel,
+    UploadProgress,
+)
 
 
 def test_debug_log_dialog(qtbot, settings, view):
@@ -38,3 +43,33 @@ def test_recent_files_model_data_fontrole(view):
     index.row.return_value = 1
     font = model.data(index, QtCore.Qt.ItemDataRole.FontRole)
     assert font.underline() is True
+
+
+def test_upload_progress_shows_running_uploads(view):
+    pool = UploadPool()
+    widget = UploadProgress(view, pool)
+    assert widget.isHidden()
+
+    pool.started.emit('images/1.png', 'foo.png', 200)
+    pool.started.emit('images/2.png', 'bar.png', 100)
+    pool.progress.emit('images/1.png', 50, 200)
+    assert not widget.isHidden()
+    assert widget.text() == 'Uploading 2 image(s)\nfoo.png: 25%\nbar.png: 0%'
+    assert widget.y() + widget.height() == view.height() - widget.MARGIN
+
+    pool.file_finished.emit('images/1.png', True)
+    assert widget.text() == 'Uploading 1 image(s)\nbar.png: 0%'
+    pool.file_finished.emit('images/2.png', False)
+    assert widget.isHidden()
+
+
+def test_upload_progress_when_uploads_share_label(view):
+    pool = UploadPool()
+    widget = UploadProgress(view, pool)
+    pool.started.emit('images/1.png', 'foo.png', 200)
+    pool.started.emit('previews/1.jpg', 'foo.png', 100)
+    assert widget.text() == 'Uploading 2 image(s)\nfoo.png: 0%\nfoo.png: 0%'
+    pool.file_finished.emit('previews/1.jpg', True)
+    assert widget.text() == 'Uploading 1 image(s)\nfoo.png: 0%'
+    pool.progress.emit('previews/1.jpg', 100, 100)
+    assert widget.text() == 'Uploading 1 image(s)\nfoo.png: 0%'